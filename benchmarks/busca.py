@@ -0,0 +1,144 @@
+# Benchmark da busca de produtos e clientes (database/busca.py): completa o banco com
+# clientes e produtos sintéticos (combinações de listas de nomes, sem Faker, para gerar
+# milhões rapidamente) e mede a latência das buscas por prefixo, nome completo, e-mail
+# e com erro de digitação (p50, p95 e máximo, em ms). Meta: p95 abaixo de 50 ms.
+#
+# Grava clientes e produtos no banco informado: use um banco de testes.
+# Uso: python -m benchmarks.busca [URL]   (padrão: SQLite em arquivo temporário)
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from database.bulk import CargaEmLotes
+from database.busca import buscar_por_termo
+from database.migracoes import aplicar_migracoes
+from models.models import Categoria, Cliente, Produto
+
+CLIENTES = 1_000_000
+PRODUTOS = 200_000
+BUSCAS_POR_TIPO = 200
+META_MS = 50
+
+PRENOMES = (
+    "Ana", "Antônio", "Beatriz", "Bruno", "Camila", "Carlos", "Daniela", "Diego", "Eduarda", "Felipe",
+    "Fernanda", "Gabriel", "Helena", "Igor", "Isabela", "João", "Juliana", "Lucas", "Luíza", "Marcos",
+    "Maria", "Mariana", "Mateus", "Natália", "Otávio", "Paula", "Pedro", "Rafael", "Renata", "Sofia",
+    "Thiago", "Valéria", "Vinícius", "Yasmin",
+)
+SOBRENOMES = (
+    "Almeida", "Araújo", "Barbosa", "Barros", "Cardoso", "Carvalho", "Castro", "Costa", "Dias", "Fernandes",
+    "Ferreira", "Gomes", "Lima", "Martins", "Melo", "Monteiro", "Moreira", "Nascimento", "Oliveira",
+    "Pereira", "Pinto", "Ribeiro", "Rocha", "Rodrigues", "Santos", "Silva", "Sousa", "Teixeira", "Vieira",
+)
+DOMINIOS = ("gmail.com", "hotmail.com", "outlook.com", "yahoo.com.br", "uol.com.br")
+ITENS = (
+    "Camiseta", "Calça", "Tênis", "Mochila", "Notebook", "Smartphone", "Fone de Ouvido", "Cafeteira",
+    "Liquidificador", "Panela", "Cadeira", "Mesa", "Luminária", "Travesseiro", "Toalha", "Livro",
+    "Bicicleta", "Bola", "Relógio", "Perfume", "Shampoo", "Ração", "Furadeira", "Pneu",
+)
+QUALIDADES = ("Básico", "Premium", "Esportivo", "Infantil", "Profissional", "Compacto", "Clássico", "Slim")
+CORES = ("Azul", "Preto", "Branco", "Vermelho", "Verde", "Cinza", "Rosa", "Bege")
+CATEGORIAS = ("Roupas", "Eletrônicos", "Casa", "Esportes", "Beleza", "Pet", "Ferramentas", "Automotivo")
+
+
+def _cliente(cliente_id: int, rng: random.Random) -> dict:
+    prenome, sobrenome = rng.choice(PRENOMES), rng.choice(SOBRENOMES)
+    nome = f"{prenome} {rng.choice(SOBRENOMES)} {sobrenome}"
+    usuario = f"{prenome}.{sobrenome}{cliente_id}".lower()
+    return {"nome": nome, "email": f"{usuario}@{rng.choice(DOMINIOS)}", "telefone": f"(11) 9{cliente_id:08d}"}
+
+
+# Completa as tabelas até as quantidades do benchmark (rodar de novo reaproveita os dados)
+def _popular(engine, rng: random.Random):
+    with engine.begin() as conexao:
+        categorias = dict(conexao.execute(select(Categoria.nome, Categoria.id)).all())
+        faltantes = [{"nome": nome} for nome in CATEGORIAS if nome not in categorias]
+        if faltantes:
+            conexao.execute(Categoria.__table__.insert(), faltantes)
+            categorias = dict(conexao.execute(select(Categoria.nome, Categoria.id)).all())
+        categoria_ids = [categorias[nome] for nome in CATEGORIAS]
+
+        clientes = conexao.execute(select(func.count()).select_from(Cliente)).scalar()
+        produtos = conexao.execute(select(func.count()).select_from(Produto)).scalar()
+        proximo_id = (conexao.execute(select(func.max(Cliente.id))).scalar() or 0) + 1
+
+        inicio = time.perf_counter()
+        carga = CargaEmLotes(conexao, 50_000)
+        for cliente_id in range(proximo_id, proximo_id + max(CLIENTES - clientes, 0)):
+            carga.adicionar(Cliente.__table__, {"id": cliente_id, **_cliente(cliente_id, rng)})
+            if carga.cheio(Cliente.__table__):
+                carga.descarregar(Cliente.__table__)
+        carga.descarregar(Cliente.__table__)
+
+        # O número no fim mantém a chave (categoria, nome) única
+        for numero in range(produtos, PRODUTOS):
+            nome = f"{rng.choice(ITENS)} {rng.choice(QUALIDADES)} {rng.choice(CORES)} {numero}"
+            carga.adicionar(Produto.__table__, {
+                "nome": nome, "categoria_id": rng.choice(categoria_ids), "preco": round(rng.uniform(5, 5000), 2),
+            })
+            if carga.cheio(Produto.__table__):
+                carga.descarregar(Produto.__table__)
+        carga.descarregar(Produto.__table__)
+    if any(carga.linhas.values()):
+        carga.relatorio()
+        print(f"Dados do benchmark gravados em {time.perf_counter() - inicio:.1f}s")
+
+
+# Apaga uma letra do meio da palavra (erro de digitação)
+def _com_erro(palavra: str, rng: random.Random) -> str:
+    posicao = rng.randrange(1, len(palavra) - 1)
+    return palavra[:posicao] + palavra[posicao + 1:]
+
+
+# Termos de cada tipo de busca: (tabela, termo). Os e-mails são de clientes gravados
+def _termos(rng: random.Random, emails: list[str]) -> dict[str, list[tuple[str, str]]]:
+    def vezes(gerar):
+        return [gerar() for _ in range(BUSCAS_POR_TIPO)]
+
+    return {
+        "cliente, prefixo": vezes(lambda: ("clientes", rng.choice(SOBRENOMES)[:4])),
+        "cliente, nome completo": vezes(lambda: ("clientes", f"{rng.choice(PRENOMES)} {rng.choice(SOBRENOMES)}")),
+        "cliente, e-mail": [("clientes", email) for email in emails],
+        "cliente, com erro": vezes(lambda: ("clientes", _com_erro(rng.choice(SOBRENOMES), rng))),
+        "produto, prefixo": vezes(lambda: ("produtos", rng.choice(ITENS)[:4])),
+        "produto, duas palavras": vezes(lambda: ("produtos", f"{rng.choice(ITENS)} {rng.choice(CORES)}")),
+        "produto, com erro": vezes(lambda: ("produtos", _com_erro(rng.choice(ITENS), rng))),
+    }
+
+
+def main():
+    if len(sys.argv) > 1:
+        url = sys.argv[1]
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'busca.db')}"
+
+    engine = create_engine(url)
+    aplicar_migracoes(engine)
+    rng = random.Random(0)
+    _popular(engine, rng)
+
+    print(f"{'busca':<24} {'resultados':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'máx (ms)':>9}")
+    with Session(engine) as db:
+        emails = list(db.execute(
+            select(Cliente.email).where(Cliente.id.in_(rng.sample(range(1, CLIENTES + 1), BUSCAS_POR_TIPO)))
+        ).scalars())
+        for tipo, termos in _termos(rng, emails).items():
+            tempos = []
+            resultados = 0
+            for tabela, termo in termos:
+                inicio = time.perf_counter()
+                resultados += len(buscar_por_termo(db, tabela, termo))
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            p95 = statistics.quantiles(tempos, n=20)[-1]
+            print(f"{tipo:<24} {resultados / len(termos):>10.1f} {statistics.median(tempos):>9.2f} "
+                  f"{p95:>9.2f} {max(tempos):>9.2f}{'' if p95 < META_MS else '  acima da meta'}")
+
+
+if __name__ == "__main__":
+    main()
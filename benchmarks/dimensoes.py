@@ -0,0 +1,133 @@
+# Benchmark do cache de dimensões (database/dimensoes.py) com 1M de clientes: memória do
+# MapaNomes (arrays de ids e de strings) contra um dict {id: nome}, tempo de resolver
+# 100, 10 mil e 1M de ids (searchsorted contra dict e contra a consulta no banco) e
+# tempo da carga incremental de clientes novos contra a carga completa.
+#
+# Completa a tabela clientes até 1M no banco informado e grava (e apaga no fim) os
+# clientes novos da carga incremental: use um banco de testes.
+# Uso: python -m benchmarks.dimensoes [URL]   (padrão: SQLite em arquivo temporário)
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import Session
+
+from database.bulk import CargaEmLotes
+from database.dimensoes import CacheDimensoes
+from database.migracoes import aplicar_migracoes
+from models.models import Cliente
+
+CLIENTES = 1_000_000
+NOVOS = 1_000
+CONSULTAS = (100, 10_000, 1_000_000)
+
+
+# Grava clientes sintéticos com os ids informados (sem Faker, para gerar 1M rapidamente)
+def _gravar_clientes(engine, ids):
+    with engine.begin() as conexao:
+        carga = CargaEmLotes(conexao, 50_000)
+        for cliente_id in ids:
+            carga.adicionar(Cliente.__table__, {
+                "id": cliente_id,
+                "nome": f"Cliente {cliente_id}",
+                "email": f"cliente{cliente_id}@example.com",
+                "telefone": f"(11) 9{cliente_id:08d}",
+            })
+            if carga.cheio(Cliente.__table__):
+                carga.descarregar(Cliente.__table__)
+        carga.descarregar(Cliente.__table__)
+
+
+def _proximo_id(engine) -> int:
+    with engine.connect() as conexao:
+        return (conexao.execute(select(func.max(Cliente.id))).scalar() or 0) + 1
+
+
+# Estimativa da memória de um dict {id: nome} (o dict, as chaves e as strings)
+def _tamanho_dict(nomes: dict) -> int:
+    return sys.getsizeof(nomes) + sum(sys.getsizeof(chave) + sys.getsizeof(nome) for chave, nome in nomes.items())
+
+
+def _cronometrar(funcao, repeticoes: int = 3) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos) * 1000
+
+
+# Carga, memória e tempo de resolver ids: MapaNomes contra dict {id: nome} e contra o
+# banco. O dict só existe dentro desta função e é liberado ao sair dela
+def _comparar_com_dict(db: Session, dimensoes: CacheDimensoes):
+    inicio = time.perf_counter()
+    mapa = dimensoes.mapa(db, "clientes")
+    carga_mapa = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    por_id = dict(db.execute(select(Cliente.id, Cliente.nome)).all())
+    carga_dict = time.perf_counter() - inicio
+
+    print(f"{len(mapa):,} clientes")
+    print(f"{'estrutura':<22} {'carga (s)':>10} {'memória (MB)':>13}")
+    print(f"{'MapaNomes':<22} {carga_mapa:>10.2f} {mapa.memoria() / 1024 / 1024:>13.1f}")
+    print(f"{'dict {id: nome}':<22} {carga_dict:>10.2f} {_tamanho_dict(por_id) / 1024 / 1024:>13.1f}")
+
+    rng = np.random.default_rng(0)
+    print(f"\n{'ids':>10} {'MapaNomes (ms)':>15} {'dict (ms)':>10} {'banco (ms)':>11}")
+    for quantidade in CONSULTAS:
+        ids = rng.choice(mapa.ids, quantidade)
+        lista = ids.tolist()
+        tempo_mapa = _cronometrar(lambda: mapa.resolver(ids))
+        tempo_dict = _cronometrar(lambda: [por_id.get(cliente_id) for cliente_id in lista])
+        tempo_banco = "-"
+        if quantidade <= 10_000:
+            consulta = select(Cliente.id, Cliente.nome).where(Cliente.id.in_(lista))
+            tempo_banco = f"{_cronometrar(lambda: db.execute(consulta).all()):.2f}"
+        print(f"{quantidade:>10,} {tempo_mapa:>15.2f} {tempo_dict:>10.2f} {tempo_banco:>11}")
+
+
+def main():
+    if len(sys.argv) > 1:
+        url = sys.argv[1]
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dimensoes.db')}"
+
+    engine = create_engine(url)
+    aplicar_migracoes(engine)
+    with engine.connect() as conexao:
+        existentes = conexao.execute(select(func.count()).select_from(Cliente)).scalar()
+    proximo_id = _proximo_id(engine)
+    _gravar_clientes(engine, range(proximo_id, proximo_id + max(CLIENTES - existentes, 0)))
+
+    dimensoes = CacheDimensoes()
+    with Session(engine) as db:
+        _comparar_com_dict(db, dimensoes)
+
+    # Carga incremental: clientes novos entram pelo watermark de max(id)
+    proximo_id = _proximo_id(engine)
+    novos = list(range(proximo_id, proximo_id + NOVOS))
+    _gravar_clientes(engine, novos)
+    try:
+        with Session(engine) as db:
+            inicio = time.perf_counter()
+            dimensoes.mapa(db, "clientes", verificar=True)
+            incremental = time.perf_counter() - inicio
+            assert dimensoes.nomes(db, "clientes", novos[-1:])[0] == f"Cliente {novos[-1]}"
+
+            dimensoes.limpar()
+            inicio = time.perf_counter()
+            dimensoes.mapa(db, "clientes")
+            completa = time.perf_counter() - inicio
+        print(f"\n{len(novos):,} clientes novos: carga incremental {incremental * 1000:.1f} ms, "
+              f"completa {completa * 1000:.1f} ms")
+    finally:
+        with engine.begin() as conexao:
+            conexao.execute(delete(Cliente).where(Cliente.id.in_(novos)))
+
+
+if __name__ == "__main__":
+    main()
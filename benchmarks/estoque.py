@@ -0,0 +1,111 @@
+# Benchmark e teste de concorrência do serviço de estoque: várias threads reservam
+# itens dos mesmos produtos até o estoque acabar; no fim, a quantidade no banco deve
+# ser exatamente a inicial menos o total reservado, sem nenhum produto negativo.
+# Mede também a vazão das consultas pelo índice local e das reservas no banco.
+# Altera o estoque da primeira loja durante o teste e restaura as quantidades no fim.
+#
+# Uso: python -m benchmarks.estoque
+import random
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import select, update
+
+from database.database import engine
+from database.estoque import EstoqueInsuficiente, ServicoEstoque
+from models.models import Estoque
+
+THREADS = 8
+PRODUTOS = 5
+ESTOQUE_INICIAL = 500
+CONSULTAS = 200_000
+
+
+def main():
+    servico = ServicoEstoque(engine)
+
+    with engine.connect() as conexao:
+        loja_id, = conexao.execute(select(Estoque.loja_id).order_by(Estoque.loja_id).limit(1)).one()
+        originais = dict(conexao.execute(
+            select(Estoque.produto_id, Estoque.quantidade)
+            .where(Estoque.loja_id == loja_id)
+            .order_by(Estoque.produto_id)
+            .limit(PRODUTOS)
+        ).all())
+    produtos = list(originais)
+
+    def definir(quantidades: dict[int, int]):
+        with engine.begin() as conexao:
+            for produto_id, quantidade in quantidades.items():
+                conexao.execute(
+                    update(Estoque)
+                    .where(Estoque.loja_id == loja_id, Estoque.produto_id == produto_id)
+                    .values(quantidade=quantidade)
+                )
+
+    definir(dict.fromkeys(produtos, ESTOQUE_INICIAL))
+    try:
+        servico.carregar()
+
+        # Consultas pelo índice local
+        inicio = time.perf_counter()
+        for indice in range(CONSULTAS):
+            servico.verificar(loja_id, [(produtos[indice % PRODUTOS], 1)])
+        consultas_por_segundo = CONSULTAS / (time.perf_counter() - inicio)
+
+        # Reservas concorrentes até esgotar
+        reservado = Counter()
+        recusadas = Counter()
+        lock = threading.Lock()
+
+        def vender(semente: int):
+            rng = random.Random(semente)
+            falhas_seguidas = 0
+            while falhas_seguidas < 20:
+                itens = [(produto_id, rng.randint(1, 3)) for produto_id in rng.sample(produtos, rng.randint(1, 3))]
+                try:
+                    servico.reservar(loja_id, itens)
+                except EstoqueInsuficiente:
+                    falhas_seguidas += 1
+                    with lock:
+                        recusadas[semente] += 1
+                    continue
+                falhas_seguidas = 0
+                with lock:
+                    for produto_id, quantidade in itens:
+                        reservado[produto_id] += quantidade
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=vender, args=(semente,)) for semente in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        segundos = time.perf_counter() - inicio
+
+        with engine.connect() as conexao:
+            finais = dict(conexao.execute(
+                select(Estoque.produto_id, Estoque.quantidade)
+                .where(Estoque.loja_id == loja_id, Estoque.produto_id.in_(produtos))
+            ).all())
+    finally:
+        definir(originais)
+
+    estatisticas = servico.estatisticas()
+    print(f"Consultas pelo índice local: {consultas_por_segundo:,.0f}/s")
+    print(f"Reservas: {estatisticas['baixas']} aceitas, {estatisticas['baixas recusadas']} recusadas "
+          f"em {segundos:.2f}s ({(estatisticas['baixas'] + estatisticas['baixas recusadas']) / segundos:,.0f}/s)")
+
+    print(f"{'produto':>8} {'inicial':>8} {'reservado':>10} {'final':>6} {'índice local':>13}")
+    ok = True
+    for produto_id in produtos:
+        final = finais[produto_id]
+        local = servico.quantidades.get((loja_id, produto_id))
+        print(f"{produto_id:>8} {ESTOQUE_INICIAL:>8} {reservado[produto_id]:>10} {final:>6} {local:>13}")
+        ok &= final >= 0 and final == ESTOQUE_INICIAL - reservado[produto_id] and local == final
+    print("Sem venda acima do estoque e índice local coerente" if ok else "ERRO: estoque inconsistente")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Benchmark dos índices das consultas do dashboard.
+# Mede planos (EXPLAIN) e latências das consultas quentes sem e com os índices de
+# INDICES_CONSULTAS. Remove e recria os índices: use um banco de testes, por exemplo
+# gerado com `python faker/gerar_dados.py --motor numpy --lojas 37` (~1M vendas).
+#
+# Uso: python -m benchmarks.indices
+import statistics
+import time
+from datetime import timedelta
+
+from sqlalchemy import DateTime, bindparam, func, select, text
+
+from database.database import engine
+from database.migracoes import INDICES_CONSULTAS, aplicar_migracoes
+from models.models import Venda
+
+REPETICOES = 5
+
+# Consultas quentes do dashboard: (nome, SQL)
+CONSULTAS = [
+    ("listagem de vendas (keyset)", """
+        SELECT v.id, c.nome, vd.nome, l.nome, v.total, v.data_venda
+        FROM vendas v
+        JOIN clientes c ON v.cliente_id = c.id
+        JOIN vendedores vd ON v.vendedor_id = vd.id
+        JOIN lojas l ON v.loja_id = l.id
+        WHERE v.data_venda < :fim
+        ORDER BY v.data_venda DESC, v.id DESC
+        LIMIT 101
+    """),
+    ("itens de uma página de vendas", """
+        SELECT pv.venda_id, pv.produto_id, p.nome, pv.quantidade, pv.preco_unitario
+        FROM produtos_venda pv
+        JOIN produtos p ON pv.produto_id = p.id
+        WHERE pv.venda_id BETWEEN :venda_inicial AND :venda_inicial + 99
+    """),
+    ("vendas de uma loja no mês", """
+        SELECT COUNT(*), SUM(total) FROM vendas
+        WHERE loja_id = :loja_id AND data_venda >= :inicio AND data_venda < :fim
+    """),
+    ("vendas de um cliente", """
+        SELECT id, total, data_venda FROM vendas WHERE cliente_id = :cliente_id ORDER BY data_venda DESC
+    """),
+    ("vendas de um vendedor", """
+        SELECT COUNT(*), SUM(total) FROM vendas WHERE vendedor_id = :vendedor_id
+    """),
+    ("vendas de um produto", """
+        SELECT COUNT(*), SUM(quantidade) FROM produtos_venda WHERE produto_id = :produto_id
+    """),
+]
+
+
+def _consulta(sql: str, prefixo: str = ""):
+    consulta = text(prefixo + sql)
+    datas = [bindparam(nome, type_=DateTime) for nome in ("inicio", "fim") if f":{nome}" in sql]
+    return consulta.bindparams(*datas) if datas else consulta
+
+
+# Parâmetros realistas tirados do próprio banco
+def _parametros(conexao) -> dict:
+    total_vendas, fim, venda_inicial = conexao.execute(
+        select(func.count(), func.max(Venda.data_venda), func.max(Venda.id) - 100)
+    ).one()
+    print(f"Base com {total_vendas} vendas")
+    return {
+        "fim": fim,
+        "inicio": fim - timedelta(days=30),
+        "venda_inicial": venda_inicial // 2,
+        "loja_id": 1,
+        "cliente_id": 42,
+        "vendedor_id": 7,
+        "produto_id": 100,
+    }
+
+
+def _explain(conexao, sql: str, parametros: dict) -> str:
+    if conexao.dialect.name == "postgresql":
+        linhas = conexao.execute(_consulta(sql, "EXPLAIN (ANALYZE, BUFFERS) "), parametros).scalars()
+    elif conexao.dialect.name == "sqlite":
+        linhas = (linha[-1] for linha in conexao.execute(_consulta(sql, "EXPLAIN QUERY PLAN "), parametros))
+    else:
+        linhas = conexao.execute(_consulta(sql, "EXPLAIN "), parametros).scalars()
+    return "\n".join(f"    {linha}" for linha in linhas)
+
+
+def _latencia_ms(conexao, sql: str, parametros: dict) -> float:
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        conexao.execute(_consulta(sql), parametros).all()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def _medir(conexao, parametros: dict) -> dict:
+    latencias = {}
+    for nome, sql in CONSULTAS:
+        latencias[nome] = _latencia_ms(conexao, sql, parametros)
+        print(f"\n{nome}: {latencias[nome]:.1f} ms (mediana de {REPETICOES})")
+        print(_explain(conexao, sql, parametros))
+    return latencias
+
+
+def main():
+    aplicar_migracoes(engine)
+
+    with engine.begin() as conexao:
+        parametros = _parametros(conexao)
+
+        print("\n=== Sem índices ===")
+        for tabela, nome in INDICES_CONSULTAS:
+            next(indice for indice in tabela.indexes if indice.name == nome).drop(conexao, checkfirst=True)
+        conexao.exec_driver_sql("ANALYZE")
+        antes = _medir(conexao, parametros)
+
+        print("\n=== Com índices ===")
+        for tabela, nome in INDICES_CONSULTAS:
+            next(indice for indice in tabela.indexes if indice.name == nome).create(conexao, checkfirst=True)
+        conexao.exec_driver_sql("ANALYZE")
+        depois = _medir(conexao, parametros)
+
+    print(f"\n{'consulta':<32} {'sem (ms)':>10} {'com (ms)':>10} {'ganho':>8}")
+    for nome, _ in CONSULTAS:
+        print(f"{nome:<32} {antes[nome]:>10.1f} {depois[nome]:>10.1f} {antes[nome] / depois[nome]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Benchmark da gravação de vendas em lote (database/ingestao.py): simula um feed de PDV
+# com vendas em dicts (cabeçalho, 3 itens e pagamento; metade sem preço, resolvido pela
+# tabela e pelas promoções; 1% com produto inexistente) e mede vendas/s para vários
+# tamanhos de lote, separando o tempo de validação. As vendas gravadas são apagadas no fim.
+#
+# Uso: python -m benchmarks.ingestao
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from database.cache import marcar_alteracao
+from database.database import engine
+from database.ingestao import IngestorVendas, validar_vendas
+from models.models import Cliente, Loja, Pagamento, Produto, ProdutosVenda, Venda, Vendedor
+
+VENDAS = 20_000
+TAMANHOS_LOTE = (100, 1_000, 5_000)
+METODOS = ("dinheiro", "cartão de crédito", "cartão de débito", "pix")
+
+
+def gerar_feed(quantidade: int, clientes, vendedores, lojas, produtos, rng: random.Random) -> list[dict]:
+    agora = datetime.now()
+    feed = []
+    for _ in range(quantidade):
+        itens = [{"produto_id": produto_id, "quantidade": rng.randint(1, 5)} for produto_id in rng.sample(produtos, 3)]
+        for item in itens[::2]:
+            item["preco_unitario"] = round(rng.uniform(10.0, 500.0), 2)
+        if rng.random() < 0.01:
+            itens[0]["produto_id"] = -1
+        feed.append({
+            "cliente_id": rng.choice(clientes),
+            "vendedor_id": rng.choice(vendedores),
+            "loja_id": rng.choice(lojas),
+            "data_venda": agora - timedelta(seconds=rng.randint(0, 3600)),
+            "itens": itens,
+            "pagamento": {"metodo": rng.choice(METODOS), "status": "aprovado"},
+        })
+    return feed
+
+
+def main():
+    with engine.connect() as conexao:
+        clientes = list(conexao.execute(select(Cliente.id)).scalars())
+        vendedores = list(conexao.execute(select(Vendedor.id)).scalars())
+        lojas = list(conexao.execute(select(Loja.id)).scalars())
+        produtos = list(conexao.execute(select(Produto.id)).scalars())
+
+    rng = random.Random(0)
+    feed = gerar_feed(VENDAS, clientes, vendedores, lojas, produtos, rng)
+    ingestor = IngestorVendas(engine)
+    ingestor.carregar()
+
+    gravadas = []
+    print(f"{'lote':>6} {'vendas':>7} {'rejeitadas':>11} {'validação (s)':>14} {'total (s)':>10} {'vendas/s':>10}")
+    try:
+        for tamanho_lote in TAMANHOS_LOTE:
+            lotes = [feed[inicio:inicio + tamanho_lote] for inicio in range(0, len(feed), tamanho_lote)]
+
+            inicio = time.perf_counter()
+            for lote in lotes:
+                validar_vendas(lote)
+            validacao = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            aceitas = rejeitadas = 0
+            for lote in lotes:
+                resultado = ingestor.ingerir(lote)
+                gravadas.extend(resultado["ids"].values())
+                aceitas += len(resultado["ids"])
+                rejeitadas += len(resultado["rejeitadas"])
+            segundos = time.perf_counter() - inicio
+            print(f"{tamanho_lote:>6} {aceitas:>7} {rejeitadas:>11} {validacao:>14.2f} {segundos:>10.2f} "
+                  f"{aceitas / segundos:>10,.0f}")
+    finally:
+        # Remove as vendas do benchmark
+        with engine.begin() as conexao:
+            for inicio in range(0, len(gravadas), 10_000):
+                ids = gravadas[inicio:inicio + 10_000]
+                conexao.execute(delete(Pagamento).where(Pagamento.venda_id.in_(ids)))
+                conexao.execute(delete(ProdutosVenda).where(ProdutosVenda.venda_id.in_(ids)))
+                conexao.execute(delete(Venda).where(Venda.id.in_(ids)))
+            marcar_alteracao(conexao, Venda.__tablename__, ProdutosVenda.__tablename__, Pagamento.__tablename__)
+        print(f"{len(gravadas)} vendas do benchmark removidas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Benchmark das listagens do dashboard: caminho antigo (entidades do ORM -> dicts ->
+# DataFrame) contra buscar_dataframe (select() do Core só com as colunas exibidas,
+# DataFrame direto das tuplas do cursor ou, no PostgreSQL, de um COPY lido pelo Arrow).
+# Cada medição roda em um processo novo para isolar o pico de memória (RSS).
+#
+# Recria a tabela clientes no banco informado: use um banco de testes.
+# Uso: python -m benchmarks.listagens [URL]   (padrão: SQLite em arquivo temporário)
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from database.bulk import CargaEmLotes
+from database.consultas import buscar_dataframe
+from models.models import Cliente
+
+TAMANHOS = (100_000, 1_000_000)
+
+
+# Clientes sintéticos (sem Faker, para gerar 1M rapidamente)
+def _popular_clientes(engine, quantidade: int):
+    Cliente.__table__.drop(engine, checkfirst=True)
+    Cliente.__table__.create(engine)
+    with engine.begin() as conexao:
+        carga = CargaEmLotes(conexao, 50_000)
+        for cliente_id in range(1, quantidade + 1):
+            carga.adicionar(Cliente.__table__, {
+                "id": cliente_id,
+                "nome": f"Cliente {cliente_id}",
+                "email": f"cliente{cliente_id}@example.com",
+                "telefone": f"(11) 9{cliente_id:08d}",
+            })
+            if carga.cheio(Cliente.__table__):
+                carga.descarregar(Cliente.__table__)
+        carga.descarregar(Cliente.__table__)
+
+
+def _caminho_orm(db: Session) -> pd.DataFrame:
+    clientes = db.query(Cliente).all()
+    clientes_data = [{"ID": cliente.id, "Nome": cliente.nome, "Email": cliente.email, "Telefone": cliente.telefone} for cliente in clientes]
+    return pd.DataFrame(clientes_data)
+
+
+def _caminho_core(db: Session) -> pd.DataFrame:
+    return buscar_dataframe(db, select(
+        Cliente.id.label("ID"),
+        Cliente.nome.label("Nome"),
+        Cliente.email.label("Email"),
+        Cliente.telefone.label("Telefone"),
+    ))
+
+
+CAMINHOS = {"ORM + dicts": _caminho_orm, "Core (buscar_dataframe)": _caminho_core}
+
+
+# Executada em um processo novo: mede tempo e o aumento do pico de RSS
+def _medir(url: str, caminho: str, fila):
+    engine = create_engine(url)
+    with Session(engine) as db:
+        db.connection()
+        rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        inicio = time.perf_counter()
+        df = CAMINHOS[caminho](db)
+        segundos = time.perf_counter() - inicio
+        rss_final = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fila.put((segundos, (rss_final - rss_inicial) / 1024, len(df)))
+
+
+def main():
+    if len(sys.argv) > 1:
+        url = sys.argv[1]
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'listagens.db')}"
+
+    contexto = multiprocessing.get_context("spawn")
+    print(f"{'clientes':>10} {'caminho':<26} {'tempo (s)':>10} {'pico RSS (MB)':>14}")
+    for quantidade in TAMANHOS:
+        _popular_clientes(create_engine(url), quantidade)
+        for caminho in CAMINHOS:
+            fila = contexto.Queue()
+            processo = contexto.Process(target=_medir, args=(url, caminho, fila))
+            processo.start()
+            segundos, memoria_mb, linhas = fila.get()
+            processo.join()
+            print(f"{linhas:>10} {caminho:<26} {segundos:>10.2f} {memoria_mb:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
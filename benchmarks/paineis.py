@@ -0,0 +1,49 @@
+# Benchmark do caminho assíncrono: tempo de parede para montar a página de resumo
+# (painéis por dia, por loja e por categoria) com as consultas em sequência na
+# sessão síncrona e em paralelo (asyncio.gather) no engine assíncrono.
+# Requer asyncpg (PostgreSQL) ou aiosqlite (SQLite).
+#
+# Uso: python -m benchmarks.paineis
+import statistics
+import time
+
+from database.consultas import buscar_paineis_resumo, periodo_resumos
+from database.database import engine_assincrono, executar_assincrono, sessao
+
+REPETICOES = 20
+
+
+def _medir(funcao) -> float:
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    with sessao() as db:
+        inicio, fim = periodo_resumos.__wrapped__(db)
+        print(f"Resumos de {inicio} a {fim}")
+
+        # Sem o cache: chama a função decorada original
+        paineis = buscar_paineis_resumo.__wrapped__
+
+        # Aquece conexões dos dois pools antes de medir
+        paineis(db, inicio, fim, assincrono=False)
+        paineis(db, inicio, fim, assincrono=True)
+
+        sincrono = _medir(lambda: paineis(db, inicio, fim, assincrono=False))
+        assincrono = _medir(lambda: paineis(db, inicio, fim, assincrono=True))
+
+    print(f"{'caminho':<12} {'mediana (ms)':>14}")
+    print(f"{'síncrono':<12} {sincrono:>14.1f}")
+    print(f"{'assíncrono':<12} {assincrono:>14.1f}")
+    print(f"ganho: {sincrono / assincrono:.2f}x")
+
+    executar_assincrono(engine_assincrono().dispose())
+
+
+if __name__ == "__main__":
+    main()
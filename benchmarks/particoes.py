@@ -0,0 +1,59 @@
+# Benchmark do particionamento mensal: para cada consulta dos indicadores (página
+# Indicadores), conta no plano (EXPLAIN) quantas partições de vendas e produtos_venda
+# são lidas com janelas de 1, 3 e 12 meses e mede a latência. Com a poda de partições,
+# a janela de 1 mês lê só as partições do mês, e não a tabela toda.
+# Requer PostgreSQL com a migração 6 aplicada (python -m database.migracoes).
+#
+# Uso: python -m benchmarks.particoes
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from database.consultas import CONSULTAS_KPI, buscar_kpi, periodo_vendas
+from database.database import engine, sessao
+from database.particoes import TABELAS_PARTICIONADAS, listar_particoes, particionada
+
+REPETICOES = 5
+JANELAS_DIAS = (30, 90, 365)
+
+_PARTICAO = re.compile(r"\b((?:%s)_\d{4}_\d{2})\b" % "|".join(tabela.name for tabela in TABELAS_PARTICIONADAS))
+
+
+# Partições que aparecem no plano da consulta
+def _particoes_no_plano(db, consulta) -> set[str]:
+    compilada = consulta.compile(dialect=engine.dialect)
+    plano = db.connection().exec_driver_sql(f"EXPLAIN {compilada}", compilada.params).scalars()
+    return {nome for linha in plano for nome in _PARTICAO.findall(linha)}
+
+
+def _latencia_ms(db, nome: str, inicio, fim) -> float:
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio_consulta = time.perf_counter()
+        buscar_kpi.__wrapped__(db, nome, inicio, fim)  # Sem o cache
+        tempos.append((time.perf_counter() - inicio_consulta) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    with sessao() as db:
+        if not particionada(db.connection()):
+            print("vendas não é particionada: aplique a migração 6 em um banco PostgreSQL")
+            return
+
+        total_particoes = sum(len(listar_particoes(db.connection(), tabela.name)) for tabela in TABELAS_PARTICIONADAS)
+        _, fim = periodo_vendas.__wrapped__(db)
+        print(f"{total_particoes} partições (vendas + produtos_venda); última venda em {fim}")
+
+        print(f"\n{'indicador':<14} {'janela':>7} {'partições':>10} {'mediana (ms)':>13}")
+        for nome, consulta in CONSULTAS_KPI.items():
+            for dias in JANELAS_DIAS:
+                inicio = fim - timedelta(days=dias - 1)
+                lidas = _particoes_no_plano(db, consulta(inicio, fim))
+                latencia = _latencia_ms(db, nome, inicio, fim)
+                print(f"{nome:<14} {dias:>6}d {len(lidas):>4}/{total_particoes:<5} {latencia:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Benchmark do índice de promoções: resolve o preço de 1M pares (produto_id, instante)
+# ao longo de um ano em um único passe vetorizado e compara com a busca linha a linha
+# (percorrendo as promoções do produto), que é medida em uma amostra e projetada.
+# Confere na amostra que os dois caminhos dão o mesmo desconto. Não usa o banco.
+#
+# Uso: python -m benchmarks.promocoes
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from database.promocoes import IndicePromocoes
+
+PRODUTOS = 1000
+PROMOCOES = 5000
+CONSULTAS = 1_000_000
+AMOSTRA = 20_000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    fim_periodo = datetime(2025, 1, 1)
+    inicio_periodo = fim_periodo - timedelta(days=365)
+
+    inicios = np.datetime64(inicio_periodo, "s") + rng.integers(0, 365 * 86400, size=PROMOCOES).astype("timedelta64[s]")
+    duracoes = rng.integers(3 * 86400, 30 * 86400, size=PROMOCOES).astype("timedelta64[s]")
+    promocoes = list(zip(
+        rng.integers(1, PRODUTOS + 1, size=PROMOCOES).tolist(),
+        rng.choice([0.05, 0.10, 0.15, 0.20, 0.30, 0.50], size=PROMOCOES).tolist(),
+        inicios.tolist(),
+        (inicios + duracoes).tolist(),
+    ))
+
+    inicio = time.perf_counter()
+    indice = IndicePromocoes(promocoes)
+    montagem = time.perf_counter() - inicio
+
+    produto_ids = rng.integers(1, PRODUTOS + 1, size=CONSULTAS)
+    instantes = np.datetime64(inicio_periodo, "s") + rng.integers(0, 365 * 86400, size=CONSULTAS).astype("timedelta64[s]")
+    precos_base = np.round(rng.uniform(10.0, 500.0, size=CONSULTAS), 2)
+
+    inicio = time.perf_counter()
+    precos = indice.precos(produto_ids, precos_base, instantes)
+    vetorizado = time.perf_counter() - inicio
+
+    # Linha a linha: maior desconto entre as promoções do produto que cobrem o instante
+    por_produto = {}
+    for produto_id, desconto, data_inicio, data_fim in promocoes:
+        por_produto.setdefault(produto_id, []).append((data_inicio, data_fim, desconto))
+
+    inicio = time.perf_counter()
+    descontos_linha = []
+    for produto_id, instante in zip(produto_ids[:AMOSTRA].tolist(), instantes[:AMOSTRA].tolist()):
+        descontos_linha.append(max(
+            (desconto for data_inicio, data_fim, desconto in por_produto.get(produto_id, ()) if data_inicio <= instante <= data_fim),
+            default=0.0,
+        ))
+    linha_a_linha = (time.perf_counter() - inicio) * CONSULTAS / AMOSTRA
+
+    iguais = np.array_equal(indice.descontos_em(produto_ids[:AMOSTRA], instantes[:AMOSTRA]), np.array(descontos_linha))
+    com_promocao = (precos < precos_base).mean()
+
+    print(f"{PROMOCOES} promoções em {PRODUTOS} produtos -> {len(indice.chaves)} segmentos ({montagem * 1000:.0f} ms)")
+    print(f"{'caminho':<28} {'1M consultas (s)':>17} {'consultas/s':>13}")
+    print(f"{'vetorizado':<28} {vetorizado:>17.3f} {CONSULTAS / vetorizado:>13,.0f}")
+    print(f"{'linha a linha (projetado)':<28} {linha_a_linha:>17.3f} {CONSULTAS / linha_a_linha:>13,.0f}")
+    print(f"Itens com promoção: {com_promocao:.1%}; resultados iguais na amostra: {'sim' if iguais else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
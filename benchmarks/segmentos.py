@@ -0,0 +1,113 @@
+# Benchmark dos segmentos RFM e das coortes (database/segmentos.py): completa o banco
+# com 1M de clientes e 10M de vendas sintéticas (só as colunas usadas pelos segmentos:
+# cliente, data e total) e mede a reconstrução completa (meta: 10M de vendas em menos
+# de 1 minuto) e a atualização incremental com 100 mil vendas novas.
+#
+# Grava clientes e vendas no banco informado e apaga no fim as vendas novas da
+# atualização incremental (os segmentos ficam com elas até a próxima reconstrução):
+# use um banco de testes.
+# Uso: python -m benchmarks.segmentos [URL]   (padrão: SQLite em arquivo temporário)
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, delete, func, select
+
+from database.bulk import gravar_dataframe, proximo_id, sincronizar_sequencia
+from database.migracoes import aplicar_migracoes
+from database.particoes import garantir_particoes
+from database.segmentos import atualizar_segmentos, reconstruir_segmentos
+from models.models import Cliente, ClienteSegmento, Venda
+
+CLIENTES = 1_000_000
+VENDAS = 10_000_000
+NOVAS = 100_000
+DIAS = 365
+LOTE = 200_000
+META_S = 60
+
+
+def _contar(engine, model) -> int:
+    with engine.connect() as conexao:
+        return conexao.execute(select(func.count()).select_from(model)).scalar()
+
+
+# Grava clientes sintéticos até CLIENTES (sem Faker, para gerar 1M rapidamente)
+def _completar_clientes(engine):
+    with engine.begin() as conexao:
+        inicio = proximo_id(conexao, Cliente.__table__)
+        faltantes = CLIENTES - conexao.execute(select(func.count()).select_from(Cliente)).scalar()
+        for lote in range(inicio, inicio + max(faltantes, 0), LOTE):
+            ids = np.arange(lote, min(lote + LOTE, inicio + faltantes))
+            gravar_dataframe(conexao, Cliente.__table__, pd.DataFrame({
+                "id": ids, "nome": [f"Cliente {cliente_id}" for cliente_id in ids],
+            }))
+        sincronizar_sequencia(conexao, Cliente.__table__)
+
+
+# Grava quantidade vendas sintéticas nos últimos DIAS dias, para clientes sorteados.
+# Retorna os ids gravados
+def _gravar_vendas(engine, quantidade: int, rng: np.random.Generator) -> range:
+    hoje = datetime.today()
+    with engine.begin() as conexao:
+        garantir_particoes(conexao, (hoje - timedelta(days=DIAS)).date(), hoje.date())
+        clientes_ids = np.asarray(conexao.execute(select(Cliente.id)).scalars().all())
+        inicio = proximo_id(conexao, Venda.__table__)
+        for lote in range(inicio, inicio + quantidade, LOTE):
+            ids = np.arange(lote, min(lote + LOTE, inicio + quantidade))
+            segundos = rng.integers(0, DIAS * 86400, len(ids)).astype("timedelta64[s]")
+            gravar_dataframe(conexao, Venda.__table__, pd.DataFrame({
+                "id": ids,
+                "cliente_id": rng.choice(clientes_ids, len(ids)),
+                "data_venda": np.datetime64(hoje, "s") - segundos,
+                "total": np.round(rng.lognormal(4.5, 0.8, len(ids)), 2),
+            }))
+        sincronizar_sequencia(conexao, Venda.__table__)
+    return range(inicio, inicio + quantidade)
+
+
+def main():
+    if len(sys.argv) > 1:
+        url = sys.argv[1]
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'segmentos.db')}"
+
+    engine = create_engine(url)
+    aplicar_migracoes(engine)
+    rng = np.random.default_rng(0)
+
+    inicio = time.perf_counter()
+    _completar_clientes(engine)
+    faltantes = VENDAS - _contar(engine, Venda)
+    if faltantes > 0:
+        _gravar_vendas(engine, faltantes, rng)
+        print(f"{faltantes:,} vendas gravadas em {time.perf_counter() - inicio:.1f}s")
+
+    vendas = _contar(engine, Venda)
+    inicio = time.perf_counter()
+    reconstruir_segmentos(engine)
+    completa = time.perf_counter() - inicio
+
+    novas = _gravar_vendas(engine, NOVAS, rng)
+    try:
+        inicio = time.perf_counter()
+        atualizar_segmentos(engine)
+        incremental = time.perf_counter() - inicio
+    finally:
+        with engine.begin() as conexao:
+            conexao.execute(delete(Venda).where(Venda.id >= novas.start))
+
+    clientes = _contar(engine, ClienteSegmento)
+    print(f"\n{'execução':<24} {'vendas':>12} {'segundos':>9} {'vendas/s':>12}")
+    print(f"{'reconstrução completa':<24} {vendas:>12,} {completa:>9.1f} {vendas / completa:>12,.0f}"
+          f"{'' if vendas < VENDAS or completa < META_S else '  acima da meta'}")
+    print(f"{'incremental':<24} {NOVAS:>12,} {incremental:>9.1f} {NOVAS / incremental:>12,.0f}")
+    print(f"{clientes:,} clientes segmentados")
+
+
+if __name__ == "__main__":
+    main()
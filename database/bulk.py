@@ -0,0 +1,132 @@
+import csv
+import io
+import time
+from collections import defaultdict
+
+import pandas as pd
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+# Tamanho padrão dos lotes gravados no banco
+TAMANHO_LOTE = 10_000
+
+
+# Verifica se a conexão suporta COPY (PostgreSQL via psycopg2)
+def suporta_copy(conexao: Connection) -> bool:
+    dialeto = conexao.dialect
+    return dialeto.name == "postgresql" and dialeto.driver == "psycopg2"
+
+
+# Grava as linhas com COPY ... FROM STDIN usando um buffer CSV em memória
+def _gravar_copy(conexao: Connection, tabela: Table, colunas: list[str], linhas: list[dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for linha in linhas:
+        writer.writerow([linha.get(coluna) for coluna in colunas])
+    buffer.seek(0)
+    _copy_buffer(conexao, tabela, colunas, buffer)
+
+
+# Executa o COPY a partir de um buffer CSV já preenchido
+def _copy_buffer(conexao: Connection, tabela: Table, colunas: list[str], buffer: io.StringIO):
+    comando = f"COPY {tabela.name} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conexao.connection.cursor()
+    try:
+        cursor.copy_expert(comando, buffer)
+    finally:
+        cursor.close()
+
+
+# Grava um lote de linhas na tabela e retorna a quantidade gravada
+def gravar_lote(conexao: Connection, tabela: Table, linhas: list[dict]) -> int:
+    if not linhas:
+        return 0
+
+    if suporta_copy(conexao):
+        _gravar_copy(conexao, tabela, list(linhas[0].keys()), linhas)
+    else:
+        # executemany com um único INSERT compilado
+        conexao.execute(tabela.insert(), linhas)
+    return len(linhas)
+
+
+# Grava um DataFrame (colunas = colunas da tabela) e retorna a quantidade gravada
+def gravar_dataframe(conexao: Connection, tabela: Table, df: pd.DataFrame) -> int:
+    if df.empty:
+        return 0
+
+    if suporta_copy(conexao):
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        _copy_buffer(conexao, tabela, list(df.columns), buffer)
+    else:
+        conexao.execute(tabela.insert(), df.to_dict("records"))
+    return len(df)
+
+
+# INSERT com suporte a ON CONFLICT (on_conflict_do_nothing/on_conflict_do_update)
+# no dialeto da conexão
+def insert_com_conflito(conexao: Connection, tabela: Table):
+    if conexao.dialect.name == "postgresql":
+        return postgresql.insert(tabela)
+    if conexao.dialect.name == "sqlite":
+        return sqlite.insert(tabela)
+    raise NotImplementedError(f"ON CONFLICT não suportado no dialeto {conexao.dialect.name}")
+
+
+# Retorna o próximo id livre da tabela, para pré-alocar ids antes da carga
+def proximo_id(conexao: Connection, tabela: Table) -> int:
+    maior_id = conexao.execute(select(func.coalesce(func.max(tabela.c.id), 0))).scalar()
+    return maior_id + 1
+
+
+# Ajusta a sequence do PostgreSQL depois de inserir ids explícitos
+def sincronizar_sequencia(conexao: Connection, tabela: Table):
+    if conexao.dialect.name != "postgresql":
+        return
+    conexao.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{tabela.name}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {tabela.name}), 0) + 1, false)"
+    ))
+
+
+# Acumula linhas por tabela e mede a vazão (linhas/s) de cada uma
+class CargaEmLotes:
+    def __init__(self, conexao: Connection, tamanho_lote: int = TAMANHO_LOTE):
+        self.conexao = conexao
+        self.tamanho_lote = tamanho_lote
+        self.pendentes = defaultdict(list)
+        self.linhas = defaultdict(int)
+        self.segundos = defaultdict(float)
+
+    def adicionar(self, tabela: Table, linha: dict):
+        self.pendentes[tabela].append(linha)
+
+    def cheio(self, tabela: Table) -> bool:
+        return len(self.pendentes[tabela]) >= self.tamanho_lote
+
+    # Grava as linhas pendentes das tabelas na ordem informada (respeitando as FKs)
+    def descarregar(self, *tabelas: Table):
+        for tabela in tabelas:
+            linhas = self.pendentes.pop(tabela, [])
+            inicio = time.perf_counter()
+            self.linhas[tabela.name] += gravar_lote(self.conexao, tabela, linhas)
+            self.segundos[tabela.name] += time.perf_counter() - inicio
+
+    # Grava um DataFrame inteiro em fatias de tamanho_lote linhas
+    def gravar_dataframe(self, tabela: Table, df: pd.DataFrame):
+        for inicio_fatia in range(0, len(df), self.tamanho_lote):
+            fatia = df.iloc[inicio_fatia:inicio_fatia + self.tamanho_lote]
+            inicio = time.perf_counter()
+            self.linhas[tabela.name] += gravar_dataframe(self.conexao, tabela, fatia)
+            self.segundos[tabela.name] += time.perf_counter() - inicio
+
+    def relatorio(self):
+        for nome, total in self.linhas.items():
+            if not total:
+                continue
+            segundos = self.segundos[nome]
+            vazao = total / segundos if segundos else 0.0
+            print(f"{nome}: {total} linhas em {segundos:.2f}s ({vazao:,.0f} linhas/s)")
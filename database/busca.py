@@ -0,0 +1,326 @@
+import re
+import unicodedata
+
+import pandas as pd
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database.cache import em_cache
+from models.models import Cliente, Produto
+
+# Resultados por busca
+LIMITE_BUSCA = 50
+
+# Tamanho mínimo das palavras buscadas (os índices de trigramas precisam de 3 caracteres)
+MIN_CARACTERES_BUSCA = 3
+
+# Normalização do texto indexado no PostgreSQL (sem depender da extensão unaccent):
+# minúsculas, sem acentos e com os separadores de e-mail virando espaço, para "joao"
+# achar "João" e "gmail" achar "joao@gmail.com"
+_ACENTOS = "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ@._-"
+_SEM_ACENTOS = "aaaaaeeeeiiiiooooouuuucnaaaaaeeeeiiiiooooouuuucn    "
+
+# Texto indexado de cada tabela: colunas buscadas e colunas exibidas no resultado
+_BUSCAS = {
+    "produtos": {
+        "model": Produto,
+        "texto": ("nome",),
+        "colunas": (
+            Produto.id.label("ID"),
+            Produto.nome.label("Nome"),
+            Produto.preco.label("Preço"),
+            Produto.categoria_id.label("Categoria ID"),
+        ),
+    },
+    "clientes": {
+        "model": Cliente,
+        "texto": ("nome", "email"),
+        "colunas": (
+            Cliente.id.label("ID"),
+            Cliente.nome.label("Nome"),
+            Cliente.email.label("Email"),
+            Cliente.telefone.label("Telefone"),
+        ),
+    },
+}
+
+# SQLite mínimo para o tokenizador trigram com remove_diacritics (busca por substring).
+# Nas versões anteriores as tabelas FTS5 usam o unicode61 (busca por prefixo das palavras)
+SQLITE_MINIMO_TRIGRAM = (3, 45)
+TOKENIZADORES_FTS5 = {"trigram": "trigram remove_diacritics 1", "unicode61": "unicode61 remove_diacritics 2"}
+
+# Engines em que o pg_trgm está instalado e tokenizador das tabelas FTS5 de cada engine
+# SQLite (None sem as tabelas; consultado uma vez por engine)
+_TRIGRAMAS = {}
+_FTS5 = {}
+
+
+# Expressão do documento de busca no PostgreSQL. A consulta usa a mesma expressão do
+# índice GIN, senão o planner não usa o índice
+def _documento_pg(colunas: tuple[str, ...]) -> str:
+    texto = " || ' ' || ".join(f"coalesce({coluna}, '')" for coluna in colunas)
+    return f"to_tsvector('simple', translate(lower({texto}), '{_ACENTOS}', '{_SEM_ACENTOS}'))"
+
+
+# Palavras do termo, normalizadas como o texto indexado (minúsculas, sem acentos e
+# sem separadores), descartando as menores que MIN_CARACTERES_BUSCA
+def palavras_busca(termo: str) -> list[str]:
+    texto = unicodedata.normalize("NFKD", termo.lower())
+    texto = "".join(caractere for caractere in texto if not unicodedata.combining(caractere))
+    return [palavra for palavra in re.findall(r"[^\W_]+", texto) if len(palavra) >= MIN_CARACTERES_BUSCA]
+
+
+# Migração 8: índices de busca por nome dos produtos e por nome e e-mail dos clientes.
+# PostgreSQL: GIN de texto completo (prefixo das palavras), B-tree do e-mail e, se a extensão pg_trgm
+# puder ser instalada, GIN de trigramas (busca aproximada, com erros de digitação).
+# SQLite: tabelas FTS5 sincronizadas por triggers, com tokenizador de trigramas (3.45 ou
+# mais novo) ou, nas versões anteriores, unicode61 sem acentos. Nos demais bancos a
+# busca usa LIKE
+def criar_indices_busca(conexao: Connection):
+    if conexao.dialect.name == "postgresql":
+        _criar_indices_pg(conexao)
+    elif conexao.dialect.name == "sqlite":
+        _criar_indices_fts5(conexao)
+
+
+def _criar_indices_pg(conexao: Connection):
+    for tabela, busca in _BUSCAS.items():
+        conexao.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{tabela}_busca ON {tabela} USING gin ({_documento_pg(busca['texto'])})"
+        )
+    # E-mails digitados inteiros ou pelo começo: prefixo pela B-tree (no texto completo,
+    # palavras como "com" e "gmail" estão em quase todas as linhas)
+    conexao.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_clientes_email_busca ON clientes (lower(email) text_pattern_ops)"
+    )
+
+    # Sem permissão ou sem o pacote contrib, a busca aproximada fica só por prefixos
+    try:
+        with conexao.begin_nested():
+            conexao.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as erro:
+        print(f"pg_trgm indisponível ({erro.__class__.__name__}): busca aproximada só por prefixos")
+        return
+    for tabela, busca in _BUSCAS.items():
+        for coluna in busca["texto"]:
+            conexao.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{tabela}_{coluna}_trgm ON {tabela} USING gin ({coluna} gin_trgm_ops)"
+            )
+    _TRIGRAMAS.clear()
+
+
+def _criar_indices_fts5(conexao: Connection):
+    versao = conexao.dialect.server_version_info
+    if versao >= SQLITE_MINIMO_TRIGRAM:
+        tokenizador = TOKENIZADORES_FTS5["trigram"]
+    else:
+        tokenizador = TOKENIZADORES_FTS5["unicode61"]
+        print(f"SQLite {'.'.join(map(str, versao))} sem trigram remove_diacritics (3.45+): busca por prefixo")
+    for tabela, busca in _BUSCAS.items():
+        colunas = ", ".join(busca["texto"])
+        novas = ", ".join(f"new.{coluna}" for coluna in busca["texto"])
+        antigas = ", ".join(f"old.{coluna}" for coluna in busca["texto"])
+        conexao.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabela}_busca USING fts5({colunas}, content='{tabela}', "
+            f"content_rowid='id', tokenize='{tokenizador}')"
+        )
+        conexao.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {tabela}_busca_insert AFTER INSERT ON {tabela} BEGIN "
+            f"INSERT INTO {tabela}_busca(rowid, {colunas}) VALUES (new.id, {novas}); END"
+        )
+        conexao.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {tabela}_busca_delete AFTER DELETE ON {tabela} BEGIN "
+            f"INSERT INTO {tabela}_busca({tabela}_busca, rowid, {colunas}) VALUES ('delete', old.id, {antigas}); END"
+        )
+        conexao.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {tabela}_busca_update AFTER UPDATE OF {colunas} ON {tabela} BEGIN "
+            f"INSERT INTO {tabela}_busca({tabela}_busca, rowid, {colunas}) VALUES ('delete', old.id, {antigas}); "
+            f"INSERT INTO {tabela}_busca(rowid, {colunas}) VALUES (new.id, {novas}); END"
+        )
+        # Indexa as linhas que já existem
+        conexao.exec_driver_sql(f"INSERT INTO {tabela}_busca({tabela}_busca) VALUES ('rebuild')")
+    _FTS5.clear()
+
+
+def _tem_trigramas(conexao: Connection) -> bool:
+    if conexao.engine not in _TRIGRAMAS:
+        _TRIGRAMAS[conexao.engine] = conexao.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return _TRIGRAMAS[conexao.engine]
+
+
+def _tokenizador_fts5(conexao: Connection):
+    if conexao.engine not in _FTS5:
+        sql = conexao.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'produtos_busca'")
+        ).scalar()
+        _FTS5[conexao.engine] = None if sql is None else "trigram" if "trigram" in sql else "unicode61"
+    return _FTS5[conexao.engine]
+
+
+# Variações menores da palavra para a busca aproximada, das maiores para as menores:
+# prefixos e, com sufixos=True, sufixos com pelo menos MIN_CARACTERES_BUSCA caracteres
+# (toleram um erro de digitação no fim ou no começo da palavra)
+def _variacoes(palavra: str, sufixos: bool) -> list[str]:
+    variacoes = []
+    for tamanho in range(len(palavra) - 1, MIN_CARACTERES_BUSCA - 1, -1):
+        variacoes.append(palavra[:tamanho])
+        if sufixos:
+            variacoes.append(palavra[-tamanho:])
+    return variacoes
+
+
+# Troca as palavras sem resultado pela maior variação que aparece no índice. Palavras
+# sem nenhuma variação no índice são descartadas
+def _aproximar(palavras: list[str], existe, sufixos: bool) -> list[str]:
+    aproximadas = []
+    for palavra in palavras:
+        variacoes = [palavra, *_variacoes(palavra, sufixos)]
+        aproximada = next((variacao for variacao in variacoes if existe(variacao)), None)
+        if aproximada is not None:
+            aproximadas.append(aproximada)
+    return aproximadas
+
+
+# PostgreSQL: linhas com palavras que começam com todos os termos, pelo índice de texto
+# completo, em ordem de id. As encontradas ficam em um CTE materializado: sem ele, com
+# ORDER BY id e LIMIT, o planner percorre a chave primária recalculando o documento de
+# cada linha (a estimativa de prefixos raros é ruim) e um termo sem resultado leva
+# segundos. Termos com "@" são buscados antes como começo do e-mail. Se faltarem
+# resultados, completa com os nomes/e-mails mais parecidos pelo pg_trgm
+# (word_similarity) ou, sem a extensão, com prefixos menores das palavras
+def _buscar_pg(conexao: Connection, tabela: str, termo: str, palavras: list[str], limite: int) -> list:
+    busca = _BUSCAS[tabela]
+    model = busca["model"]
+    documento = literal_column(_documento_pg(busca["texto"]))
+
+    def encontradas(palavras: list[str]):
+        consulta = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{palavra}:*" for palavra in palavras))
+        return select(*busca["colunas"]).where(documento.op("@@")(consulta)).cte().prefix_with("MATERIALIZED")
+
+    def buscar(palavras: list[str], quantidade: int, excluir: list[int]) -> list:
+        linhas = encontradas(palavras)
+        return conexao.execute(
+            select(linhas).where(linhas.c.ID.notin_(excluir)).order_by(linhas.c.ID).limit(quantidade)
+        ).all()
+
+    if "@" in termo and "email" in busca["texto"]:
+        prefixo = termo.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        linhas = conexao.execute(
+            select(*busca["colunas"]).where(func.lower(model.email).like(f"{prefixo}%")).order_by(model.id).limit(limite)
+        ).all()
+        if linhas:
+            return linhas
+
+    linhas = buscar(palavras, limite, [])
+    if len(linhas) >= limite:
+        return linhas
+    encontrados = [linha[0] for linha in linhas]
+
+    if _tem_trigramas(conexao):
+        similaridade = func.greatest(*(func.word_similarity(termo, getattr(model, coluna)) for coluna in busca["texto"]))
+        return linhas + conexao.execute(
+            select(*busca["colunas"])
+            .where(or_(*(getattr(model, coluna).op("%>")(termo) for coluna in busca["texto"])),
+                   model.id.notin_(encontrados))
+            .order_by(similaridade.desc(), model.id)
+            .limit(limite - len(linhas))
+        ).all()
+
+    # Com uma palavra, a própria busca de cada prefixo diz se ele existe
+    if len(palavras) == 1:
+        for prefixo in _variacoes(palavras[0], sufixos=False):
+            parecidas = buscar([prefixo], limite - len(linhas), encontrados)
+            if parecidas:
+                return linhas + parecidas
+        return linhas
+
+    def existe(palavra: str) -> bool:
+        return conexao.execute(select(encontradas([palavra])).limit(1)).first() is not None
+
+    aproximadas = _aproximar(palavras, existe, sufixos=False)
+    if not aproximadas or aproximadas == palavras:
+        return linhas
+    return linhas + buscar(aproximadas, limite - len(linhas), encontrados)
+
+
+# SQLite: FTS5. Linhas que contêm todas as palavras, em qualquer ordem e sem diferenciar
+# acentos, em ordem de id, que o FTS5 percorre sem ordenar as encontradas. Com trigramas
+# a palavra pode estar no meio do texto; com unicode61, no começo de uma palavra. Se
+# faltarem resultados, completa com prefixos (e, com trigramas, sufixos) menores das palavras
+def _buscar_fts5(conexao: Connection, tabela: str, palavras: list[str], limite: int, tokenizador: str) -> list:
+    busca = _BUSCAS[tabela]
+    model = busca["model"]
+    indice = table(f"{tabela}_busca", column("rowid"))
+    prefixo = "" if tokenizador == "trigram" else "*"
+
+    def filtro(palavras: list[str]):
+        return literal_column(indice.name).op("MATCH")(" AND ".join(f'"{palavra}"{prefixo}' for palavra in palavras))
+
+    def buscar(palavras: list[str], quantidade: int, excluir: list[int]) -> list:
+        return conexao.execute(
+            select(*busca["colunas"])
+            .select_from(indice)
+            .join(model, model.id == indice.c.rowid)
+            .where(filtro(palavras), model.id.notin_(excluir))
+            .order_by(indice.c.rowid)
+            .limit(quantidade)
+        ).all()
+
+    linhas = buscar(palavras, limite, [])
+    if len(linhas) >= limite:
+        return linhas
+
+    def existe(palavra: str) -> bool:
+        return conexao.execute(select(indice.c.rowid).where(filtro([palavra])).limit(1)).first() is not None
+
+    aproximadas = _aproximar(palavras, existe, sufixos=tokenizador == "trigram")
+    if not aproximadas or aproximadas == palavras:
+        return linhas
+    return linhas + buscar(aproximadas, limite - len(linhas), [linha[0] for linha in linhas])
+
+
+# Busca até limite linhas da tabela ("produtos" ou "clientes") pelo termo, usando os
+# índices da migração 8. Em outros bancos, cai para LIKE: cada palavra do termo (só
+# letras e números, sem curingas) em alguma das colunas buscadas
+def buscar_por_termo(db: Session, tabela: str, termo: str, limite: int = LIMITE_BUSCA) -> pd.DataFrame:
+    busca = _BUSCAS[tabela]
+    colunas = [coluna.name for coluna in busca["colunas"]]
+    palavras = palavras_busca(termo)
+    if not palavras:
+        return pd.DataFrame(columns=colunas)
+
+    conexao = db.connection()
+    if conexao.dialect.name == "postgresql":
+        linhas = _buscar_pg(conexao, tabela, termo, palavras, limite)
+    elif conexao.dialect.name == "sqlite" and _tokenizador_fts5(conexao):
+        linhas = _buscar_fts5(conexao, tabela, palavras, limite, _tokenizador_fts5(conexao))
+    else:
+        model = busca["model"]
+        palavras_termo = [
+            palavra for palavra in re.findall(r"[^\W_]+", termo) if len(palavra) >= MIN_CARACTERES_BUSCA
+        ]
+        linhas = conexao.execute(
+            select(*busca["colunas"])
+            .where(*(
+                or_(*(getattr(model, coluna).ilike(f"%{palavra}%") for coluna in busca["texto"]))
+                for palavra in palavras_termo
+            ))
+            .order_by(model.id)
+            .limit(limite)
+        ).all()
+    return pd.DataFrame.from_records(linhas, columns=colunas)
+
+
+# Produtos pelo nome, para a busca do dashboard
+@em_cache("produtos")
+def buscar_produtos_por_termo(db: Session, termo: str, limite: int = LIMITE_BUSCA) -> pd.DataFrame:
+    return buscar_por_termo(db, "produtos", termo, limite)
+
+
+# Clientes pelo nome ou e-mail, para a busca do dashboard
+@em_cache("clientes")
+def buscar_clientes_por_termo(db: Session, termo: str, limite: int = LIMITE_BUSCA) -> pd.DataFrame:
+    return buscar_por_termo(db, "clientes", termo, limite)
@@ -0,0 +1,181 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database.bulk import insert_com_conflito
+from models.models import Watermark
+
+# Prefixo dos watermarks usados como versão de cada tabela
+PREFIXO_VERSAO = "tabela:"
+
+# TTL (segundos) dos resultados em cache por tabela; o resultado usa o menor TTL
+# entre as tabelas que consulta
+TTL_PADRAO = 60
+TTLS = {
+    "regioes": 3600,
+    "lojas": 3600,
+    "categorias": 3600,
+    "produtos": 600,
+    "promocoes": 600,
+    "vendedores": 600,
+    "clientes": 300,
+    "vendas": 60,
+    "produtos_venda": 60,
+    "vendas_diarias_loja": 300,
+    "vendas_diarias_produto": 300,
+    "snapshot": 300,
+    "clientes_segmentos": 300,
+    "coortes_clientes": 300,
+}
+
+
+# Estimativa do tamanho em memória de um resultado
+def _tamanho(valor) -> int:
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(sys.getsizeof(item) for item in valor)
+    return sys.getsizeof(valor)
+
+
+# Transforma os argumentos da consulta em uma chave hashable
+def _congelar(valor):
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(item) for item in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((chave, _congelar(item)) for chave, item in valor.items()))
+    return valor
+
+
+# Cache de resultados de consultas, compartilhado por todas as sessões do Streamlit
+# do processo. Cada entrada expira pelo TTL das tabelas consultadas, é descartada
+# quando uma dessas tabelas é invalidada e, acima de max_bytes, as menos usadas
+# recentemente saem primeiro (LRU)
+class CacheConsultas:
+    def __init__(self, max_bytes: int, ttls: dict[str, int] = None):
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {}
+        self.entradas = OrderedDict()  # chave -> (valor, expira_em, tabelas, tamanho)
+        self.por_tabela = {}  # tabela -> chaves que dependem dela
+        self.versoes = None  # versões das tabelas lidas do banco
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.expiradas = 0
+        self.descartadas = 0
+        self.invalidadas = 0
+        self._lock = threading.RLock()
+
+    def _remover(self, chave):
+        _, _, tabelas, tamanho = self.entradas.pop(chave)
+        self.bytes -= tamanho
+        for tabela in tabelas:
+            self.por_tabela.get(tabela, set()).discard(chave)
+
+    def obter(self, chave, tabelas: tuple[str, ...], carregar):
+        with self._lock:
+            entrada = self.entradas.get(chave)
+            if entrada is not None:
+                if entrada[1] > time.monotonic():
+                    self.entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return entrada[0]
+                self._remover(chave)
+                self.expiradas += 1
+            self.falhas += 1
+
+        valor = carregar()
+        tamanho = _tamanho(valor)
+        ttl = min((self.ttls.get(tabela, TTL_PADRAO) for tabela in tabelas), default=TTL_PADRAO)
+
+        with self._lock:
+            if chave in self.entradas:
+                self._remover(chave)
+            if tamanho > self.max_bytes:
+                return valor
+            self.entradas[chave] = (valor, time.monotonic() + ttl, tabelas, tamanho)
+            self.bytes += tamanho
+            for tabela in tabelas:
+                self.por_tabela.setdefault(tabela, set()).add(chave)
+            while self.bytes > self.max_bytes:
+                self._remover(next(iter(self.entradas)))
+                self.descartadas += 1
+        return valor
+
+    # Descarta todos os resultados que dependem das tabelas informadas
+    def invalidar(self, *tabelas: str):
+        with self._lock:
+            for tabela in tabelas:
+                for chave in list(self.por_tabela.get(tabela, ())):
+                    self._remover(chave)
+                    self.invalidadas += 1
+
+    def limpar(self):
+        with self._lock:
+            for chave in list(self.entradas):
+                self._remover(chave)
+
+    # Compara as versões das tabelas no banco com as já vistas e invalida as que
+    # mudaram (ex.: o gerador de dados rodou em outro processo). Uma consulta por rerun
+    def sincronizar(self, db: Session):
+        versoes = dict(db.execute(
+            select(Watermark.nome, Watermark.valor).where(Watermark.nome.startswith(PREFIXO_VERSAO))
+        ).all())
+        with self._lock:
+            if self.versoes is not None:
+                alteradas = [
+                    nome.removeprefix(PREFIXO_VERSAO)
+                    for nome in versoes.keys() | self.versoes.keys()
+                    if versoes.get(nome) != self.versoes.get(nome)
+                ]
+                self.invalidar(*alteradas)
+            self.versoes = versoes
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa de acerto": self.acertos / consultas if consultas else 0.0,
+                "entradas": len(self.entradas),
+                "memória (MB)": self.bytes / 1024 / 1024,
+                "expiradas": self.expiradas,
+                "invalidadas": self.invalidadas,
+                "descartadas (LRU)": self.descartadas,
+            }
+
+
+cache = CacheConsultas(max_bytes=int(os.getenv("CACHE_MAX_MB", "256")) * 1024 * 1024, ttls=TTLS)
+
+
+# Decorador para funções de consulta no formato f(db, *args, **kwargs): o resultado
+# fica em cache por (função, argumentos) e depende das tabelas informadas
+def em_cache(*tabelas: str):
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def wrapper(db: Session, *args, **kwargs):
+            chave = (funcao.__qualname__, _congelar(args), _congelar(kwargs))
+            return cache.obter(chave, tabelas, lambda: funcao(db, *args, **kwargs))
+        return wrapper
+    return decorador
+
+
+# Hook de escrita: incrementa a versão das tabelas alteradas no banco (para os outros
+# processos) e invalida o cache deste processo. Chamar na mesma transação da escrita
+def marcar_alteracao(conexao: Connection, *tabelas: str):
+    for tabela in tabelas:
+        upsert = insert_com_conflito(conexao, Watermark.__table__).values(nome=PREFIXO_VERSAO + tabela, valor=1)
+        conexao.execute(upsert.on_conflict_do_update(
+            index_elements=[Watermark.nome],
+            set_={"valor": Watermark.valor + 1},
+        ))
+    cache.invalidar(*tabelas)
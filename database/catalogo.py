@@ -0,0 +1,163 @@
+import argparse
+import time
+from collections import Counter
+
+import pandas as pd
+from sqlalchemy import ARRAY, Integer, String, and_, bindparam, delete, func, select, tuple_, update
+from sqlalchemy.engine import Connection, Engine
+
+from database.bulk import insert_com_conflito
+from database.cache import marcar_alteracao
+from models.models import Categoria, Produto
+
+# Linhas do CSV por lote (uma transação por lote)
+TAMANHO_LOTE_CATALOGO = 50_000
+
+# Chaves naturais por consulta de produtos existentes
+_CHAVES_POR_CONSULTA = 5_000
+
+
+# Lê o catálogo (colunas nome, categoria e, opcional, preco) em lotes de tamanho_lote
+# linhas, sem carregar o arquivo inteiro. Linhas repetidas no lote ficam com a última
+def ler_catalogo(caminho: str, tamanho_lote: int = TAMANHO_LOTE_CATALOGO):
+    tipos = {"nome": "string", "categoria": "string", "preco": "float64"}
+    with pd.read_csv(caminho, chunksize=tamanho_lote, dtype=tipos) as leitor:
+        for lote in leitor:
+            lote["nome"] = lote["nome"].str.strip()
+            lote["categoria"] = lote["categoria"].str.strip()
+            if "preco" not in lote:
+                lote["preco"] = float("nan")
+            lote = lote.dropna(subset=["nome", "categoria"])
+            yield lote.drop_duplicates(subset=["categoria", "nome"], keep="last")
+
+
+# Ids das categorias pelo nome, criando de uma vez as que faltam no banco.
+# ids é o cache {nome: id} do import, completado aqui
+def resolver_categorias(conexao: Connection, nomes, ids: dict[str, int]) -> dict[str, int]:
+    faltantes = sorted(set(nomes) - ids.keys())
+    if faltantes:
+        conexao.execute(
+            insert_com_conflito(conexao, Categoria.__table__).on_conflict_do_nothing(index_elements=[Categoria.nome]),
+            [{"nome": nome} for nome in faltantes],
+        )
+        ids.update(conexao.execute(select(Categoria.nome, Categoria.id).where(Categoria.nome.in_(faltantes))).all())
+    return ids
+
+
+# Preço dos produtos já cadastrados entre as chaves (categoria_id, nome). No PostgreSQL
+# as chaves vão como dois arrays e entram por unnest no join com o índice único
+# (a lista de tuplas no IN vira um OR por chave, dez vezes mais lento)
+def _produtos_existentes(conexao: Connection, chaves: list[tuple[int, str]]) -> dict[tuple[int, str], float]:
+    if conexao.dialect.name == "postgresql":
+        categoria_ids, nomes = zip(*chaves)
+        lista = func.unnest(
+            bindparam("categoria_ids", list(categoria_ids), type_=ARRAY(Integer)),
+            bindparam("nomes", list(nomes), type_=ARRAY(String)),
+        ).table_valued("categoria_id", "nome").render_derived()
+        consulta = select(Produto.categoria_id, Produto.nome, Produto.preco).join(
+            lista, and_(Produto.categoria_id == lista.c.categoria_id, Produto.nome == lista.c.nome)
+        )
+    else:
+        consulta = select(Produto.categoria_id, Produto.nome, Produto.preco).where(
+            tuple_(Produto.categoria_id, Produto.nome).in_(chaves)
+        )
+    return {(categoria_id, nome): preco for categoria_id, nome, preco in conexao.execute(consulta)}
+
+
+# Grava um lote do catálogo por chave natural (categoria, nome): produtos novos são
+# inseridos, os com preço diferente são atualizados e os demais não são regravados.
+# Retorna a contagem de inseridos, atualizados e inalterados
+def importar_lote(conexao: Connection, lote: pd.DataFrame, categorias: dict[str, int]) -> Counter:
+    resolver_categorias(conexao, lote["categoria"].unique(), categorias)
+    chaves = list(zip(lote["categoria"].map(categorias).tolist(), lote["nome"].tolist()))
+    precos = [None if pd.isna(preco) else preco for preco in lote["preco"].tolist()]
+
+    existentes = {}
+    for inicio in range(0, len(chaves), _CHAVES_POR_CONSULTA):
+        existentes.update(_produtos_existentes(conexao, chaves[inicio:inicio + _CHAVES_POR_CONSULTA]))
+
+    contagem = Counter(inseridos=0, atualizados=0, inalterados=0)
+    linhas = []
+    for (categoria_id, nome), preco in zip(chaves, precos):
+        if (categoria_id, nome) not in existentes:
+            contagem["inseridos"] += 1
+        elif preco is not None and preco != existentes[(categoria_id, nome)]:
+            contagem["atualizados"] += 1
+        else:
+            contagem["inalterados"] += 1
+            continue
+        linhas.append({"categoria_id": categoria_id, "nome": nome, "preco": preco})
+
+    if linhas:
+        upsert = insert_com_conflito(conexao, Produto.__table__)
+        conexao.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[Produto.categoria_id, Produto.nome],
+                set_={"preco": func.coalesce(upsert.excluded.preco, Produto.preco)},
+            ),
+            linhas,
+        )
+    return contagem
+
+
+# Importa o catálogo de um CSV em lotes, uma transação por lote (rodar de novo continua
+# de onde parou, sem duplicar). Retorna a contagem de inseridos, atualizados e inalterados
+def importar_catalogo(engine: Engine, caminho: str, tamanho_lote: int = TAMANHO_LOTE_CATALOGO) -> Counter:
+    with engine.connect() as conexao:
+        categorias = dict(conexao.execute(select(Categoria.nome, Categoria.id)).all())
+
+    contagem = Counter(inseridos=0, atualizados=0, inalterados=0)
+    inicio = time.perf_counter()
+    for lote in ler_catalogo(caminho, tamanho_lote):
+        with engine.begin() as conexao:
+            contagem.update(importar_lote(conexao, lote, categorias))
+        linhas = sum(contagem.values())
+        print(f"{linhas:,} produtos ({linhas / (time.perf_counter() - inicio):,.0f}/s)", end="\r", flush=True)
+
+    if contagem["inseridos"] or contagem["atualizados"]:
+        with engine.begin() as conexao:
+            marcar_alteracao(conexao, Produto.__tablename__, Categoria.__tablename__)
+    print(f"Catálogo importado em {time.perf_counter() - inicio:.1f}s: "
+          f"{contagem['inseridos']:,} inseridos, {contagem['atualizados']:,} atualizados, "
+          f"{contagem['inalterados']:,} inalterados")
+    return contagem
+
+
+# Prepara as chaves naturais do catálogo (usado pela migração 7): categorias repetidas
+# são unificadas na de menor id e produtos repetidos na mesma categoria recebem o id
+# no nome ("nome #id"), mantendo as vendas, o estoque e as promoções de cada um
+def deduplicar_catalogo(conexao: Connection):
+    por_nome = {}
+    for categoria_id, nome in conexao.execute(select(Categoria.id, Categoria.nome).order_by(Categoria.id)):
+        por_nome.setdefault(nome, []).append(categoria_id)
+    for manter, *repetidas in por_nome.values():
+        if repetidas:
+            conexao.execute(update(Produto).where(Produto.categoria_id.in_(repetidas)).values(categoria_id=manter))
+            conexao.execute(delete(Categoria).where(Categoria.id.in_(repetidas)))
+
+    repetidos = (
+        select(Produto.categoria_id, Produto.nome)
+        .group_by(Produto.categoria_id, Produto.nome)
+        .having(func.count() > 1)
+    )
+    vistos = set()
+    for produto_id, categoria_id, nome in conexao.execute(
+        select(Produto.id, Produto.categoria_id, Produto.nome)
+        .where(tuple_(Produto.categoria_id, Produto.nome).in_(repetidos))
+        .order_by(Produto.id)
+    ).all():
+        if (categoria_id, nome) in vistos:
+            conexao.execute(update(Produto).where(Produto.id == produto_id).values(nome=f"{nome} #{produto_id}"))
+        vistos.add((categoria_id, nome))
+
+
+# Uso: python -m database.catalogo faker/produtos.csv [--tamanho-lote N]
+if __name__ == "__main__":
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Importa o catálogo de produtos de um CSV (nome, categoria, preco)")
+    parser.add_argument("caminho", help="arquivo CSV do catálogo")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_CATALOGO, help="linhas por transação")
+    args = parser.parse_args()
+
+    importar_catalogo(engine, args.caminho, args.tamanho_lote)
@@ -0,0 +1,475 @@
+import io
+import statistics
+import time
+from collections import Counter, deque
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow
+import pyarrow.csv
+from sqlalchemy import Date, Float, func, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from database.bulk import suporta_copy
+from database.cache import em_cache
+from database.database import DB_ASYNC, executar_assincrono, executar_em_paralelo
+from database.perfil import perfil
+
+from models.models import (
+    Categoria, Cliente, ClienteSegmento, CoorteClientes, Loja, Produto, ProdutosVenda, Regiao, Venda, VendaDiariaLoja,
+    VendaDiariaProduto, Watermark,
+)
+
+# Tipos Arrow das colunas lidas por COPY, pelo tipo Python da coluna no select
+TIPOS_ARROW = {str: pyarrow.string(), int: pyarrow.int64(), float: pyarrow.float64()}
+
+
+# Executa um select() do Core e monta o DataFrame direto das tuplas do cursor, sem
+# criar entidades do ORM. No PostgreSQL (psycopg2), exporta o resultado com COPY ...
+# TO STDOUT e o lê como Arrow, sem passar por objetos Python por linha
+def buscar_dataframe(db: Session, consulta) -> pd.DataFrame:
+    conexao = db.connection()
+    if suporta_copy(conexao):
+        return _buscar_dataframe_arrow(conexao, consulta)
+
+    resultado = db.execute(consulta)
+    return pd.DataFrame.from_records(resultado.fetchall(), columns=list(resultado.keys()))
+
+
+def _buscar_dataframe_arrow(conexao, consulta) -> pd.DataFrame:
+    sql = consulta.compile(dialect=conexao.dialect, compile_kwargs={"literal_binds": True})
+    copy = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    buffer = io.BytesIO()
+    cursor = conexao.connection.cursor()
+    try:
+        inicio = time.perf_counter()
+        cursor.copy_expert(copy, buffer)
+        perfil.registrar(copy, (time.perf_counter() - inicio) * 1000, cursor.rowcount)
+    finally:
+        cursor.close()
+    buffer.seek(0)
+
+    # Tipos das colunas vindos do select, para o Arrow não adivinhar (ex.: telefones)
+    tipos = {}
+    for coluna in consulta.selected_columns:
+        try:
+            tipo_python = coluna.type.python_type
+        except NotImplementedError:  # ex.: NullType, tipos de func sem tipo declarado
+            continue
+        if tipo_python in TIPOS_ARROW:
+            tipos[coluna.name] = TIPOS_ARROW[tipo_python]
+
+    tabela = pyarrow.csv.read_csv(buffer, convert_options=pyarrow.csv.ConvertOptions(
+        column_types=tipos, strings_can_be_null=True,
+    ))
+    return tabela.to_pandas()
+
+
+# Clientes para a listagem do dashboard (os primeiros limite por id)
+@em_cache("clientes")
+def buscar_clientes(db: Session, limite: int = None) -> pd.DataFrame:
+    return buscar_dataframe(db, select(
+        Cliente.id.label("ID"),
+        Cliente.nome.label("Nome"),
+        Cliente.email.label("Email"),
+        Cliente.telefone.label("Telefone"),
+    ).order_by(Cliente.id).limit(limite))
+
+
+# Produtos para a listagem do dashboard (os primeiros limite por id)
+@em_cache("produtos")
+def buscar_produtos(db: Session, limite: int = None) -> pd.DataFrame:
+    return buscar_dataframe(db, select(
+        Produto.id.label("ID"),
+        Produto.nome.label("Nome"),
+        Produto.preco.label("Preço"),
+        Produto.categoria_id.label("Categoria ID"),
+    ).order_by(Produto.id).limit(limite))
+
+
+# Lojas para a listagem do dashboard
+@em_cache("lojas")
+def buscar_lojas(db: Session) -> pd.DataFrame:
+    return buscar_dataframe(db, select(
+        Loja.id.label("ID"),
+        Loja.nome.label("Nome"),
+        Loja.regiao_id.label("Região ID"),
+    ).order_by(Loja.id))
+
+
+# Consulta das vendas da listagem: só as colunas da tabela de vendas (os nomes de
+# cliente, vendedor e loja vêm do cache de dimensões, em database/dimensoes.py)
+def consulta_vendas():
+    return select(
+        Venda.id.label("Venda_ID"),
+        Venda.cliente_id,
+        Venda.vendedor_id,
+        Venda.loja_id,
+        Venda.total.label("Total"),
+        Venda.data_venda.label("Data_da_Venda"),
+    )
+
+
+# Conta o total de vendas da listagem. No PostgreSQL usa a estimativa do planner
+# (pg_class.reltuples), que não varre a tabela; nos demais bancos faz o COUNT. Com vendas
+# particionada, soma a estimativa das partições: o autovacuum não analisa a tabela mãe,
+# cuja estimativa fica em -1 ou parada na do último ANALYZE manual
+@em_cache("vendas")
+def contar_vendas(db: Session) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        particoes, estimativa = db.execute(text("""
+            SELECT count(*), sum(greatest(filha.reltuples, 0))::bigint
+            FROM pg_inherits
+            JOIN pg_class filha ON filha.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:tabela)
+        """), {"tabela": Venda.__tablename__}).one()
+        if particoes:
+            return estimativa
+        estimativa = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :tabela"),
+            {"tabela": Venda.__tablename__},
+        ).scalar()
+        # reltuples é -1 enquanto a tabela nunca foi analisada
+        if estimativa is not None and estimativa >= 0:
+            return estimativa
+    return db.execute(select(func.count()).select_from(Venda)).scalar()
+
+
+# Busca uma página de vendas por keyset em (data_venda, id), da mais recente para a
+# mais antiga. Com "apos" traz a página seguinte a essa chave; com "antes", a anterior.
+# O custo não depende da posição da página (usa o índice ix_vendas_data_venda_id)
+@em_cache("vendas")
+def buscar_vendas(db: Session, limite: int, apos: tuple = None, antes: tuple = None):
+    chave = tuple_(Venda.data_venda, Venda.id)
+    tipos = (Venda.data_venda.type, Venda.id.type)
+    consulta = consulta_vendas()
+
+    if antes is not None:
+        consulta = consulta.where(chave > tuple_(*antes, types=tipos)).order_by(Venda.data_venda, Venda.id)
+        return list(reversed(db.execute(consulta.limit(limite)).all()))
+
+    if apos is not None:
+        consulta = consulta.where(chave < tuple_(*apos, types=tipos))
+    consulta = consulta.order_by(Venda.data_venda.desc(), Venda.id.desc())
+    return db.execute(consulta.limit(limite)).all()
+
+
+# Busca os itens de várias vendas de uma vez (uma consulta, sem o nome do produto).
+# datas_venda (as dos cabeçalhos) limitam data_venda do primeiro ao último dia delas,
+# para o planner ler só as partições desses meses
+@em_cache("produtos_venda")
+def buscar_itens_vendas(db: Session, venda_ids: list[int], datas_venda: list):
+    if not venda_ids:
+        return []
+    return db.execute(
+        select(
+            ProdutosVenda.venda_id,
+            ProdutosVenda.produto_id,
+            ProdutosVenda.quantidade,
+            ProdutosVenda.preco_unitario,
+            ProdutosVenda.subtotal,
+        )
+        .where(
+            ProdutosVenda.venda_id.in_(venda_ids),
+            ProdutosVenda.data_venda.between(min(datas_venda), max(datas_venda)),
+        )
+        .order_by(ProdutosVenda.venda_id, ProdutosVenda.id)
+    ).all()
+
+
+# Uma página da listagem de vendas: cabeçalhos (com uma venda a mais para saber se há
+# página seguinte), itens de todas de uma vez e nomes de cliente, vendedor, loja e
+# produto pelo cache de dimensões (database/dimensoes.py), sem join. No máximo duas
+# consultas com as dimensões já carregadas
+def buscar_pagina_vendas(db: Session, dimensoes, por_pagina: int, apos: tuple = None, antes: tuple = None) -> dict:
+    vendas = buscar_vendas(db, por_pagina + 1, apos=apos, antes=antes)
+    if antes is not None:
+        vendas, tem_proxima = vendas[-por_pagina:], True
+    else:
+        vendas, tem_proxima = vendas[:por_pagina], len(vendas) > por_pagina
+
+    itens = buscar_itens_vendas(
+        db, [venda.Venda_ID for venda in vendas], [venda.Data_da_Venda for venda in vendas]
+    )
+    produtos = dimensoes.nomes(db, "produtos", [item.produto_id for item in itens]).tolist()
+    itens_por_venda = {}
+    for item, produto in zip(itens, produtos):
+        itens_por_venda.setdefault(item.venda_id, []).append((item, produto))
+
+    return {
+        "vendas": vendas,
+        "tem_proxima": tem_proxima,
+        "clientes": dimensoes.nomes(db, "clientes", [venda.cliente_id for venda in vendas]).tolist(),
+        "vendedores": dimensoes.nomes(db, "vendedores", [venda.vendedor_id for venda in vendas]).tolist(),
+        "lojas": dimensoes.nomes(db, "lojas", [venda.loja_id for venda in vendas]).tolist(),
+        "itens": itens_por_venda,
+    }
+
+
+# Receita, tickets e ticket médio por loja no período, lidos do resumo diário
+def consulta_resumo_por_loja(inicio, fim):
+    return (
+        select(
+            Loja.nome.label("Loja"),
+            func.sum(VendaDiariaLoja.receita).label("Receita"),
+            func.sum(VendaDiariaLoja.tickets).label("Tickets"),
+            (func.sum(VendaDiariaLoja.receita) / func.sum(VendaDiariaLoja.tickets)).label("Ticket_Medio"),
+        )
+        .join(Loja, VendaDiariaLoja.loja_id == Loja.id)
+        .where(VendaDiariaLoja.dia.between(inicio, fim))
+        .group_by(Loja.id, Loja.nome)
+        .order_by(func.sum(VendaDiariaLoja.receita).desc())
+    )
+
+
+# Receita e quantidade por categoria no período, lidas do resumo diário
+def consulta_resumo_por_categoria(inicio, fim):
+    return (
+        select(
+            Categoria.nome.label("Categoria"),
+            func.sum(VendaDiariaProduto.receita).label("Receita"),
+            func.sum(VendaDiariaProduto.quantidade).label("Quantidade"),
+        )
+        .join(Categoria, VendaDiariaProduto.categoria_id == Categoria.id)
+        .where(VendaDiariaProduto.dia.between(inicio, fim))
+        .group_by(Categoria.id, Categoria.nome)
+        .order_by(func.sum(VendaDiariaProduto.receita).desc())
+    )
+
+
+# Receita e tickets por dia no período, lidos do resumo diário
+def consulta_resumo_por_dia(inicio, fim):
+    return (
+        select(
+            VendaDiariaLoja.dia.label("Dia"),
+            func.sum(VendaDiariaLoja.receita).label("Receita"),
+            func.sum(VendaDiariaLoja.tickets).label("Tickets"),
+        )
+        .where(VendaDiariaLoja.dia.between(inicio, fim))
+        .group_by(VendaDiariaLoja.dia)
+        .order_by(VendaDiariaLoja.dia)
+    )
+
+
+# Painéis do resumo de vendas: linhas (por dia, por loja, por categoria). As consultas
+# são independentes; com DB_ASYNC rodam ao mesmo tempo no engine assíncrono
+@em_cache("vendas_diarias_loja", "vendas_diarias_produto", "lojas", "categorias")
+def buscar_paineis_resumo(db: Session, inicio, fim, assincrono: bool = DB_ASYNC):
+    consultas = (
+        consulta_resumo_por_dia(inicio, fim),
+        consulta_resumo_por_loja(inicio, fim),
+        consulta_resumo_por_categoria(inicio, fim),
+    )
+    if assincrono:
+        return tuple(executar_assincrono(executar_em_paralelo(*consultas)))
+    return tuple(db.execute(consulta).all() for consulta in consultas)
+
+
+# Primeiro e último dia presentes no resumo diário
+@em_cache("vendas_diarias_loja")
+def periodo_resumos(db: Session):
+    return db.execute(select(func.min(VendaDiariaLoja.dia), func.max(VendaDiariaLoja.dia))).one()
+
+
+# Watermark (última venda somada e quando) de um processo incremental
+def buscar_watermark(db: Session, nome: str):
+    return db.execute(select(Watermark.valor, Watermark.atualizado_em).where(Watermark.nome == nome)).first()
+
+
+# Vendas no período [inicio, fim] (dias inteiros), pelo índice de data_venda. Com as
+# tabelas particionadas por mês, o filtro também descarta as partições fora do período
+def _no_periodo(inicio, fim, coluna=Venda.data_venda):
+    return (coluna >= inicio) & (coluna < fim + timedelta(days=1))
+
+
+# Indicadores (KPIs) agregados no banco a partir das tabelas de vendas: só as linhas
+# do resultado saem do banco
+def consulta_kpi_por_loja(inicio, fim):
+    return (
+        select(
+            Loja.nome.label("Loja"),
+            func.sum(Venda.total).label("Receita"),
+            func.count(Venda.id).label("Vendas"),
+            (func.sum(Venda.total) / func.count(Venda.id)).label("Ticket Médio"),
+        )
+        .join(Loja, Venda.loja_id == Loja.id)
+        .where(_no_periodo(inicio, fim))
+        .group_by(Loja.id, Loja.nome)
+        .order_by(func.sum(Venda.total).desc())
+    )
+
+
+def consulta_kpi_por_regiao(inicio, fim):
+    return (
+        select(
+            Regiao.nome.label("Região"),
+            func.sum(Venda.total).label("Receita"),
+            func.count(Venda.id).label("Vendas"),
+            (func.sum(Venda.total) / func.count(Venda.id)).label("Ticket Médio"),
+        )
+        .join(Loja, Venda.loja_id == Loja.id)
+        .join(Regiao, Loja.regiao_id == Regiao.id)
+        .where(_no_periodo(inicio, fim))
+        .group_by(Regiao.id, Regiao.nome)
+        .order_by(func.sum(Venda.total).desc())
+    )
+
+
+def consulta_kpi_por_categoria(inicio, fim):
+    receita = func.sum(ProdutosVenda.subtotal)
+    return (
+        select(
+            Categoria.nome.label("Categoria"),
+            receita.label("Receita"),
+            func.sum(ProdutosVenda.quantidade).label("Quantidade"),
+        )
+        .select_from(ProdutosVenda)
+        .join(Produto, ProdutosVenda.produto_id == Produto.id)
+        .join(Categoria, Produto.categoria_id == Categoria.id)
+        .where(_no_periodo(inicio, fim, ProdutosVenda.data_venda))
+        .group_by(Categoria.id, Categoria.nome)
+        .order_by(receita.desc())
+    )
+
+
+def consulta_kpi_por_dia(inicio, fim):
+    dia = func.date(Venda.data_venda, type_=Date)
+    return (
+        select(
+            dia.label("Dia"),
+            func.sum(Venda.total).label("Receita"),
+            func.count(Venda.id).label("Vendas"),
+            (func.sum(Venda.total) / func.count(Venda.id)).label("Ticket Médio"),
+        )
+        .where(_no_periodo(inicio, fim))
+        .group_by(dia)
+        .order_by(dia)
+    )
+
+
+def consulta_top_produtos(inicio, fim, limite: int = 20):
+    receita = func.sum(ProdutosVenda.subtotal)
+    return (
+        select(
+            Produto.nome.label("Produto"),
+            Categoria.nome.label("Categoria"),
+            receita.label("Receita"),
+            func.sum(ProdutosVenda.quantidade).label("Quantidade"),
+        )
+        .select_from(ProdutosVenda)
+        .join(Produto, ProdutosVenda.produto_id == Produto.id)
+        .join(Categoria, Produto.categoria_id == Categoria.id)
+        .where(_no_periodo(inicio, fim, ProdutosVenda.data_venda))
+        .group_by(Produto.id, Produto.nome, Categoria.nome)
+        .order_by(receita.desc())
+        .limit(limite)
+    )
+
+
+# Totais do período: receita, vendas, ticket médio e itens por venda (uma linha, sem
+# ler os itens: usa Venda.total e Venda.qtd_itens)
+def consulta_ticket_medio(inicio, fim):
+    return select(
+        func.sum(Venda.total).label("Receita"),
+        func.count(Venda.id).label("Vendas"),
+        (func.sum(Venda.total) / func.count(Venda.id)).label("Ticket Médio"),
+        (func.sum(Venda.qtd_itens) * 1.0 / func.count(Venda.id)).label("Itens por Venda"),
+    ).where(_no_periodo(inicio, fim))
+
+
+CONSULTAS_KPI = {
+    "loja": consulta_kpi_por_loja,
+    "regiao": consulta_kpi_por_regiao,
+    "categoria": consulta_kpi_por_categoria,
+    "dia": consulta_kpi_por_dia,
+    "top_produtos": consulta_top_produtos,
+    "ticket_medio": consulta_ticket_medio,
+}
+
+# Últimos tempos (ms) de cada indicador consultado no banco, para acompanhar o
+# crescimento dos dados, e chamadas de cada um (as respondidas pelo cache não consultam
+# o banco e não entram nos tempos)
+tempos_kpi = {nome: deque(maxlen=100) for nome in CONSULTAS_KPI}
+chamadas_kpi = Counter()
+consultas_kpi = Counter()
+
+
+# Executa um indicador no banco e registra o tempo da consulta (só sem cache)
+@em_cache("vendas", "produtos_venda", "produtos", "categorias", "lojas", "regioes")
+def _consultar_kpi(db: Session, nome: str, inicio, fim) -> pd.DataFrame:
+    inicio_consulta = time.perf_counter()
+    df = buscar_dataframe(db, CONSULTAS_KPI[nome](inicio, fim))
+    tempos_kpi[nome].append((time.perf_counter() - inicio_consulta) * 1000)
+    consultas_kpi[nome] += 1
+    return df
+
+
+# Indicador no período, do cache ou do banco; conta a chamada fora do cache
+def buscar_kpi(db: Session, nome: str, inicio, fim) -> pd.DataFrame:
+    chamadas_kpi[nome] += 1
+    return _consultar_kpi(db, nome, inicio, fim)
+
+
+# Chamadas de cada indicador já pedido, acertos do cache e tempo das consultas ao banco:
+# última, mediana e máxima (ms)
+def estatisticas_kpi() -> dict:
+    estatisticas = {}
+    for nome, chamadas in chamadas_kpi.items():
+        tempos = list(tempos_kpi[nome])
+        estatisticas[nome] = {"chamadas": chamadas, "acertos do cache": chamadas - consultas_kpi[nome],
+                              "consultas ao banco": consultas_kpi[nome]}
+        if tempos:
+            estatisticas[nome].update({"último (ms)": tempos[-1], "p50 (ms)": statistics.median(tempos),
+                                       "máx (ms)": max(tempos)})
+    return estatisticas
+
+
+# Primeiro e último dia com vendas (pelo índice de data_venda)
+@em_cache("vendas")
+def periodo_vendas(db: Session):
+    return db.execute(select(func.min(Venda.data_venda), func.max(Venda.data_venda))).one()
+
+
+# Clientes, receita e médias de recência e de compras por segmento RFM
+@em_cache("clientes_segmentos")
+def buscar_resumo_segmentos(db: Session) -> pd.DataFrame:
+    receita = func.sum(ClienteSegmento.valor)
+    return buscar_dataframe(db, select(
+        ClienteSegmento.segmento.label("Segmento"),
+        func.count().label("Clientes"),
+        receita.label("Receita"),
+        func.avg(ClienteSegmento.recencia, type_=Float).label("Recência Média (dias)"),
+        func.avg(ClienteSegmento.compras, type_=Float).label("Compras por Cliente"),
+    ).group_by(ClienteSegmento.segmento).order_by(receita.desc()))
+
+
+# Dia da última venda considerada nos segmentos (a recência é contada até ele)
+@em_cache("clientes_segmentos")
+def data_referencia_segmentos(db: Session):
+    return db.execute(select(func.max(ClienteSegmento.ultima_compra))).scalar()
+
+
+# Clientes de um segmento, dos que mais gastaram (pelo índice de segmento e valor)
+@em_cache("clientes_segmentos")
+def buscar_clientes_segmento(db: Session, segmento: str, limite: int) -> pd.DataFrame:
+    return buscar_dataframe(db, select(
+        ClienteSegmento.cliente_id.label("ID"),
+        ClienteSegmento.compras.label("Compras"),
+        ClienteSegmento.valor.label("Receita"),
+        ClienteSegmento.recencia.label("Recência (dias)"),
+        ClienteSegmento.primeira_compra.label("Primeira Compra"),
+        ClienteSegmento.ultima_compra.label("Última Compra"),
+        ClienteSegmento.nota_recencia.label("R"),
+        ClienteSegmento.nota_frequencia.label("F"),
+        ClienteSegmento.nota_valor.label("M"),
+    ).where(ClienteSegmento.segmento == segmento).order_by(ClienteSegmento.valor.desc()).limit(limite))
+
+
+# Matriz de coortes em formato longo: coorte, meses depois da primeira compra e clientes
+@em_cache("coortes_clientes")
+def buscar_coortes(db: Session) -> pd.DataFrame:
+    return buscar_dataframe(db, select(
+        CoorteClientes.coorte.label("Coorte"),
+        CoorteClientes.mes.label("Mês"),
+        CoorteClientes.clientes.label("Clientes"),
+    ).order_by(CoorteClientes.coorte, CoorteClientes.mes))
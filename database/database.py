@@ -1,23 +1,237 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
 import os
+import statistics
+import threading
+import time
+
+from database.perfil import perfil
 # Carregar variáveis de ambiente do .env
 load_dotenv()
 
 # URL de Conexão com o banco de dados
 POSTGRES_DATA_BASE_URL = os.getenv("DB_URL")
 
-engine = create_engine(POSTGRES_DATA_BASE_URL)
+# Configuração do pool de conexões
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # segundos esperando uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos até reabrir uma conexão
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "sim")
+# Timeout das consultas do dashboard (sessao(timeout_ms) e engine assíncrono), não do
+# engine compartilhado com migrações e cargas. 0 desativa (só PostgreSQL)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Caminho de leitura assíncrono (requer asyncpg ou aiosqlite)
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "sim")
+
+# Driver assíncrono usado para cada banco
+DRIVERS_ASSINCRONOS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+# Métricas do pool: latência de checkout (tempo esperando uma conexão) e utilização
+class MetricasPool:
+    def __init__(self, amostras: int = 1000):
+        self.latencias = deque(maxlen=amostras)
+        self.checkouts = 0
+        self.em_uso = 0
+        self.pico_em_uso = 0
+        self.conexoes_abertas = 0
+        self.invalidadas = 0
+        self._lock = threading.Lock()
+
+    def registrar_checkout(self, segundos: float):
+        with self._lock:
+            self.latencias.append(segundos)
+            self.checkouts += 1
+            self.em_uso += 1
+            self.pico_em_uso = max(self.pico_em_uso, self.em_uso)
+
+    def registrar_checkin(self):
+        with self._lock:
+            self.em_uso -= 1
+
+    def resumo(self, pool) -> dict:
+        with self._lock:
+            latencias_ms = sorted(latencia * 1000 for latencia in self.latencias)
+            capacidade = pool.size() + DB_MAX_OVERFLOW if isinstance(pool, QueuePool) else None
+            return {
+                "checkouts": self.checkouts,
+                "em uso": self.em_uso,
+                "pico em uso": self.pico_em_uso,
+                "capacidade": capacidade,
+                "utilização": self.em_uso / capacidade if capacidade else None,
+                "conexões abertas": self.conexoes_abertas,
+                "conexões invalidadas": self.invalidadas,
+                "checkout p50 (ms)": statistics.median(latencias_ms) if latencias_ms else 0.0,
+                "checkout p95 (ms)": latencias_ms[int(len(latencias_ms) * 0.95)] if latencias_ms else 0.0,
+                "checkout máx (ms)": latencias_ms[-1] if latencias_ms else 0.0,
+            }
+
+
+metricas = MetricasPool()
+
+
+# QueuePool que mede quanto tempo cada checkout espera por uma conexão
+class PoolMedido(QueuePool):
+    def _do_get(self):
+        inicio = time.perf_counter()
+        conexao = super()._do_get()
+        metricas.registrar_checkout(time.perf_counter() - inicio)
+        return conexao
+
+
+# Cria o engine com o pool configurado. Chamado uma vez por processo: o engine do
+# módulo é compartilhado por todas as sessões do Streamlit
+def criar_engine(url: str = POSTGRES_DATA_BASE_URL):
+    url = make_url(url)
+    opcoes = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+
+    # SQLite em memória usa um pool próprio, uma conexão por thread
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        opcoes.update(
+            poolclass=PoolMedido,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+
+    novo_engine = create_engine(url, **opcoes)
+
+    @event.listens_for(novo_engine, "connect")
+    def _ao_conectar(dbapi_connection, connection_record):
+        metricas.conexoes_abertas += 1
+
+    @event.listens_for(novo_engine, "close")
+    def _ao_fechar(dbapi_connection, connection_record):
+        metricas.conexoes_abertas -= 1
+
+    @event.listens_for(novo_engine, "invalidate")
+    def _ao_invalidar(dbapi_connection, connection_record, exception):
+        metricas.invalidadas += 1
+
+    # Latência, linhas e local de chamada de cada instrução (só durante uma execução perfilada)
+    perfil.instrumentar(novo_engine)
+
+    if isinstance(novo_engine.pool, PoolMedido):
+        @event.listens_for(novo_engine, "checkin")
+        def _ao_devolver(dbapi_connection, connection_record):
+            metricas.registrar_checkin()
+
+    return novo_engine
+
+
+engine = criar_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+
+# Sessão com contexto: a conexão sempre volta ao pool ao sair do bloco. Com timeout_ms
+# (PostgreSQL), cada transação da sessão recebe SET LOCAL statement_timeout, que vale
+# só até o commit/rollback: a conexão volta ao pool sem o timeout
+@contextmanager
+def sessao(timeout_ms: int = 0):
     db = SessionLocal()
+    if timeout_ms and engine.dialect.name == "postgresql":
+        @event.listens_for(db, "after_begin")
+        def _aplicar_timeout(session, transaction, connection):
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_db():
+    with sessao() as db:
+        yield db
+
+
+# Métricas atuais do pool do engine do módulo
+def metricas_pool() -> dict:
+    return metricas.resumo(engine.pool)
+
+
+# URL do mesmo banco com o driver assíncrono (postgresql+asyncpg, sqlite+aiosqlite)
+def url_assincrona(url: str = POSTGRES_DATA_BASE_URL):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS_ASSINCRONOS:
+        raise ValueError(f"Sem driver assíncrono configurado para {backend}")
+    return url.set(drivername=f"{backend}+{DRIVERS_ASSINCRONOS[backend]}")
+
+
+# Engine, sessões e event loop assíncronos, criados sob demanda para que o caminho
+# síncrono não dependa dos drivers assíncronos
+_assincrono = {}
+_lock_assincrono = threading.Lock()
+
+
+def _iniciar_assincrono():
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = url_assincrona()
+    opcoes = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.get_backend_name() == "postgresql":
+        opcoes.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        if DB_STATEMENT_TIMEOUT_MS:
+            opcoes["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+
+    # As conexões assíncronas pertencem ao event loop que as abriu; um único loop em
+    # uma thread de fundo atende todas as execuções do Streamlit
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="db-async", daemon=True).start()
+
+    engine_async = create_async_engine(url, **opcoes)
+    _assincrono.update(
+        engine=engine_async,
+        sessionmaker=async_sessionmaker(engine_async, autoflush=False, expire_on_commit=False),
+        loop=loop,
+    )
+
+
+def _obter_assincrono(nome: str):
+    with _lock_assincrono:
+        if not _assincrono:
+            _iniciar_assincrono()
+    return _assincrono[nome]
+
+
+def engine_assincrono():
+    return _obter_assincrono("engine")
+
+
+# Fábrica de sessões assíncronas, equivalente ao SessionLocal
+def AsyncSessionLocal():
+    return _obter_assincrono("sessionmaker")()
+
+
+# Sessão assíncrona com contexto: a conexão sempre volta ao pool ao sair do bloco
+@asynccontextmanager
+async def sessao_assincrona():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Executa uma coroutine no event loop de fundo e espera o resultado (para código síncrono)
+def executar_assincrono(coroutine):
+    return asyncio.run_coroutine_threadsafe(coroutine, _obter_assincrono("loop")).result()
+
+
+# Executa consultas independentes ao mesmo tempo, cada uma na sua sessão/conexão,
+# e devolve as linhas de cada uma na mesma ordem
+async def executar_em_paralelo(*consultas):
+    async def executar(consulta):
+        async with sessao_assincrona() as db:
+            return (await db.execute(consulta)).all()
+
+    return await asyncio.gather(*(executar(consulta) for consulta in consultas))
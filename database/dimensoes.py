@@ -0,0 +1,135 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database.cache import PREFIXO_VERSAO, TTL_PADRAO, TTLS, cache
+from database.consultas import buscar_dataframe
+from models.models import Categoria, Cliente, Loja, Produto, Vendedor
+
+# Segundos entre verificações de linhas novas (max(id)) em cada dimensão
+INTERVALO_VERIFICACAO = 5
+
+# Tabelas de dimensão (com id e nome) resolvidas pelo cache
+DIMENSOES = {model.__tablename__: model for model in (Cliente, Vendedor, Loja, Produto, Categoria)}
+
+
+# Tipo dos nomes: strings no Arrow (texto UTF-8 contíguo e offsets, nulos como nulos).
+# Explícito porque "str" só é Arrow a partir do pandas 3
+TIPO_NOMES = pd.StringDtype("pyarrow")
+
+
+# Mapa id -> nome de uma dimensão em arrays: ids ordenados em int64 (8 bytes por linha)
+# e nomes em um array TIPO_NOMES, sem um objeto Python por linha. Resolver N ids é um
+# searchsorted e um take
+class MapaNomes:
+    __slots__ = ("ids", "nomes")
+
+    def __init__(self, ids=(), nomes=()):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.nomes = pd.array(nomes, dtype=TIPO_NOMES)
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+    # Novo mapa com as linhas acrescentadas (ids maiores que max_id, em ordem)
+    def acrescentar(self, ids, nomes) -> "MapaNomes":
+        mapa = MapaNomes()
+        mapa.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        mapa.nomes = pd.concat([pd.Series(self.nomes), pd.Series(nomes, dtype=TIPO_NOMES)], ignore_index=True).array
+        return mapa
+
+    # Nome de cada id (na ordem recebida); ids desconhecidos ficam nulos
+    def resolver(self, ids) -> pd.Series:
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            return pd.Series(pd.array([None] * len(ids), dtype=TIPO_NOMES))
+        posicoes = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return pd.Series(self.nomes.take(posicoes)).where(self.ids[posicoes] == ids)
+
+    def memoria(self) -> int:
+        return self.ids.nbytes + self.nomes.nbytes
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+# Cache em processo das dimensões (clientes, vendedores, lojas, produtos e categorias)
+# para trocar ids por nomes sem join nas listagens. Compartilhado pelas sessões do
+# Streamlit. Cada dimensão é:
+# - recarregada inteira quando o TTL da tabela vence ou a versão dela (watermark
+#   "tabela:<nome>", ver database/cache.py) muda, o que cobre nomes alterados;
+# - completada com as linhas de id maior que o último carregado (watermark de max(id))
+#   no máximo a cada INTERVALO_VERIFICACAO s, ou na hora se aparecer um id desconhecido
+class CacheDimensoes:
+    def __init__(self, dimensoes: dict = DIMENSOES, intervalo: float = INTERVALO_VERIFICACAO,
+                 ttls: dict[str, int] = TTLS):
+        self.dimensoes = dimensoes
+        self.intervalo = intervalo
+        self.ttls = ttls
+        self.mapas = {}  # tabela -> MapaNomes
+        self.estados = {}  # tabela -> (recarregado_em, verificado_em, versão)
+        self.cargas = 0
+        self.incrementos = 0
+        self.linhas_novas = 0
+        self._lock = threading.RLock()
+
+    def _ler(self, db: Session, tabela: str, apos_id: int = 0) -> pd.DataFrame:
+        model = self.dimensoes[tabela]
+        return buscar_dataframe(db, select(model.id, model.nome).where(model.id > apos_id).order_by(model.id))
+
+    # Mapa da dimensão, recarregado ou completado conforme os watermarks
+    def mapa(self, db: Session, tabela: str, verificar: bool = False) -> MapaNomes:
+        with self._lock:
+            agora = time.monotonic()
+            versao = (cache.versoes or {}).get(PREFIXO_VERSAO + tabela)
+            mapa = self.mapas.get(tabela)
+            recarregado_em, verificado_em, versao_carregada = self.estados.get(tabela, (None, None, None))
+
+            if (mapa is None or versao != versao_carregada
+                    or agora - recarregado_em > self.ttls.get(tabela, TTL_PADRAO)):
+                linhas = self._ler(db, tabela)
+                mapa = MapaNomes(linhas["id"], linhas["nome"])
+                self.estados[tabela] = (agora, agora, versao)
+                self.cargas += 1
+            elif verificar or agora - verificado_em > self.intervalo:
+                model = self.dimensoes[tabela]
+                if (db.execute(select(func.max(model.id))).scalar() or 0) > mapa.max_id:
+                    linhas = self._ler(db, tabela, mapa.max_id)
+                    mapa = mapa.acrescentar(linhas["id"], linhas["nome"])
+                    self.incrementos += 1
+                    self.linhas_novas += len(linhas)
+                self.estados[tabela] = (recarregado_em, agora, versao_carregada)
+
+            self.mapas[tabela] = mapa
+            return mapa
+
+    # Nomes dos ids na dimensão (Series na ordem dos ids). Um id acima do último
+    # carregado força a verificação de linhas novas antes de ficar nulo
+    def nomes(self, db: Session, tabela: str, ids) -> pd.Series:
+        ids = np.asarray(ids, dtype=np.int64)
+        mapa = self.mapa(db, tabela)
+        if len(ids) and ids.max() > mapa.max_id:
+            mapa = self.mapa(db, tabela, verificar=True)
+        return mapa.resolver(ids)
+
+    def limpar(self):
+        with self._lock:
+            self.mapas.clear()
+            self.estados.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            estatisticas = {f"{tabela} (linhas)": len(mapa) for tabela, mapa in self.mapas.items()}
+            estatisticas["memória (MB)"] = sum(mapa.memoria() for mapa in self.mapas.values()) / 1024 / 1024
+            estatisticas["cargas completas"] = self.cargas
+            estatisticas["cargas incrementais"] = self.incrementos
+            estatisticas["linhas incrementais"] = self.linhas_novas
+            return estatisticas
+
+
+dimensoes = CacheDimensoes()
@@ -0,0 +1,197 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy import case, event, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from database.bulk import insert_com_conflito
+from models.models import Estoque
+
+# Segundos até recarregar o índice local (para ver baixas feitas por outros processos)
+TTL_ESTOQUE = 30
+
+
+# Baixa recusada: algum item não tem quantidade suficiente. faltantes: {produto_id: disponível}
+class EstoqueInsuficiente(Exception):
+    def __init__(self, loja_id: int, faltantes: dict[int, int]):
+        super().__init__(f"Estoque insuficiente na loja {loja_id}: {faltantes}")
+        self.loja_id = loja_id
+        self.faltantes = faltantes
+
+
+# Agrupa os itens de uma venda por produto: [(produto_id, quantidade)] -> {produto_id: quantidade}
+def _somar_itens(itens) -> dict[int, int]:
+    quantidades = {}
+    for produto_id, quantidade in itens:
+        quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+    return quantidades
+
+
+# Baixas pendentes por conexão ({serviço: {(loja_id, produto_id): (versão, quantidade)}}),
+# aplicadas aos índices só no commit. Os eventos são registrados uma vez por engine
+def _ao_confirmar(conexao: Connection):
+    for servico, pendentes in conexao.info.pop("estoque_pendente", {}).items():
+        servico._aplicar(pendentes)
+
+
+def _ao_desfazer(conexao: Connection):
+    conexao.info.pop("estoque_pendente", None)
+
+
+_lock_eventos = threading.Lock()
+
+
+def _escutar_transacoes(engine: Engine):
+    with _lock_eventos:
+        if not event.contains(engine, "commit", _ao_confirmar):
+            event.listen(engine, "commit", _ao_confirmar)
+            event.listen(engine, "rollback", _ao_desfazer)
+
+
+# Serviço de estoque: consultas pelo índice local (loja_id, produto_id) -> quantidade e
+# baixas em lote direto no banco, uma instrução por venda.
+#
+# O banco é a fonte da verdade: a baixa só acontece se todas as linhas têm quantidade
+# suficiente no momento do UPDATE (com as linhas travadas), então não há venda acima do
+# estoque mesmo com o índice local desatualizado. O índice local recebe as quantidades
+# devolvidas pelo UPDATE (valores absolutos) quando a transação é confirmada e é
+# recarregado após o TTL. Cada quantidade leva uma versão tirada no UPDATE: como a linha
+# fica travada até o commit, a ordem das versões é a dos commits no banco, e uma
+# quantidade só substitui a do índice se for mais nova
+class ServicoEstoque:
+    def __init__(self, engine: Engine, ttl: float = TTL_ESTOQUE):
+        self.engine = engine
+        self.ttl = ttl
+        self.quantidades = {}  # (loja_id, produto_id) -> quantidade
+        self.carregado_em = None
+        self.consultas = 0
+        self.baixas = 0
+        self.recusadas = 0
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._versoes = {}  # (loja_id, produto_id) -> versão da quantidade no índice
+        self._sequencia = itertools.count(1)
+        self._durante_carga = None  # quantidades confirmadas enquanto carregar() lê o banco
+        _escutar_transacoes(engine)
+
+    # Guarda na conexão as quantidades devolvidas pelo banco, com a versão, até o commit
+    def _registrar(self, conexao: Connection, loja_id: int, restantes: dict[int, int]):
+        with self._lock:
+            versao = next(self._sequencia)
+        pendentes = conexao.info.setdefault("estoque_pendente", {}).setdefault(self, {})
+        pendentes.update(((loja_id, produto_id), (versao, quantidade)) for produto_id, quantidade in restantes.items())
+
+    def _aplicar(self, pendentes: dict):
+        with self._lock:
+            for chave, (versao, quantidade) in pendentes.items():
+                if versao > self._versoes.get(chave, 0):
+                    self._versoes[chave] = versao
+                    self.quantidades[chave] = quantidade
+                    if self._durante_carga is not None:
+                        self._durante_carga[chave] = quantidade
+
+    # Lê todo o estoque para o índice local. Quantidades confirmadas durante a leitura
+    # podem não estar nela e são mantidas
+    def carregar(self):
+        with self._lock_carga:
+            with self._lock:
+                self._durante_carga = {}
+            try:
+                with self.engine.connect() as conexao:
+                    linhas = conexao.execute(select(Estoque.loja_id, Estoque.produto_id, Estoque.quantidade)).all()
+            finally:
+                with self._lock:
+                    durante_carga, self._durante_carga = self._durante_carga, None
+            quantidades = {(loja_id, produto_id): quantidade for loja_id, produto_id, quantidade in linhas}
+            with self._lock:
+                self.quantidades = {**quantidades, **durante_carga}
+                self.carregado_em = time.monotonic()
+
+    def _atualizar_se_expirado(self):
+        if self.carregado_em is None or time.monotonic() - self.carregado_em > self.ttl:
+            self.carregar()
+
+    # Quantidade disponível de um produto na loja, pelo índice local
+    def disponivel(self, loja_id: int, produto_id: int) -> int:
+        self._atualizar_se_expirado()
+        self.consultas += 1
+        return self.quantidades.get((loja_id, produto_id), 0)
+
+    # Itens sem quantidade suficiente pelo índice local: {produto_id: disponível}.
+    # Pré-verificação barata; a baixa no banco confirma
+    def verificar(self, loja_id: int, itens) -> dict[int, int]:
+        self._atualizar_se_expirado()
+        faltantes = {}
+        with self._lock:
+            for produto_id, quantidade in _somar_itens(itens).items():
+                disponivel = self.quantidades.get((loja_id, produto_id), 0)
+                if disponivel < quantidade:
+                    faltantes[produto_id] = disponivel
+        self.consultas += 1
+        return faltantes
+
+    # Baixa os itens de uma venda na transação da conexão, em uma única instrução:
+    # UPDATE ... SET quantidade = quantidade - CASE produto_id ... WHERE quantidade >= ...
+    # RETURNING. No PostgreSQL as linhas são travadas antes, em ordem de produto_id, para
+    # duas vendas simultâneas não se bloquearem em ordens opostas (deadlock).
+    # Levanta EstoqueInsuficiente se algum item não couber; a transação deve ser desfeita.
+    # Retorna as quantidades restantes {produto_id: quantidade}
+    def baixar(self, conexao: Connection, loja_id: int, itens) -> dict[int, int]:
+        quantidades = _somar_itens(itens)
+        pedida = case(quantidades, value=Estoque.produto_id)
+        linhas = (Estoque.loja_id == loja_id) & Estoque.produto_id.in_(quantidades)
+
+        filtro = linhas
+        if conexao.dialect.name == "postgresql":
+            travadas = select(Estoque.id).where(linhas).order_by(Estoque.produto_id).with_for_update()
+            filtro = Estoque.id.in_(travadas)
+
+        restantes = dict(conexao.execute(
+            update(Estoque)
+            .where(filtro, Estoque.quantidade >= pedida)
+            .values(quantidade=Estoque.quantidade - pedida)
+            .returning(Estoque.produto_id, Estoque.quantidade)
+        ).all())
+
+        if len(restantes) < len(quantidades):
+            self.recusadas += 1
+            disponiveis = dict(conexao.execute(
+                select(Estoque.produto_id, Estoque.quantidade).where(linhas)
+            ).all())
+            raise EstoqueInsuficiente(loja_id, {
+                produto_id: disponiveis.get(produto_id, 0)
+                for produto_id in quantidades if produto_id not in restantes
+            })
+
+        self.baixas += 1
+        self._registrar(conexao, loja_id, restantes)
+        return restantes
+
+    # Reserva os itens de uma venda na sua própria transação
+    def reservar(self, loja_id: int, itens) -> dict[int, int]:
+        with self.engine.begin() as conexao:
+            return self.baixar(conexao, loja_id, itens)
+
+    # Soma quantidades ao estoque (reposição), criando as linhas que não existirem
+    def repor(self, conexao: Connection, loja_id: int, itens) -> dict[int, int]:
+        upsert = insert_com_conflito(conexao, Estoque.__table__).values([
+            {"loja_id": loja_id, "produto_id": produto_id, "quantidade": quantidade}
+            for produto_id, quantidade in _somar_itens(itens).items()
+        ])
+        restantes = dict(conexao.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[Estoque.loja_id, Estoque.produto_id],
+                set_={"quantidade": Estoque.quantidade + upsert.excluded.quantidade},
+            ).returning(Estoque.produto_id, Estoque.quantidade)
+        ).all())
+        self._registrar(conexao, loja_id, restantes)
+        return restantes
+
+    def estatisticas(self) -> dict:
+        return {
+            "itens no índice": len(self.quantidades),
+            "consultas": self.consultas,
+            "baixas": self.baixas,
+            "baixas recusadas": self.recusadas,
+        }
@@ -0,0 +1,138 @@
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from models.models import Cliente, Loja, Produto, ProdutosVenda, Venda
+
+# Linhas por lote lido do cursor (e por row group no Parquet)
+TAMANHO_LOTE = 100_000
+
+# Tipo no Arrow de cada tipo Python das colunas
+TIPOS_ARROW = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp("us"), date: pa.date32()}
+
+
+# Schema Arrow com os nomes e tipos das colunas de um select()
+def schema_arrow(consulta) -> pa.Schema:
+    return pa.schema([(coluna.name, TIPOS_ARROW[coluna.type.python_type]) for coluna in consulta.selected_columns])
+
+
+# Monta uma tabela Arrow a partir de um lote de linhas do cursor
+def tabela_arrow(lote, schema: pa.Schema) -> pa.Table:
+    return pa.Table.from_arrays(
+        [pa.array(coluna, type=campo.type) for coluna, campo in zip(zip(*lote), schema)], schema=schema
+    )
+
+
+# Grava o resultado de um select() em um arquivo Parquet, lote a lote (um row group por
+# lote). O arquivo só aparece no caminho final depois de completo. Retorna as linhas gravadas
+def gravar_parquet(conexao, consulta, caminho: str, tamanho_lote: int = TAMANHO_LOTE) -> int:
+    schema = schema_arrow(consulta)
+    temporario = caminho + ".tmp"
+    linhas = 0
+    with pyarrow.parquet.ParquetWriter(temporario, schema, compression="zstd") as escritor:
+        resultado = conexao.execute(consulta, execution_options={"yield_per": tamanho_lote})
+        for lote in resultado.partitions():
+            escritor.write_table(tabela_arrow(lote, schema))
+            linhas += len(lote)
+    os.replace(temporario, caminho)
+    return linhas
+
+
+# Itens vendidos com os dados da venda, da loja, do cliente e do produto
+def consulta_exportacao(inicio: date = None, fim: date = None, lojas: list[int] = None):
+    consulta = (
+        select(
+            Venda.id.label("venda_id"),
+            Venda.data_venda,
+            Venda.loja_id,
+            Loja.nome.label("loja"),
+            Venda.cliente_id,
+            Cliente.nome.label("cliente"),
+            ProdutosVenda.produto_id,
+            Produto.nome.label("produto"),
+            ProdutosVenda.quantidade,
+            ProdutosVenda.preco_unitario,
+            ProdutosVenda.subtotal,
+        )
+        .join(ProdutosVenda, ProdutosVenda.venda_id == Venda.id)
+        .join(Produto, ProdutosVenda.produto_id == Produto.id)
+        .join(Loja, Venda.loja_id == Loja.id)
+        .join(Cliente, Venda.cliente_id == Cliente.id)
+    )
+    if inicio:
+        consulta = consulta.where(Venda.data_venda >= inicio)
+    if fim:
+        consulta = consulta.where(Venda.data_venda < fim + timedelta(days=1))
+    if lojas:
+        consulta = consulta.where(Venda.loja_id.in_(lojas))
+    return consulta
+
+
+# Colunas exportadas e seus tipos no Arrow
+SCHEMA = schema_arrow(consulta_exportacao())
+
+
+# Grava lotes Arrow em Parquet (um row group por lote) ou em CSV, conforme a extensão
+class _Escritor:
+    def __init__(self, caminho: str):
+        if caminho.endswith(".parquet"):
+            self.escritor = pyarrow.parquet.ParquetWriter(caminho, SCHEMA, compression="zstd")
+        elif caminho.endswith(".csv"):
+            self.escritor = pyarrow.csv.CSVWriter(caminho, SCHEMA)
+        else:
+            raise ValueError("Use um arquivo .parquet ou .csv")
+
+    def escrever(self, tabela: pa.Table):
+        self.escritor.write_table(tabela)
+
+    def fechar(self):
+        self.escritor.close()
+
+
+# Exporta os itens vendidos em lotes a partir de um cursor do lado do servidor
+# (stream_results), com memória constante independente do volume.
+# Retorna (linhas exportadas, segundos)
+def exportar_vendas(engine: Engine, caminho: str, inicio: date = None, fim: date = None,
+                    lojas: list[int] = None, tamanho_lote: int = TAMANHO_LOTE) -> tuple[int, float]:
+    escritor = _Escritor(caminho)
+    linhas = 0
+    inicio_exportacao = time.perf_counter()
+    try:
+        with engine.connect() as conexao:
+            resultado = conexao.execution_options(yield_per=tamanho_lote).execute(
+                consulta_exportacao(inicio, fim, lojas)
+            )
+            for lote in resultado.partitions():
+                escritor.escrever(tabela_arrow(lote, SCHEMA))
+                linhas += len(lote)
+                segundos = time.perf_counter() - inicio_exportacao
+                print(f"{linhas:,} linhas ({linhas / segundos:,.0f} linhas/s)", end="\r", flush=True)
+    finally:
+        escritor.fechar()
+
+    segundos = time.perf_counter() - inicio_exportacao
+    vazao = linhas / segundos if segundos else 0.0
+    print(f"{linhas:,} linhas exportadas para {caminho} em {segundos:.1f}s ({vazao:,.0f} linhas/s)")
+    return linhas, segundos
+
+
+# Uso: python -m database.exportacao vendas.parquet [--inicio AAAA-MM-DD] [--fim AAAA-MM-DD] [--loja N ...]
+if __name__ == "__main__":
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Exporta os itens vendidos para Parquet ou CSV")
+    parser.add_argument("caminho", help="arquivo de saída (.parquet ou .csv)")
+    parser.add_argument("--inicio", type=date.fromisoformat, help="primeiro dia (inclusive)")
+    parser.add_argument("--fim", type=date.fromisoformat, help="último dia (inclusive)")
+    parser.add_argument("--loja", type=int, action="append", dest="lojas", help="filtra por loja (repetível)")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="linhas por lote")
+    args = parser.parse_args()
+
+    exportar_vendas(engine, args.caminho, args.inicio, args.fim, args.lojas, args.tamanho_lote)
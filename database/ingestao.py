@@ -0,0 +1,257 @@
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from database.bulk import gravar_lote
+from database.cache import marcar_alteracao
+from database.estoque import ServicoEstoque
+from database.particoes import garantir_particoes
+from database.promocoes import IndicePromocoes
+from database.schema import VendaCreate
+from database.totais import calcular_totais
+from models.models import Cliente, Loja, Pagamento, Produto, ProdutosVenda, Venda, Vendedor
+
+# Validador do lote inteiro em uma chamada (validação em Rust, sem laço em Python)
+VALIDADOR_VENDAS = TypeAdapter(list[VendaCreate])
+
+# Diferença aceita entre o total informado e o calculado pelos itens
+TOLERANCIA_TOTAL = 0.01
+
+# Segundos mínimos entre recargas das chaves por causa de ids desconhecidos
+INTERVALO_RECARGA = 5
+
+
+# Valida o lote com o TypeAdapter. Vendas inválidas são separadas por posição no lote:
+# devolve ([(posição, VendaCreate)], {posição: motivo})
+def validar_vendas(lote: list[dict]) -> tuple[list[tuple[int, VendaCreate]], dict[int, str]]:
+    try:
+        return list(enumerate(VALIDADOR_VENDAS.validate_python(lote))), {}
+    except ValidationError as erro:
+        rejeitadas = {}
+        for detalhe in erro.errors():
+            campo = ".".join(str(parte) for parte in detalhe["loc"][1:])
+            rejeitadas.setdefault(detalhe["loc"][0], []).append(f"{campo}: {detalhe['msg']}")
+
+    # Só as válidas passam pela segunda validação
+    posicoes = [posicao for posicao in range(len(lote)) if posicao not in rejeitadas]
+    validas = VALIDADOR_VENDAS.validate_python([lote[posicao] for posicao in posicoes])
+    return list(zip(posicoes, validas)), {posicao: "; ".join(motivos) for posicao, motivos in rejeitadas.items()}
+
+
+# Gravação de vendas em lote (cabeçalho, itens e pagamento), para feeds de PDV.
+#
+# Cada lote é validado de uma vez, as chaves estrangeiras são conferidas contra os ids
+# em memória (recarregados quando aparece um id desconhecido) e as vendas aceitas são
+# gravadas em uma transação: um INSERT de várias linhas para as vendas (RETURNING dos
+# ids) e COPY/executemany para itens e pagamentos. Vendas inválidas são rejeitadas
+# individualmente, com o motivo; o resto do lote segue.
+# Com um ServicoEstoque, o estoque é conferido pelo índice local e baixado com uma
+# instrução por loja; vendas sem estoque são rejeitadas
+class IngestorVendas:
+    def __init__(self, engine: Engine, estoque: ServicoEstoque = None):
+        self.engine = engine
+        self.estoque = estoque
+        self.clientes = set()
+        self.vendedores = set()
+        self.lojas = set()
+        self.precos = {}  # produto_id -> preço de tabela
+        self.promocoes = IndicePromocoes()
+        self.carregado_em = None
+        self.vendas = 0
+        self.rejeitadas = 0
+        self.segundos = 0.0
+        self._lock = threading.Lock()
+
+    # Lê os ids das tabelas referenciadas, os preços e as promoções
+    def carregar(self):
+        with self.engine.connect() as conexao:
+            clientes = set(conexao.execute(select(Cliente.id)).scalars())
+            vendedores = set(conexao.execute(select(Vendedor.id)).scalars())
+            lojas = set(conexao.execute(select(Loja.id)).scalars())
+            precos = dict(conexao.execute(select(Produto.id, Produto.preco)).all())
+            promocoes = IndicePromocoes.carregar(conexao)
+        with self._lock:
+            self.clientes, self.vendedores, self.lojas, self.precos = clientes, vendedores, lojas, precos
+            self.promocoes = promocoes
+            self.carregado_em = time.monotonic()
+
+    def _chaves_invalidas(self, venda: VendaCreate) -> list[str]:
+        invalidas = []
+        if venda.cliente_id not in self.clientes:
+            invalidas.append(f"cliente_id {venda.cliente_id} inexistente")
+        if venda.vendedor_id not in self.vendedores:
+            invalidas.append(f"vendedor_id {venda.vendedor_id} inexistente")
+        if venda.loja_id not in self.lojas:
+            invalidas.append(f"loja_id {venda.loja_id} inexistente")
+        invalidas.extend(
+            f"produto_id {item.produto_id} inexistente" for item in venda.itens if item.produto_id not in self.precos
+        )
+        return invalidas
+
+    # Confere as chaves estrangeiras. Um id desconhecido pode ser um cadastro novo: as
+    # chaves são recarregadas (no máximo a cada INTERVALO_RECARGA s) antes de rejeitar
+    def _resolver_chaves(self, vendas: list[tuple[int, VendaCreate]], rejeitadas: dict[int, str]):
+        if self.carregado_em is None:
+            self.carregar()
+        elif (any(self._chaves_invalidas(venda) for _, venda in vendas)
+              and time.monotonic() - self.carregado_em > INTERVALO_RECARGA):
+            self.carregar()
+
+        resolvidas = []
+        for posicao, venda in vendas:
+            invalidas = self._chaves_invalidas(venda)
+            if invalidas:
+                rejeitadas[posicao] = "; ".join(invalidas)
+            else:
+                resolvidas.append((posicao, venda))
+        return resolvidas
+
+    # Monta as linhas de vendas, itens e pagamentos (sem venda_id nos itens e pagamentos),
+    # com os preços faltantes resolvidos de uma vez pela tabela e pelas promoções. Vendas
+    # com item sem preço de produto sem preço de tabela (ex.: importado do catálogo) são
+    # rejeitadas
+    def _montar_linhas(self, vendas: list[tuple[int, VendaCreate]], rejeitadas: dict[int, str]):
+        agora = datetime.now()
+        com_preco = []
+        for posicao, venda in vendas:
+            sem_tabela = sorted({
+                item.produto_id for item in venda.itens
+                if item.preco_unitario is None and self.precos[item.produto_id] is None
+            })
+            if sem_tabela:
+                rejeitadas[posicao] = "; ".join(f"produto_id {produto_id} sem preço de tabela"
+                                                for produto_id in sem_tabela)
+            else:
+                com_preco.append((posicao, venda))
+        vendas = com_preco
+
+        sem_preco = [
+            (item.produto_id, venda.data_venda or agora)
+            for _, venda in vendas for item in venda.itens if item.preco_unitario is None
+        ]
+        if sem_preco:
+            produto_ids, instantes = zip(*sem_preco)
+            precos = iter(self.promocoes.precos(
+                produto_ids, [self.precos[produto_id] for produto_id in produto_ids], np.array(instantes)
+            ).tolist())
+
+        linhas = []
+        for posicao, venda in vendas:
+            data_venda = venda.data_venda or agora
+            itens = [{
+                "produto_id": item.produto_id,
+                "quantidade": item.quantidade,
+                "preco_unitario": item.preco_unitario if item.preco_unitario is not None else next(precos),
+                "data_venda": data_venda,
+            } for item in venda.itens]
+            cabecalho = calcular_totais({
+                "cliente_id": venda.cliente_id,
+                "vendedor_id": venda.vendedor_id,
+                "loja_id": venda.loja_id,
+                "data_venda": data_venda,
+            }, itens)
+
+            if venda.total is not None and abs(venda.total - cabecalho["total"]) > TOLERANCIA_TOTAL:
+                rejeitadas[posicao] = f"total {venda.total} diferente da soma dos itens {cabecalho['total']:.2f}"
+                continue
+            pagamento = {**venda.pagamento.model_dump(), "created_at": agora} if venda.pagamento else None
+            linhas.append((posicao, cabecalho, itens, pagamento))
+        return linhas
+
+    # Separa as vendas que cabem no estoque pelo índice local, consumindo as quantidades
+    # na ordem do lote. Devolve as aceitas e as quantidades a baixar por loja
+    def _reservar_estoque(self, linhas, rejeitadas: dict[int, str]):
+        disponivel = {}
+        por_loja = {}
+        aceitas = []
+        for linha in linhas:
+            posicao, cabecalho, itens, _ = linha
+            loja_id = cabecalho["loja_id"]
+            pedidas = {}
+            for item in itens:
+                pedidas[item["produto_id"]] = pedidas.get(item["produto_id"], 0) + item["quantidade"]
+
+            faltantes = {}
+            for produto_id, quantidade in pedidas.items():
+                if (loja_id, produto_id) not in disponivel:
+                    disponivel[(loja_id, produto_id)] = self.estoque.disponivel(loja_id, produto_id)
+                if disponivel[(loja_id, produto_id)] < quantidade:
+                    faltantes[produto_id] = disponivel[(loja_id, produto_id)]
+            if faltantes:
+                rejeitadas[posicao] = f"estoque insuficiente na loja {loja_id}: {faltantes}"
+                continue
+
+            baixa = por_loja.setdefault(loja_id, {})
+            for produto_id, quantidade in pedidas.items():
+                disponivel[(loja_id, produto_id)] -= quantidade
+                baixa[produto_id] = baixa.get(produto_id, 0) + quantidade
+            aceitas.append(linha)
+        return aceitas, por_loja
+
+    # Grava as vendas montadas na transação da conexão. Devolve os ids na ordem das linhas
+    def _gravar(self, conexao: Connection, linhas, por_loja: dict[int, dict[int, int]]) -> list[int]:
+        datas = [cabecalho["data_venda"] for _, cabecalho, _, _ in linhas]
+        garantir_particoes(conexao, min(datas).date(), max(datas).date())
+
+        if self.estoque is not None:
+            for loja_id, itens in sorted(por_loja.items()):
+                self.estoque.baixar(conexao, loja_id, itens.items())
+
+        ids = list(conexao.execute(
+            insert(Venda).returning(Venda.id, sort_by_parameter_order=True),
+            [cabecalho for _, cabecalho, _, _ in linhas],
+        ).scalars())
+
+        itens_lote = []
+        pagamentos = []
+        for venda_id, (_, cabecalho, itens, pagamento) in zip(ids, linhas):
+            for item in itens:
+                item["venda_id"] = venda_id
+                itens_lote.append(item)
+            if pagamento is not None:
+                pagamentos.append({"venda_id": venda_id, "data_venda": cabecalho["data_venda"], **pagamento})
+        gravar_lote(conexao, ProdutosVenda.__table__, itens_lote)
+        gravar_lote(conexao, Pagamento.__table__, pagamentos)
+
+        tabelas = [Venda.__tablename__, ProdutosVenda.__tablename__, Pagamento.__tablename__]
+        if self.estoque is not None:
+            tabelas.append("estoque")
+        marcar_alteracao(conexao, *tabelas)
+        return ids
+
+    # Valida e grava um lote de vendas (dicts no formato de VendaCreate) em uma transação.
+    # Devolve {"ids": {posição: venda_id}, "rejeitadas": {posição: motivo}}.
+    # Se o estoque no banco não cobrir a baixa (venda concorrente depois da conferência
+    # pelo índice local), EstoqueInsuficiente é levantada e nada do lote é gravado
+    def ingerir(self, lote: list[dict]) -> dict:
+        inicio = time.perf_counter()
+        vendas, rejeitadas = validar_vendas(lote)
+        vendas = self._resolver_chaves(vendas, rejeitadas)
+        linhas = self._montar_linhas(vendas, rejeitadas)
+        por_loja = {}
+        if self.estoque is not None:
+            linhas, por_loja = self._reservar_estoque(linhas, rejeitadas)
+
+        ids = {}
+        if linhas:
+            with self.engine.begin() as conexao:
+                venda_ids = self._gravar(conexao, linhas, por_loja)
+            ids = {posicao: venda_id for (posicao, _, _, _), venda_id in zip(linhas, venda_ids)}
+
+        with self._lock:
+            self.vendas += len(ids)
+            self.rejeitadas += len(rejeitadas)
+            self.segundos += time.perf_counter() - inicio
+        return {"ids": ids, "rejeitadas": dict(sorted(rejeitadas.items()))}
+
+    def estatisticas(self) -> dict:
+        return {
+            "vendas gravadas": self.vendas,
+            "vendas rejeitadas": self.rejeitadas,
+            "vendas/s": self.vendas / self.segundos if self.segundos else 0.0,
+        }
@@ -0,0 +1,156 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+from database.busca import criar_indices_busca
+from database.catalogo import deduplicar_catalogo
+from database.particoes import converter_para_particionadas, preencher_datas_venda, restaurar_referencias_vendas
+from database.totais import recalcular_lotes
+from models.models import (
+    Base, Categoria, ClienteSegmento, CoorteClientes, Estoque, Pagamento, Produto, Venda, ProdutosVenda,
+    VendaDiariaProduto, VendaDiariaLoja, Watermark,
+)
+
+# Tabela que registra as migrações já aplicadas
+metadata_migracoes = MetaData()
+schema_migracoes = Table(
+    "schema_migracoes",
+    metadata_migracoes,
+    Column("versao", Integer, primary_key=True),
+    Column("descricao", String),
+    Column("aplicada_em", DateTime),
+)
+
+
+# Cria um índice declarado nos models, se ainda não existir
+def criar_indice(conexao: Connection, tabela: Table, nome: str):
+    indice = next(indice for indice in tabela.indexes if indice.name == nome)
+    indice.create(conexao, checkfirst=True)
+
+
+# Adiciona uma coluna declarada nos models, se ainda não existir
+def adicionar_coluna(conexao: Connection, tabela: Table, nome: str):
+    colunas = {coluna["name"] for coluna in inspect(conexao).get_columns(tabela.name)}
+    if nome in colunas:
+        return
+    coluna = tabela.c[nome]
+    tipo = coluna.type.compile(dialect=conexao.dialect)
+    conexao.exec_driver_sql(f"ALTER TABLE {tabela.name} ADD COLUMN {nome} {tipo}")
+
+
+# Migração 1: tabelas iniciais do projeto
+def _criar_tabelas(conexao: Connection):
+    Base.metadata.create_all(bind=conexao, checkfirst=True)
+
+
+# Índices das consultas do dashboard (joins e filtros por data)
+INDICES_CONSULTAS = [
+    (Venda.__table__, "ix_vendas_data_venda_id"),
+    (Venda.__table__, "ix_vendas_loja_id_data_venda"),
+    (Venda.__table__, "ix_vendas_cliente_id"),
+    (Venda.__table__, "ix_vendas_vendedor_id"),
+    (ProdutosVenda.__table__, "ix_produtos_venda_venda_id_produto_id"),
+    (ProdutosVenda.__table__, "ix_produtos_venda_produto_id"),
+]
+
+
+# Migração 2: índices das consultas do dashboard
+def _criar_indices_consultas(conexao: Connection):
+    for tabela, nome in INDICES_CONSULTAS:
+        criar_indice(conexao, tabela, nome)
+
+
+# Migração 3: tabelas de resumo diário de vendas e watermarks
+def _criar_rollups(conexao: Connection):
+    for model in (VendaDiariaProduto, VendaDiariaLoja, Watermark):
+        model.__table__.create(conexao, checkfirst=True)
+
+
+# Migração 4: subtotal dos itens e qtd_itens das vendas, preenchidos para as vendas existentes
+def _totais_desnormalizados(conexao: Connection):
+    adicionar_coluna(conexao, ProdutosVenda.__table__, "subtotal")
+    adicionar_coluna(conexao, Venda.__table__, "qtd_itens")
+    recalcular_lotes(conexao)
+
+
+# Migração 5: uma linha de estoque por loja e produto
+def _criar_indice_estoque(conexao: Connection):
+    criar_indice(conexao, Estoque.__table__, "ux_estoque_loja_id_produto_id")
+
+
+# Migração 6: data da venda nos itens e, no PostgreSQL, partições mensais de vendas e
+# produtos_venda por data_venda
+def _particionar_vendas(conexao: Connection):
+    adicionar_coluna(conexao, ProdutosVenda.__table__, "data_venda")
+    preencher_datas_venda(conexao, ProdutosVenda)
+    criar_indice(conexao, ProdutosVenda.__table__, "ix_produtos_venda_data_venda")
+    converter_para_particionadas(conexao)
+
+
+# Migração 7: chaves naturais do catálogo (nome da categoria; categoria e nome do produto)
+def _chaves_catalogo(conexao: Connection):
+    deduplicar_catalogo(conexao)
+    criar_indice(conexao, Categoria.__table__, "ux_categorias_nome")
+    criar_indice(conexao, Produto.__table__, "ux_produtos_categoria_id_nome")
+
+
+# Migração 9: segmentos RFM e coortes de clientes
+def _criar_segmentos(conexao: Connection):
+    for model in (ClienteSegmento, CoorteClientes):
+        model.__table__.create(conexao, checkfirst=True)
+
+
+# Migração 10: tabelas FTS5 dos bancos SQLite anteriores à 3.45 em que a migração 8 não
+# criou índice de busca (agora criado com o tokenizador unicode61)
+def _busca_sqlite_antigo(conexao: Connection):
+    if conexao.dialect.name == "sqlite" and not inspect(conexao).has_table("produtos_busca"):
+        criar_indices_busca(conexao)
+
+
+# Migração 11: data da venda nos pagamentos e, no PostgreSQL, a chave estrangeira
+# (venda_id, data_venda) para vendas particionada, removida pela migração 6
+def _data_venda_pagamentos(conexao: Connection):
+    adicionar_coluna(conexao, Pagamento.__table__, "data_venda")
+    preencher_datas_venda(conexao, Pagamento)
+    criar_indice(conexao, Pagamento.__table__, "ix_pagamentos_data_venda_venda_id")
+    restaurar_referencias_vendas(conexao)
+
+
+# Migrações em ordem de versão: (versão, descrição, função)
+MIGRACOES = [
+    (1, "tabelas iniciais", _criar_tabelas),
+    (2, "índices das consultas do dashboard", _criar_indices_consultas),
+    (3, "resumos diários de vendas", _criar_rollups),
+    (4, "subtotal e qtd_itens desnormalizados", _totais_desnormalizados),
+    (5, "índice único do estoque por loja e produto", _criar_indice_estoque),
+    (6, "partições mensais de vendas e produtos_venda", _particionar_vendas),
+    (7, "chaves naturais de categorias e produtos", _chaves_catalogo),
+    (8, "índices de busca de produtos e clientes", criar_indices_busca),
+    (9, "segmentos RFM e coortes de clientes", _criar_segmentos),
+    (10, "índices de busca FTS5 no SQLite anterior à 3.45", _busca_sqlite_antigo),
+    (11, "data da venda e chave estrangeira de pagamentos", _data_venda_pagamentos),
+]
+
+
+# Aplica, em ordem e cada uma na sua transação, as migrações ainda não aplicadas
+def aplicar_migracoes(engine: Engine):
+    metadata_migracoes.create_all(bind=engine, checkfirst=True)
+    with engine.connect() as conexao:
+        aplicadas = set(conexao.execute(select(schema_migracoes.c.versao)).scalars())
+
+    for versao, descricao, migracao in MIGRACOES:
+        if versao in aplicadas:
+            continue
+        with engine.begin() as conexao:
+            migracao(conexao)
+            conexao.execute(schema_migracoes.insert().values(
+                versao=versao, descricao=descricao, aplicada_em=datetime.now()
+            ))
+        print(f"Migração {versao} aplicada: {descricao}")
+
+
+# Uso: python -m database.migracoes
+if __name__ == "__main__":
+    from database.database import engine
+    aplicar_migracoes(engine)
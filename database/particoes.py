@@ -0,0 +1,254 @@
+import argparse
+import os
+from datetime import date, datetime
+
+from sqlalchemy import MetaData, Table, event, func, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import AddConstraint
+
+from database.cache import marcar_alteracao
+from database.exportacao import gravar_parquet
+from models.models import Base, Pagamento, ProdutosVenda, Venda
+
+# Tabelas particionadas por mês de data_venda (no PostgreSQL). vendas vem primeiro:
+# produtos_venda referencia vendas por (venda_id, data_venda), então os itens de uma
+# venda ficam sempre na partição do mesmo mês da venda
+TABELAS_PARTICIONADAS = (Venda.__table__, ProdutosVenda.__table__)
+
+# Vendas por lote no preenchimento de data_venda em produtos_venda e pagamentos
+TAMANHO_LOTE_DATAS = 100_000
+
+# Partições já garantidas neste processo: (url do banco, nome). As criadas em uma
+# transação ainda aberta ficam pendentes em conexao.info e só entram aqui no commit;
+# um rollback (inclusive de savepoint) as descarta
+_particoes_criadas = set()
+_PENDENTES = "particoes_pendentes"
+
+
+# Primeiro dia de cada mês entre inicio e fim (inclusive)
+def meses(inicio: date, fim: date) -> list[date]:
+    mes = date(inicio.year, inicio.month, 1)
+    resultado = []
+    while mes <= fim:
+        resultado.append(mes)
+        mes = _proximo_mes(mes)
+    return resultado
+
+
+def _proximo_mes(mes: date) -> date:
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def nome_particao(tabela: str, mes: date) -> str:
+    return f"{tabela}_{mes:%Y_%m}"
+
+
+# Verifica se a tabela é particionada (só existe no PostgreSQL)
+def particionada(conexao: Connection, tabela: str = Venda.__tablename__) -> bool:
+    if conexao.dialect.name != "postgresql":
+        return False
+    return conexao.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:tabela))"
+    ), {"tabela": tabela}).scalar()
+
+
+# Cria as partições mensais de vendas e produtos_venda que cobrem o período, se ainda
+# não existirem. Chamar antes de gravar vendas; sem efeito se as tabelas não forem
+# particionadas (ex.: SQLite)
+def garantir_particoes(conexao: Connection, inicio: date, fim: date):
+    if not particionada(conexao):
+        return
+    for tabela in TABELAS_PARTICIONADAS:
+        _criar_particoes(conexao, tabela.name, inicio, fim)
+
+
+def _criar_particoes(conexao: Connection, tabela: str, inicio: date, fim: date):
+    url = str(conexao.engine.url)
+    pendentes = conexao.info.setdefault(_PENDENTES, set())
+    for mes in meses(inicio, fim):
+        nome = nome_particao(tabela, mes)
+        if (url, nome) in _particoes_criadas or (url, nome) in pendentes:
+            continue
+        conexao.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {nome} PARTITION OF {tabela} "
+            f"FOR VALUES FROM ('{mes}') TO ('{_proximo_mes(mes)}')"
+        )
+        pendentes.add((url, nome))
+
+    if not event.contains(conexao, "commit", _confirmar_particoes):
+        event.listen(conexao, "commit", _confirmar_particoes)
+        event.listen(conexao, "rollback", _descartar_particoes)
+        event.listen(conexao, "rollback_savepoint", _descartar_particoes)
+
+
+def _confirmar_particoes(conexao: Connection):
+    _particoes_criadas.update(conexao.info.pop(_PENDENTES, ()))
+
+
+def _descartar_particoes(conexao: Connection, *args):
+    conexao.info.pop(_PENDENTES, None)
+
+
+# Partições de uma tabela: [(nome, limites, linhas estimadas)]
+def listar_particoes(conexao: Connection, tabela: str = Venda.__tablename__) -> list[tuple[str, str, int]]:
+    return conexao.execute(text("""
+        SELECT filha.relname, pg_get_expr(filha.relpartbound, filha.oid), filha.reltuples::bigint
+        FROM pg_inherits
+        JOIN pg_class filha ON filha.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:tabela)
+        ORDER BY filha.relname
+    """), {"tabela": tabela}).all()
+
+
+# Preenche data_venda de uma tabela ligada a vendas por venda_id (itens ou pagamentos)
+# com a data da venda, em lotes de vendas
+def preencher_datas_venda(conexao: Connection, model=ProdutosVenda, tamanho_lote: int = TAMANHO_LOTE_DATAS):
+    venda_id_final = conexao.execute(select(func.max(Venda.id))).scalar() or 0
+    data_venda = select(Venda.data_venda).where(Venda.id == model.venda_id).scalar_subquery()
+    for inicio in range(0, venda_id_final, tamanho_lote):
+        conexao.execute(
+            update(model)
+            .where(model.venda_id > inicio, model.venda_id <= inicio + tamanho_lote, model.data_venda.is_(None))
+            .values(data_venda=data_venda)
+        )
+
+
+# Cria as chaves estrangeiras (venda_id, data_venda) para vendas declaradas nos models
+# que ainda não existem no banco (ex.: a de pagamentos, removida na conversão)
+def restaurar_referencias_vendas(conexao: Connection):
+    if conexao.dialect.name != "postgresql":
+        return
+    existentes = set(conexao.execute(text(
+        "SELECT conrelid::regclass::text FROM pg_constraint WHERE contype = 'f' AND confrelid = 'vendas'::regclass"
+    )).scalars())
+    for tabela in Base.metadata.sorted_tables:
+        for chave in tabela.foreign_key_constraints:
+            if chave.referred_table is Venda.__table__ and tabela.name not in existentes:
+                conexao.execute(AddConstraint(chave))
+
+
+# Converte vendas e produtos_venda em tabelas particionadas por mês de data_venda,
+# copiando os dados, como declaradas nos models. A chave primária passa a ser
+# (id, data_venda), exigência do PostgreSQL; por isso as chaves estrangeiras de outras
+# tabelas para vendas(id) são removidas. A de produtos_venda volta aqui com data_venda; a
+# de pagamentos, na migração 11 (que cria pagamentos.data_venda). Roda dentro da
+# transação da migração
+def converter_para_particionadas(conexao: Connection):
+    if conexao.dialect.name != "postgresql" or particionada(conexao):
+        return
+
+    referencias = conexao.execute(text("""
+        SELECT conrelid::regclass::text, conname FROM pg_constraint
+        WHERE contype = 'f' AND confrelid IN ('vendas'::regclass, 'produtos_venda'::regclass)
+    """)).all()
+    for tabela, restricao in referencias:
+        conexao.exec_driver_sql(f"ALTER TABLE {tabela} DROP CONSTRAINT {restricao}")
+
+    primeira, ultima = conexao.execute(select(func.min(Venda.data_venda), func.max(Venda.data_venda))).one()
+
+    for tabela in TABELAS_PARTICIONADAS:
+        antiga = f"{tabela.name}_antiga"
+        colunas = ", ".join(coluna.name for coluna in tabela.columns)
+        sequencia = conexao.execute(text("SELECT pg_get_serial_sequence(:tabela, 'id')"), {"tabela": tabela.name}).scalar()
+
+        conexao.exec_driver_sql(f"ALTER TABLE {tabela.name} RENAME TO {antiga}")
+        conexao.exec_driver_sql(
+            f"CREATE TABLE {tabela.name} (LIKE {antiga} INCLUDING DEFAULTS) PARTITION BY RANGE (data_venda)"
+        )
+        if primeira is not None:
+            _criar_particoes(conexao, tabela.name, primeira.date(), ultima.date())
+        conexao.exec_driver_sql(f"INSERT INTO {tabela.name} ({colunas}) SELECT {colunas} FROM {antiga}")
+        conexao.exec_driver_sql(f"ALTER SEQUENCE {sequencia} OWNED BY {tabela.name}.id")
+        conexao.exec_driver_sql(f"DROP TABLE {antiga}")
+
+        conexao.exec_driver_sql(f"ALTER TABLE {tabela.name} ADD PRIMARY KEY (id, data_venda)")
+        # Itens ligados à venda pela chave completa, na partição do mesmo mês (vendas já convertida)
+        for chave in tabela.foreign_key_constraints:
+            conexao.execute(AddConstraint(chave))
+        for indice in tabela.indexes:
+            indice.create(conexao, checkfirst=True)
+
+    for tabela in TABELAS_PARTICIONADAS:
+        conexao.exec_driver_sql(f"ANALYZE {tabela.name}")
+
+
+# Desanexa as partições de um mês (itens e vendas), que viram tabelas comuns fora das
+# consultas, renomeadas para <partição>_arquivada (o mês pode voltar a receber vendas em
+# uma partição nova). Os pagamentos dessas vendas, que as referenciam, saem junto para
+# pagamentos_<mês>_arquivada. Opcionalmente exporta cada tabela para Parquet em destino
+# e a apaga. Os resumos diários continuam com os totais do mês
+def arquivar_mes(engine: Engine, mes: date, destino: str = None, apagar: bool = False) -> dict[str, int]:
+    linhas = {}
+    if destino:
+        os.makedirs(destino, exist_ok=True)
+    with engine.begin() as conexao:
+        if not particionada(conexao):
+            raise ValueError("As tabelas de vendas não são particionadas")
+
+        # Pagamentos das vendas do mês: a chave estrangeira impede desanexar vendas referenciadas
+        pagamentos = f"{nome_particao(Pagamento.__tablename__, mes)}_arquivada"
+        periodo = f"data_venda >= '{mes}' AND data_venda < '{_proximo_mes(mes)}'"
+        conexao.exec_driver_sql(f"CREATE TABLE {pagamentos} AS SELECT * FROM {Pagamento.__tablename__} WHERE {periodo}")
+        conexao.exec_driver_sql(f"DELETE FROM {Pagamento.__tablename__} WHERE {periodo}")
+        arquivadas = [pagamentos]
+
+        for tabela in reversed(TABELAS_PARTICIONADAS):
+            particao = nome_particao(tabela.name, mes)
+            nome = f"{particao}_arquivada"
+            conexao.exec_driver_sql(f"ALTER TABLE {tabela.name} DETACH PARTITION {particao}")
+            conexao.exec_driver_sql(f"ALTER TABLE {particao} RENAME TO {nome}")
+
+            # A partição de itens desanexada não pode continuar apontando para vendas
+            for restricao, in conexao.execute(text(
+                "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:nome) AND contype = 'f' "
+                "AND confrelid = 'vendas'::regclass"
+            ), {"nome": nome}):
+                conexao.exec_driver_sql(f"ALTER TABLE {nome} DROP CONSTRAINT {restricao}")
+            arquivadas.append(nome)
+            _particoes_criadas.discard((str(engine.url), particao))
+
+        for nome in arquivadas:
+            arquivada = Table(nome, MetaData(), autoload_with=conexao)
+            if destino:
+                linhas[nome] = gravar_parquet(conexao, select(arquivada), os.path.join(destino, f"{nome}.parquet"))
+            else:
+                linhas[nome] = conexao.execute(select(func.count()).select_from(arquivada)).scalar()
+            if apagar:
+                arquivada.drop(conexao)
+
+        marcar_alteracao(conexao, Venda.__tablename__, ProdutosVenda.__tablename__, Pagamento.__tablename__)
+    return linhas
+
+
+# Uso: python -m database.particoes listar
+#      python -m database.particoes criar AAAA-MM [AAAA-MM]
+#      python -m database.particoes arquivar AAAA-MM [--destino DIR] [--apagar]
+if __name__ == "__main__":
+    from database.database import engine
+
+    def mes_argumento(valor: str) -> date:
+        return datetime.strptime(valor, "%Y-%m").date()
+
+    parser = argparse.ArgumentParser(description="Partições mensais de vendas e produtos_venda (PostgreSQL)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar", help="lista as partições com as linhas estimadas")
+    criar = comandos.add_parser("criar", help="cria as partições de um mês ou de um intervalo de meses")
+    criar.add_argument("inicio", type=mes_argumento)
+    criar.add_argument("fim", type=mes_argumento, nargs="?")
+    arquivar = comandos.add_parser("arquivar", help="desanexa as partições de um mês")
+    arquivar.add_argument("mes", type=mes_argumento)
+    arquivar.add_argument("--destino", help="diretório onde exportar as partições em Parquet")
+    arquivar.add_argument("--apagar", action="store_true", help="apaga as partições depois de desanexar")
+    args = parser.parse_args()
+
+    if args.comando == "listar":
+        with engine.connect() as conexao:
+            for tabela in TABELAS_PARTICIONADAS:
+                for nome, limites, linhas in listar_particoes(conexao, tabela.name):
+                    print(f"{nome:<28} {limites:<70} ~{max(linhas, 0):,} linhas")
+    elif args.comando == "criar":
+        with engine.begin() as conexao:
+            garantir_particoes(conexao, args.inicio, args.fim or args.inicio)
+    else:
+        for nome, linhas in arquivar_mes(engine, args.mes, args.destino, args.apagar).items():
+            print(f"{nome}: {linhas:,} linhas desanexadas")
@@ -0,0 +1,236 @@
+import argparse
+import functools
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Arquivo JSON Lines com uma linha por execução perfilada (vazio desativa)
+PERFIL_LOG = os.getenv("PERFIL_LOG", "perfil.jsonl")
+
+# Repetições da mesma forma de consulta em uma execução para apontar N+1
+PERFIL_LIMIAR_N_MAIS_1 = int(os.getenv("PERFIL_LIMIAR_N_MAIS_1", "5"))
+
+# Raiz do projeto: o local de chamada é o primeiro frame de código do projeto
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PARAMETROS = re.compile(r"%\(\w+\)s|\$\d+|(?<!:):\w+|\?")
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+# Forma da instrução: parâmetros, literais e listas de IN viram "?", para agrupar as
+# execuções da mesma consulta com valores diferentes
+def forma_sql(sql: str) -> str:
+    forma = _PARAMETROS.sub("?", sql)
+    forma = _LITERAIS.sub("?", forma)
+    forma = _LISTAS.sub("(?, ...)", forma)
+    return _ESPACOS.sub(" ", forma).strip()
+
+
+# Primeiro frame do projeto acima da chamada ao banco: "arquivo:linha (função)"
+def _local_chamada() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        arquivo = frame.f_code.co_filename
+        if arquivo.startswith(_RAIZ) and arquivo != __file__ and "site-packages" not in arquivo:
+            return f"{os.path.relpath(arquivo, _RAIZ)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "?"
+
+
+# Consultas e funções cronometradas em uma execução (um rerun do Streamlit)
+class ExecucaoPerfil:
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.inicio = datetime.now()
+        self.duracao_ms = None
+        self.consultas = []  # {"sql", "forma", "ms", "linhas", "local", "funcao"}
+        self.funcoes = []  # {"funcao", "ms", "consultas"}
+        self.pilha = []  # Funções cronometradas em andamento (a última é a atual)
+        self._inicio = time.perf_counter()
+
+    # Formas repetidas PERFIL_LIMIAR_N_MAIS_1 vezes ou mais, da mais cara para a mais barata
+    def n_mais_1(self, limiar: int = PERFIL_LIMIAR_N_MAIS_1) -> list[dict]:
+        grupos = {}
+        for consulta in self.consultas:
+            grupos.setdefault(consulta["forma"], []).append(consulta)
+        suspeitas = [
+            {
+                "forma": forma,
+                "execuções": len(consultas),
+                "ms": sum(consulta["ms"] for consulta in consultas),
+                "locais": sorted({consulta["local"] for consulta in consultas}),
+            }
+            for forma, consultas in grupos.items() if len(consultas) >= limiar
+        ]
+        return sorted(suspeitas, key=lambda suspeita: suspeita["ms"], reverse=True)
+
+    def resumo(self) -> dict:
+        return {
+            "consultas": len(self.consultas),
+            "formas distintas": len({consulta["forma"] for consulta in self.consultas}),
+            "tempo no banco (ms)": sum(consulta["ms"] for consulta in self.consultas),
+            "tempo total (ms)": self.duracao_ms,
+        }
+
+    def para_dict(self) -> dict:
+        return {
+            "nome": self.nome,
+            "inicio": self.inicio.isoformat(),
+            "duracao_ms": self.duracao_ms,
+            "consultas": self.consultas,
+            "funcoes": self.funcoes,
+            "n_mais_1": self.n_mais_1(),
+        }
+
+
+# Perfilador das consultas: ouve os eventos de cursor do engine e registra cada
+# instrução na execução em andamento da thread atual (cada sessão do Streamlit roda
+# o script na sua thread). Sem execução em andamento, os eventos não fazem nada
+class Perfilador:
+    def __init__(self, caminho_log: str = PERFIL_LOG, historico: int = 20):
+        self.caminho_log = caminho_log
+        self.historico = deque(maxlen=historico)
+        self._atual = threading.local()
+        self._lock = threading.Lock()
+
+    def atual(self) -> ExecucaoPerfil | None:
+        return getattr(self._atual, "execucao", None)
+
+    # Liga o perfilador aos eventos de cursor do engine
+    def instrumentar(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self._antes)
+        event.listen(engine, "after_cursor_execute", self._depois)
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        if self.atual() is not None:
+            conn.info["perfil_inicio"] = time.perf_counter()
+
+    def _depois(self, conn, cursor, statement, parameters, context, executemany):
+        execucao = self.atual()
+        inicio = conn.info.pop("perfil_inicio", None)
+        if execucao is None or inicio is None:
+            return
+        # SELECT no SQLite (e cursores do lado do servidor) não informa linhas
+        self.registrar(statement, (time.perf_counter() - inicio) * 1000, cursor.rowcount)
+
+    # Registra uma instrução na execução em andamento. Usado pelos eventos do engine e
+    # por quem executa direto no cursor do driver (ex.: COPY), que não gera eventos
+    def registrar(self, sql: str, ms: float, linhas: int = -1):
+        execucao = self.atual()
+        if execucao is None:
+            return
+        execucao.consultas.append({
+            "sql": sql,
+            "forma": forma_sql(sql),
+            "ms": ms,
+            "linhas": linhas if linhas >= 0 else None,
+            "local": _local_chamada(),
+            "funcao": execucao.pilha[-1] if execucao.pilha else None,
+        })
+
+    # Perfila o bloco como uma execução: registra as consultas da thread atual e, no
+    # fim, guarda a execução no histórico e no log. Com ativa=False não faz nada
+    @contextmanager
+    def execucao(self, nome: str, ativa: bool = True):
+        if not ativa:
+            yield None
+            return
+
+        execucao = ExecucaoPerfil(nome)
+        self._atual.execucao = execucao
+        try:
+            yield execucao
+        finally:
+            self._atual.execucao = None
+            execucao.duracao_ms = (time.perf_counter() - execucao._inicio) * 1000
+            self.historico.append(execucao)
+            self._gravar(execucao)
+
+    def _gravar(self, execucao: ExecucaoPerfil):
+        if not self.caminho_log:
+            return
+        linha = json.dumps(execucao.para_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.caminho_log, "a", encoding="utf-8") as arquivo:
+            arquivo.write(linha + "\n")
+
+    # Decorador: cronometra a função na execução em andamento, com o número de
+    # consultas feitas por ela (incluindo as funções cronometradas que ela chamar)
+    def cronometrar(self, funcao):
+        @functools.wraps(funcao)
+        def cronometrada(*args, **kwargs):
+            execucao = self.atual()
+            if execucao is None:
+                return funcao(*args, **kwargs)
+
+            consultas = len(execucao.consultas)
+            execucao.pilha.append(funcao.__name__)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                execucao.pilha.pop()
+                execucao.funcoes.append({
+                    "funcao": funcao.__name__,
+                    "ms": (time.perf_counter() - inicio) * 1000,
+                    "consultas": len(execucao.consultas) - consultas,
+                })
+
+        return cronometrada
+
+
+perfil = Perfilador()
+
+
+# Resumo de um log de perfil por forma de consulta: execuções, tempo total, p50,
+# máximo e execuções com suspeita de N+1, ordenado pelo tempo total
+def resumir_log(caminho: str) -> list[dict]:
+    formas = {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            execucao = json.loads(linha)
+            suspeitas = {suspeita["forma"] for suspeita in execucao["n_mais_1"]}
+            for consulta in execucao["consultas"]:
+                forma = formas.setdefault(consulta["forma"], {"forma": consulta["forma"], "tempos": [], "n+1": set()})
+                forma["tempos"].append(consulta["ms"])
+                if consulta["forma"] in suspeitas:
+                    forma["n+1"].add(execucao["inicio"])
+
+    resumo = [
+        {
+            "forma": forma["forma"],
+            "execuções": len(forma["tempos"]),
+            "total (ms)": sum(forma["tempos"]),
+            "p50 (ms)": statistics.median(forma["tempos"]),
+            "máx (ms)": max(forma["tempos"]),
+            "reruns com N+1": len(forma["n+1"]),
+        }
+        for forma in formas.values()
+    ]
+    return sorted(resumo, key=lambda forma: forma["total (ms)"], reverse=True)
+
+
+# Uso: python -m database.perfil [perfil.jsonl] [--top N]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume o log de perfil das consultas por forma")
+    parser.add_argument("caminho", nargs="?", default=PERFIL_LOG, help="arquivo JSON Lines do perfil")
+    parser.add_argument("--top", type=int, default=20, help="número de formas exibidas")
+    args = parser.parse_args()
+
+    print(f"{'execuções':>9} {'total (ms)':>11} {'p50 (ms)':>9} {'máx (ms)':>9} {'N+1':>4}  forma")
+    for forma in resumir_log(args.caminho)[:args.top]:
+        print(
+            f"{forma['execuções']:>9} {forma['total (ms)']:>11.1f} {forma['p50 (ms)']:>9.2f} "
+            f"{forma['máx (ms)']:>9.2f} {forma['reruns com N+1']:>4}  {forma['forma'][:120]}"
+        )
@@ -0,0 +1,122 @@
+import heapq
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database.cache import em_cache
+from models.models import Promocao
+
+# Cada chave de busca junta o produto e o instante (em segundos) em um int64:
+# produto_id * 2**34 + segundos. 2**34 segundos cobre datas até o ano 2514
+_DESLOCAMENTO = np.int64(2 ** 34)
+
+# Limites de promoções sem data de início ou de fim (NULL): valem desde sempre ou até
+# sempre, dentro da faixa de instantes da chave
+_INICIO_ABERTO = 0
+_FIM_ABERTO = int(_DESLOCAMENTO)
+
+
+def _segundos(instantes) -> np.ndarray:
+    return np.asarray(instantes, dtype="datetime64[s]").astype(np.int64)
+
+
+# Intervalo [início, fim) em segundos de uma promoção, com as datas inclusivas
+def _intervalo(data_inicio, data_fim) -> tuple[int, int]:
+    inicio = _INICIO_ABERTO if data_inicio is None else max(_segundos(data_inicio).item(), _INICIO_ABERTO)
+    fim = _FIM_ABERTO if data_fim is None else min(_segundos(data_fim).item() + 1, _FIM_ABERTO)
+    return inicio, fim
+
+
+# Quebra os intervalos (início, fim, desconto) de um produto em segmentos sem
+# sobreposição com o maior desconto ativo, varrendo os limites em ordem com um heap dos
+# descontos ativos (os vencidos saem quando chegam ao topo): O(k log k) para k promoções
+def _segmentos(intervalos) -> list[tuple[int, int, float]]:
+    intervalos = sorted(intervalos)
+    limites = sorted({limite for inicio, fim, _ in intervalos for limite in (inicio, fim)})
+    ativos, segmentos, proximo = [], [], 0
+    for inicio, fim in zip(limites, limites[1:]):
+        while proximo < len(intervalos) and intervalos[proximo][0] == inicio:
+            _, fim_promocao, desconto = intervalos[proximo]
+            heapq.heappush(ativos, (-desconto, fim_promocao))
+            proximo += 1
+        while ativos and ativos[0][1] <= inicio:
+            heapq.heappop(ativos)
+        if not ativos:
+            continue
+        desconto = -ativos[0][0]
+        if segmentos and segmentos[-1][1] == inicio and segmentos[-1][2] == desconto:
+            segmentos[-1] = (segmentos[-1][0], fim, desconto)
+        else:
+            segmentos.append((inicio, fim, desconto))
+    return segmentos
+
+
+# Índice de intervalos das promoções para resolver preços em lote.
+#
+# As promoções de cada produto (desconto como fração do preço: 0.15 = 15%, válidas de
+# data_inicio a data_fim, inclusive; sem uma delas, o intervalo fica aberto desse lado)
+# são quebradas em segmentos sem sobreposição, cada um com o maior desconto ativo nele.
+# Os segmentos ficam ordenados por (produto, início) em arrays NumPy; resolver N pares
+# (produto_id, instante) é um único searchsorted
+class IndicePromocoes:
+    def __init__(self, promocoes=()):
+        segmentos = {}
+        for produto_id, desconto, data_inicio, data_fim in promocoes:
+            inicio, fim = _intervalo(data_inicio, data_fim)
+            if inicio < fim:
+                segmentos.setdefault(produto_id, []).append((inicio, fim, desconto))
+
+        chaves, fins, descontos, produtos = [], [], [], []
+        for produto_id, intervalos in sorted(segmentos.items()):
+            for inicio, fim, desconto in _segmentos(intervalos):
+                chaves.append(produto_id * int(_DESLOCAMENTO) + inicio)
+                fins.append(fim)
+                descontos.append(desconto)
+                produtos.append(produto_id)
+
+        self.chaves = np.asarray(chaves, dtype=np.int64)
+        self.fins = np.asarray(fins, dtype=np.int64)
+        self.descontos = np.asarray(descontos, dtype=np.float64)
+        self.produtos = np.asarray(produtos, dtype=np.int64)
+        self.num_promocoes = sum(len(intervalos) for intervalos in segmentos.values())
+
+    # Carrega todas as promoções do banco (por uma sessão ou conexão)
+    @classmethod
+    def carregar(cls, db: Session | Connection) -> "IndicePromocoes":
+        return cls(db.execute(
+            select(Promocao.produto_id, Promocao.desconto, Promocao.data_inicio, Promocao.data_fim)
+        ).all())
+
+    # Desconto (fração) em vigor para cada par (produto_id, instante); 0 sem promoção
+    def descontos_em(self, produto_ids, instantes) -> np.ndarray:
+        produto_ids = np.asarray(produto_ids, dtype=np.int64)
+        segundos = np.broadcast_to(_segundos(instantes), produto_ids.shape)
+        resultado = np.zeros(produto_ids.shape, dtype=np.float64)
+        if not len(self.chaves):
+            return resultado
+
+        # Último segmento que começa até o instante, conferindo produto e fim
+        posicoes = np.searchsorted(self.chaves, produto_ids * _DESLOCAMENTO + segundos, side="right") - 1
+        validas = posicoes >= 0
+        posicoes = np.where(validas, posicoes, 0)
+        ativas = validas & (self.produtos[posicoes] == produto_ids) & (segundos < self.fins[posicoes])
+        resultado[ativas] = self.descontos[posicoes[ativas]]
+        return resultado
+
+    # Preço efetivo (com o desconto em vigor) para cada item, arredondado em centavos
+    def precos(self, produto_ids, precos_base, instantes) -> np.ndarray:
+        descontos = self.descontos_em(produto_ids, instantes)
+        return np.round(np.asarray(precos_base, dtype=np.float64) * (1 - descontos), 2)
+
+    # Preço efetivo de um único item
+    def preco(self, produto_id: int, preco_base: float, instante: datetime) -> float:
+        return float(self.precos([produto_id], [preco_base], instante)[0])
+
+
+# Índice das promoções do banco, em cache até a tabela de promoções mudar
+@em_cache("promocoes")
+def indice_promocoes(db: Session) -> IndicePromocoes:
+    return IndicePromocoes.carregar(db)
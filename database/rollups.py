@@ -0,0 +1,178 @@
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from database.bulk import insert_com_conflito
+from database.cache import marcar_alteracao
+from models.models import Produto, ProdutosVenda, Venda, VendaDiariaLoja, VendaDiariaProduto, Watermark
+
+# Nome do watermark com o último id de venda já somado aos resumos
+WATERMARK_ROLLUPS = "rollups_vendas"
+
+# Segundos esperando as transações abertas que gravam em vendas terminarem antes de
+# avançar um watermark (depois disso a atualização não avança e fica para a próxima)
+ESPERA_ESCRITAS = 30
+
+# Transações de outras conexões com escrita aberta em vendas ou em uma das suas partições
+_ESCRITAS_ABERTAS = text("""
+    SELECT DISTINCT virtualtransaction FROM pg_locks
+    WHERE locktype = 'relation' AND mode = 'RowExclusiveLock' AND granted AND pid <> pg_backend_pid()
+      AND relation IN (
+          SELECT 'vendas'::regclass::oid
+          UNION ALL SELECT inhrelid FROM pg_inherits WHERE inhparent = 'vendas'::regclass
+      )
+""")
+
+
+# Lê o valor de um watermark (0 se ainda não existir), travando a linha. A linha é criada
+# antes de travar: sem ela, duas primeiras execuções simultâneas não se bloqueariam
+def ler_watermark(conexao: Connection, nome: str) -> int:
+    conexao.execute(
+        insert_com_conflito(conexao, Watermark.__table__)
+        .values(nome=nome, valor=0, atualizado_em=func.now())
+        .on_conflict_do_nothing(index_elements=[Watermark.nome])
+    )
+    consulta = select(Watermark.valor).where(Watermark.nome == nome)
+    if conexao.dialect.name == "postgresql":
+        consulta = consulta.with_for_update()
+    return conexao.execute(consulta).scalar() or 0
+
+
+# Grava o valor de um watermark
+def gravar_watermark(conexao: Connection, nome: str, valor: int):
+    upsert = insert_com_conflito(conexao, Watermark.__table__).values(nome=nome, valor=valor, atualizado_em=func.now())
+    conexao.execute(upsert.on_conflict_do_update(
+        index_elements=[Watermark.nome],
+        set_={"valor": upsert.excluded.valor, "atualizado_em": upsert.excluded.atualizado_em},
+    ))
+
+
+# Até onde um watermark de id de venda pode avançar: o maior id abaixo do qual não há
+# mais venda por confirmar, ou `atual` se não der para saber dentro de `espera` segundos.
+#
+# Os ids vêm da sequence no INSERT, não no COMMIT: uma venda de id menor que max(id) pode
+# estar em uma transação ainda aberta (ex.: a ingestão do PDV) e seria pulada para sempre.
+# No PostgreSQL, a transação que recebe um id de venda segura o lock ROW EXCLUSIVE de
+# vendas desde antes do nextval até terminar, então basta esperar as que tinham esse lock
+# quando o max(id) foi lido; as que começarem depois recebem ids maiores. As consultas
+# seguintes (READ COMMITTED) já enxergam as vendas que elas confirmarem. No SQLite só há
+# um escritor por vez e os ids que ele atribui são sempre maiores que os confirmados
+def limite_vendas_confirmadas(conexao: Connection, atual: int, espera: float = ESPERA_ESCRITAS) -> int:
+    maior_id = conexao.execute(select(func.max(Venda.id))).scalar() or 0
+    if conexao.dialect.name != "postgresql":
+        return maior_id
+
+    abertas = set(conexao.execute(_ESCRITAS_ABERTAS).scalars())
+    limite = time.monotonic() + espera
+    while abertas:
+        if time.monotonic() > limite:
+            return atual
+        time.sleep(0.05)
+        abertas &= set(conexao.execute(_ESCRITAS_ABERTAS).scalars())
+    return maior_id
+
+
+# Soma aos resumos diários as vendas com id em (venda_id_inicial, venda_id_final]
+def _somar_vendas(conexao: Connection, venda_id_inicial: int, venda_id_final: int):
+    _somar(conexao, (Venda.id > venda_id_inicial) & (Venda.id <= venda_id_final))
+
+
+# Soma aos resumos diários as vendas do filtro
+def _somar(conexao: Connection, faixa):
+    dia = func.date(Venda.data_venda)
+
+    # Por loja/produto: quantidade, receita e número de vendas com o produto
+    por_produto = (
+        select(
+            dia,
+            Venda.loja_id,
+            ProdutosVenda.produto_id,
+            Produto.categoria_id,
+            func.sum(ProdutosVenda.quantidade),
+            func.sum(ProdutosVenda.subtotal),
+            func.count(func.distinct(Venda.id)),
+        )
+        .join(ProdutosVenda, ProdutosVenda.venda_id == Venda.id)
+        .join(Produto, ProdutosVenda.produto_id == Produto.id)
+        .where(faixa)
+        .group_by(dia, Venda.loja_id, ProdutosVenda.produto_id, Produto.categoria_id)
+    )
+    upsert = insert_com_conflito(conexao, VendaDiariaProduto.__table__).from_select(
+        ["dia", "loja_id", "produto_id", "categoria_id", "quantidade", "receita", "tickets"], por_produto
+    )
+    conexao.execute(upsert.on_conflict_do_update(
+        index_elements=["dia", "loja_id", "produto_id"],
+        set_={
+            "quantidade": VendaDiariaProduto.quantidade + upsert.excluded.quantidade,
+            "receita": VendaDiariaProduto.receita + upsert.excluded.receita,
+            "tickets": VendaDiariaProduto.tickets + upsert.excluded.tickets,
+        },
+    ))
+
+    # Por loja: receita e número de vendas (tickets)
+    por_loja = (
+        select(dia, Venda.loja_id, func.sum(Venda.total), func.count(Venda.id))
+        .where(faixa)
+        .group_by(dia, Venda.loja_id)
+    )
+    upsert = insert_com_conflito(conexao, VendaDiariaLoja.__table__).from_select(
+        ["dia", "loja_id", "receita", "tickets"], por_loja
+    )
+    conexao.execute(upsert.on_conflict_do_update(
+        index_elements=["dia", "loja_id"],
+        set_={
+            "receita": VendaDiariaLoja.receita + upsert.excluded.receita,
+            "tickets": VendaDiariaLoja.tickets + upsert.excluded.tickets,
+        },
+    ))
+
+
+# Refaz os resumos de um dia depois de alterar vendas já somadas (ex.: itens editados em
+# database/totais.py), na transação da alteração. Só entram as vendas até o watermark;
+# as mais novas são somadas pela próxima atualização
+def reagregar_dia(conexao: Connection, dia: date):
+    venda_id_final = ler_watermark(conexao, WATERMARK_ROLLUPS)
+    conexao.execute(delete(VendaDiariaProduto).where(VendaDiariaProduto.dia == dia))
+    conexao.execute(delete(VendaDiariaLoja).where(VendaDiariaLoja.dia == dia))
+    inicio = datetime.combine(dia, datetime.min.time())
+    _somar(conexao, (Venda.id <= venda_id_final) & (Venda.data_venda >= inicio)
+           & (Venda.data_venda < inicio + timedelta(days=1)))
+    marcar_alteracao(conexao, VendaDiariaLoja.__tablename__, VendaDiariaProduto.__tablename__)
+
+
+# Atualiza os resumos diários processando apenas as vendas mais novas que o watermark
+# (até o limite das vendas já confirmadas). Retorna a faixa de ids processada
+def atualizar_rollups(engine: Engine) -> tuple[int, int]:
+    with engine.begin() as conexao:
+        venda_id_inicial = ler_watermark(conexao, WATERMARK_ROLLUPS)
+        venda_id_final = limite_vendas_confirmadas(conexao, venda_id_inicial)
+        if venda_id_final > venda_id_inicial:
+            _somar_vendas(conexao, venda_id_inicial, venda_id_final)
+            gravar_watermark(conexao, WATERMARK_ROLLUPS, venda_id_final)
+            marcar_alteracao(conexao, VendaDiariaLoja.__tablename__, VendaDiariaProduto.__tablename__)
+    return venda_id_inicial, venda_id_final
+
+
+# Refaz os resumos do zero (ex.: depois de alterar ou apagar vendas antigas)
+def reconstruir_rollups(engine: Engine) -> tuple[int, int]:
+    with engine.begin() as conexao:
+        conexao.execute(VendaDiariaProduto.__table__.delete())
+        conexao.execute(VendaDiariaLoja.__table__.delete())
+        gravar_watermark(conexao, WATERMARK_ROLLUPS, 0)
+        marcar_alteracao(conexao, VendaDiariaLoja.__tablename__, VendaDiariaProduto.__tablename__)
+    return atualizar_rollups(engine)
+
+
+# Uso: python -m database.rollups [--reconstruir]
+if __name__ == "__main__":
+    import sys
+
+    from database.database import engine
+
+    if "--reconstruir" in sys.argv:
+        inicio, fim = reconstruir_rollups(engine)
+    else:
+        inicio, fim = atualizar_rollups(engine)
+    print(f"Resumos atualizados com as vendas de id {inicio + 1} a {fim}")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, PositiveFloat, EmailStr, validator, Field
+from pydantic import BaseModel, PositiveFloat, PositiveInt, EmailStr, validator, field_validator, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -101,6 +101,17 @@ class VendedorUpdate(BaseModel):
     nome: Optional[str] = None
     loja_id: Optional[int] = None
 
+# Item de uma venda. Sem preco_unitario, vale o preço do produto com a promoção em vigor
+class ItemVendaCreate(BaseModel):
+    produto_id: int
+    quantidade: PositiveInt
+    preco_unitario: Optional[PositiveFloat] = None
+
+# Pagamento enviado junto com a venda (o venda_id só existe depois da gravação)
+class PagamentoVendaCreate(BaseModel):
+    metodo: str
+    status: str
+
 # Venda
 class VendaBase(BaseModel):
     cliente_id: int
@@ -108,8 +119,22 @@ class VendaBase(BaseModel):
     loja_id: int
     total: PositiveFloat
 
+# Venda completa para gravação (database/ingestao.py): o total é calculado pelos
+# itens; se vier, é só conferido
 class VendaCreate(VendaBase):
-    pass
+    total: Optional[PositiveFloat] = None
+    data_venda: Optional[datetime] = None
+    itens: List[ItemVendaCreate] = Field(min_length=1)
+    pagamento: Optional[PagamentoVendaCreate] = None
+
+    # data_venda é gravada sem fuso, no horário local (o mesmo de datetime.now()):
+    # datas com fuso são convertidas para ele
+    @field_validator("data_venda")
+    @classmethod
+    def data_venda_local(cls, valor: Optional[datetime]) -> Optional[datetime]:
+        if valor is not None and valor.tzinfo is not None:
+            return valor.astimezone().replace(tzinfo=None)
+        return valor
 
 class VendaResponse(VendaBase):
     id: int
@@ -125,10 +150,8 @@ class VendaUpdate(BaseModel):
     total: Optional[PositiveFloat] = None
 
 # Pagamento
-class PagamentoBase(BaseModel):
+class PagamentoBase(PagamentoVendaCreate):
     venda_id: int
-    metodo: str
-    status: str
 
 class PagamentoCreate(PagamentoBase):
     pass
@@ -0,0 +1,293 @@
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, Integer, cast, func, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from database.bulk import gravar_dataframe
+from database.cache import marcar_alteracao
+from database.consultas import buscar_dataframe
+from database.rollups import gravar_watermark, ler_watermark, limite_vendas_confirmadas
+from models.models import ClienteSegmento, CoorteClientes, Venda
+
+# Nome do watermark com o último id de venda já incluído nos segmentos
+WATERMARK_SEGMENTOS = "segmentos_clientes"
+
+# Marca (1) de valores de clientes ajustados depois da última segmentação: as notas,
+# que dependem de todos os clientes, são recalculadas na próxima atualização
+WATERMARK_NOTAS_PENDENTES = "segmentos_notas_pendentes"
+
+# Faixa de ids de venda lida por consulta (as vendas chegam em lotes colunares)
+TAMANHO_LOTE_SEGMENTOS = 1_000_000
+
+# Notas de recência, frequência e valor: de 1 a NOTAS, por quantil entre os clientes
+NOTAS = 5
+
+# Meses marcados em meses_ativos (bits 0 a 62 do BIGINT); compras mais tardias que isso
+# contam no RFM, mas não aparecem nas coortes
+MAX_MESES = 63
+
+# Multiplicador do cliente na chave (cliente, mês): meses desde 1970 cabem até 2311
+_MESES_CHAVE = 4096
+
+# Segmento pelas notas de recência (linhas) e de frequência (colunas), de 1 a 5
+SEGMENTOS = np.array([
+    ["Hibernando", "Hibernando", "Em risco", "Em risco", "Não pode perder"],
+    ["Hibernando", "Hibernando", "Em risco", "Em risco", "Não pode perder"],
+    ["Quase dormindo", "Quase dormindo", "Precisa de atenção", "Fiéis", "Fiéis"],
+    ["Promissores", "Potenciais fiéis", "Potenciais fiéis", "Fiéis", "Fiéis"],
+    ["Novos", "Potenciais fiéis", "Potenciais fiéis", "Campeões", "Campeões"],
+], dtype=object)
+
+_COLUNAS_RESUMO = {"primeira": "min", "ultima": "max", "compras": "sum", "valor": "sum"}
+
+
+# Data como número de dias desde 1970-01-01, calculado no banco (sem converter milhões
+# de datas em objetos datetime no Python)
+def _dias(conexao: Connection, coluna):
+    if conexao.dialect.name == "postgresql":
+        return cast(coluna, Date) - date(1970, 1, 1)
+    return cast(func.julianday(func.date(coluna)) - 2440587.5, Integer)
+
+
+# Mês (meses desde 1970-01) de cada dia (dias desde 1970-01-01)
+def _mes(dias) -> np.ndarray:
+    return np.asarray(dias, dtype="datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+# Dias desde 1970-01-01 (ou, com unidade "M", meses desde 1970-01) como datas
+def _datas(meses_ou_dias, unidade: str = "D") -> pd.Series:
+    return pd.Series(np.asarray(meses_ou_dias, dtype=f"datetime64[{unidade}]").astype("datetime64[D]"))
+
+
+# Vendas com id em (venda_id_inicial, venda_id_final], uma faixa de tamanho_lote ids
+# por consulta. Cada lote vem em colunas (COPY + Arrow no PostgreSQL): cliente, dia e total
+def ler_vendas(db: Session, venda_id_inicial: int, venda_id_final: int, tamanho_lote: int = TAMANHO_LOTE_SEGMENTOS):
+    dia = _dias(db.connection(), Venda.data_venda).label("dia")
+    for inicio in range(venda_id_inicial, venda_id_final, tamanho_lote):
+        fim = min(inicio + tamanho_lote, venda_id_final)
+        yield buscar_dataframe(db, select(Venda.cliente_id, dia, Venda.total).where(
+            Venda.id > inicio, Venda.id <= fim, Venda.cliente_id.is_not(None)
+        ))
+
+
+# Resume um lote de vendas por cliente (primeira e última compra em dias, compras e
+# valor) e devolve também as chaves (cliente, mês) com compra, sem repetição
+def _resumir_lote(vendas: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    vendas = vendas.assign(total=vendas["total"].fillna(0.0), compras=1)
+    resumo = vendas.groupby("cliente_id").agg(
+        primeira=("dia", "min"), ultima=("dia", "max"), compras=("compras", "sum"), valor=("total", "sum"),
+    )
+    chaves = vendas["cliente_id"].to_numpy(np.int64) * _MESES_CHAVE + _mes(vendas["dia"])
+    return resumo, np.unique(chaves)
+
+
+# Resume as vendas da faixa de ids lote a lote: só os resumos por cliente e as chaves
+# (cliente, mês) de cada lote ficam em memória até a combinação final
+def resumir_vendas(db: Session, venda_id_inicial: int, venda_id_final: int,
+                   tamanho_lote: int = TAMANHO_LOTE_SEGMENTOS) -> tuple[pd.DataFrame, np.ndarray, int]:
+    resumos, chaves, vendas_lidas = [], [], 0
+    for vendas in ler_vendas(db, venda_id_inicial, venda_id_final, tamanho_lote):
+        if vendas.empty:
+            continue
+        resumo, chaves_lote = _resumir_lote(vendas)
+        resumos.append(resumo)
+        chaves.append(chaves_lote)
+        vendas_lidas += len(vendas)
+
+    if not resumos:
+        return pd.DataFrame(columns=list(_COLUNAS_RESUMO)), np.empty(0, np.int64), 0
+    resumo = pd.concat(resumos).groupby(level=0).agg(_COLUNAS_RESUMO)
+    return resumo, np.unique(np.concatenate(chaves)), vendas_lidas
+
+
+# Estado já gravado de cada cliente: datas em dias, compras, valor e meses_ativos
+def _ler_estado(db: Session) -> pd.DataFrame:
+    conexao = db.connection()
+    estado = buscar_dataframe(db, select(
+        ClienteSegmento.cliente_id,
+        _dias(conexao, ClienteSegmento.primeira_compra).label("primeira"),
+        _dias(conexao, ClienteSegmento.ultima_compra).label("ultima"),
+        ClienteSegmento.compras,
+        ClienteSegmento.valor,
+        ClienteSegmento.meses_ativos,
+    ).order_by(ClienteSegmento.cliente_id))
+    tipos = {"cliente_id": np.int64, "primeira": np.int64, "ultima": np.int64, "compras": np.int64,
+             "valor": np.float64, "meses_ativos": np.int64}
+    return estado.astype(tipos)
+
+
+# Desloca os bits de meses_ativos para a esquerda; bits além de MAX_MESES são descartados
+def _deslocar(bits: np.ndarray, meses: np.ndarray) -> np.ndarray:
+    deslocados = np.left_shift(bits, np.minimum(meses, MAX_MESES - 1)) & np.int64((1 << MAX_MESES) - 1)
+    return np.where(meses < MAX_MESES, deslocados, 0)
+
+
+# Junta o estado gravado com o resumo das vendas novas. A primeira compra pode ficar mais
+# antiga (vendas lançadas com data retroativa): os meses já marcados são deslocados
+# para a nova coorte antes de marcar os meses das vendas novas
+def combinar(estado: pd.DataFrame, resumo: pd.DataFrame, chaves: np.ndarray) -> pd.DataFrame:
+    clientes = pd.concat([estado.set_index("cliente_id")[list(_COLUNAS_RESUMO)], resumo])
+    clientes = clientes.groupby(level=0).agg(_COLUNAS_RESUMO)
+    ids = clientes.index.to_numpy(np.int64)
+    primeiro_mes = _mes(clientes["primeira"])
+    meses_ativos = np.zeros(len(ids), np.int64)
+
+    if len(estado):
+        posicoes = np.searchsorted(ids, estado["cliente_id"].to_numpy(np.int64))
+        meses_ativos[posicoes] = _deslocar(
+            estado["meses_ativos"].to_numpy(np.int64), _mes(estado["primeira"]) - primeiro_mes[posicoes]
+        )
+
+    # As chaves estão ordenadas por cliente: um OR por cliente junta os meses de cada um
+    if len(chaves):
+        clientes_chaves, meses = np.divmod(chaves, _MESES_CHAVE)
+        posicoes = np.searchsorted(ids, clientes_chaves)
+        bits = _deslocar(np.ones(len(chaves), np.int64), meses - primeiro_mes[posicoes])
+        inicios = np.flatnonzero(np.r_[True, posicoes[1:] != posicoes[:-1]])
+        meses_ativos[posicoes[inicios]] |= np.bitwise_or.reduceat(bits, inicios)
+
+    clientes["meses_ativos"] = meses_ativos
+    return clientes
+
+
+# Nota de 1 a NOTAS pelo quantil de cada valor entre todos. Valores iguais ficam com a
+# mesma nota, pela posição do meio do empate (como o rank médio do pandas)
+def _notas(valores: np.ndarray) -> np.ndarray:
+    ordenados = np.sort(valores)
+    posicoes = np.searchsorted(ordenados, valores, side="left") + np.searchsorted(ordenados, valores, side="right")
+    return posicoes * NOTAS // max(2 * len(valores), 1) + 1
+
+
+# Notas RFM e segmento de cada cliente. A recência é contada até o dia da última venda
+# registrada (e não até hoje), para os dados gerados em outra data fazerem sentido
+def calcular_segmentos(clientes: pd.DataFrame) -> pd.DataFrame:
+    primeira = clientes["primeira"].to_numpy(np.int64)
+    ultima = clientes["ultima"].to_numpy(np.int64)
+    recencia = ultima.max(initial=0) - ultima
+    nota_recencia = _notas(-recencia)
+    nota_frequencia = _notas(clientes["compras"].to_numpy(np.int64))
+    return pd.DataFrame({
+        "cliente_id": clientes.index.to_numpy(np.int64),
+        "primeira_compra": _datas(primeira),
+        "ultima_compra": _datas(ultima),
+        "compras": clientes["compras"].to_numpy(np.int64),
+        "valor": clientes["valor"].to_numpy(np.float64).round(2),
+        "meses_ativos": clientes["meses_ativos"].to_numpy(np.int64),
+        "recencia": recencia,
+        "nota_recencia": nota_recencia,
+        "nota_frequencia": nota_frequencia,
+        "nota_valor": _notas(clientes["valor"].to_numpy(np.float64)),
+        "segmento": SEGMENTOS[nota_recencia - 1, nota_frequencia - 1],
+    })
+
+
+# Matriz de coortes: para cada coorte (mês da primeira compra) e cada mês depois dela,
+# até o mês da última venda, quantos clientes da coorte compraram naquele mês
+def calcular_coortes(clientes: pd.DataFrame) -> pd.DataFrame:
+    if clientes.empty:
+        return pd.DataFrame(columns=["coorte", "mes", "clientes"])
+    primeiro_mes = _mes(clientes["primeira"])
+    meses_ativos = clientes["meses_ativos"].to_numpy(np.int64)
+    coortes, grupos = np.unique(primeiro_mes, return_inverse=True)
+    ultimo_mes = _mes(clientes["ultima"]).max()
+
+    meses = range(min(ultimo_mes - coortes[0] + 1, MAX_MESES))
+    matriz = np.column_stack([
+        np.bincount(grupos, weights=(meses_ativos >> mes) & 1, minlength=len(coortes)) for mes in meses
+    ])
+    linhas, colunas = np.nonzero(coortes[:, None] + np.arange(len(meses)) <= ultimo_mes)
+    return pd.DataFrame({
+        "coorte": _datas(coortes[linhas], "M"),
+        "mes": colunas,
+        "clientes": matriz[linhas, colunas].astype(np.int64),
+    })
+
+
+# Apaga os segmentos e as coortes (TRUNCATE no PostgreSQL, sem deixar 1M de linhas mortas)
+def _esvaziar(conexao: Connection):
+    for model in (ClienteSegmento, CoorteClientes):
+        if conexao.dialect.name == "postgresql":
+            conexao.execute(text(f"TRUNCATE {model.__tablename__}"))
+        else:
+            conexao.execute(model.__table__.delete())
+
+
+# Regrava as tabelas de segmentos e de coortes com o resultado completo
+def _gravar(conexao: Connection, segmentos: pd.DataFrame, coortes: pd.DataFrame):
+    _esvaziar(conexao)
+    gravar_dataframe(conexao, ClienteSegmento.__table__, segmentos)
+    gravar_dataframe(conexao, CoorteClientes.__table__, coortes)
+
+
+# Soma a diferença no total de uma venda já incluída nos segmentos (ex.: itens editados
+# em database/totais.py) ao valor do cliente, na transação da alteração. A venda de id
+# acima do watermark ainda entra inteira na próxima atualização
+def ajustar_valor_cliente(conexao: Connection, venda_id: int, cliente_id: int, diferenca: float):
+    if cliente_id is None or not diferenca or venda_id > ler_watermark(conexao, WATERMARK_SEGMENTOS):
+        return
+    conexao.execute(
+        update(ClienteSegmento)
+        .where(ClienteSegmento.cliente_id == cliente_id)
+        .values(valor=func.round(ClienteSegmento.valor + diferenca, 2))
+    )
+    gravar_watermark(conexao, WATERMARK_NOTAS_PENDENTES, 1)
+    marcar_alteracao(conexao, ClienteSegmento.__tablename__)
+
+
+# Atualiza os segmentos lendo só as vendas mais novas que o watermark, até o limite das
+# vendas já confirmadas (como nos resumos diários): os resumos por cliente das vendas
+# novas são somados ao estado gravado e as notas (que dependem de todos os clientes) são
+# recalculadas, também sem vendas novas se algum valor foi ajustado. Retorna a faixa de
+# ids processada
+def atualizar_segmentos(engine: Engine, tamanho_lote: int = TAMANHO_LOTE_SEGMENTOS) -> tuple[int, int]:
+    inicio_execucao = time.perf_counter()
+    with Session(engine) as db, db.begin():
+        conexao = db.connection()
+        venda_id_inicial = ler_watermark(conexao, WATERMARK_SEGMENTOS)
+        venda_id_final = limite_vendas_confirmadas(conexao, venda_id_inicial)
+        notas_pendentes = ler_watermark(conexao, WATERMARK_NOTAS_PENDENTES)
+        if venda_id_final <= venda_id_inicial and not notas_pendentes:
+            return venda_id_inicial, venda_id_final
+
+        resumo, chaves, vendas_lidas = resumir_vendas(db, venda_id_inicial, venda_id_final, tamanho_lote)
+        leitura = time.perf_counter() - inicio_execucao
+        clientes = combinar(_ler_estado(db), resumo, chaves)
+        segmentos = calcular_segmentos(clientes)
+        _gravar(conexao, segmentos, calcular_coortes(clientes))
+        gravar_watermark(conexao, WATERMARK_SEGMENTOS, max(venda_id_final, venda_id_inicial))
+        gravar_watermark(conexao, WATERMARK_NOTAS_PENDENTES, 0)
+        marcar_alteracao(conexao, ClienteSegmento.__tablename__, CoorteClientes.__tablename__)
+
+    print(f"{vendas_lidas:,} vendas lidas em {leitura:.1f}s; {len(segmentos):,} clientes segmentados "
+          f"em {time.perf_counter() - inicio_execucao:.1f}s")
+    return venda_id_inicial, venda_id_final
+
+
+# Refaz os segmentos do zero (ex.: depois de alterar ou apagar vendas antigas)
+def reconstruir_segmentos(engine: Engine, tamanho_lote: int = TAMANHO_LOTE_SEGMENTOS) -> tuple[int, int]:
+    with engine.begin() as conexao:
+        _esvaziar(conexao)
+        gravar_watermark(conexao, WATERMARK_SEGMENTOS, 0)
+        marcar_alteracao(conexao, ClienteSegmento.__tablename__, CoorteClientes.__tablename__)
+    return atualizar_segmentos(engine, tamanho_lote)
+
+
+# Uso: python -m database.segmentos [--reconstruir] [--tamanho-lote N]
+if __name__ == "__main__":
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Atualiza os segmentos RFM e as coortes de clientes")
+    parser.add_argument("--reconstruir", action="store_true", help="refaz os segmentos com todas as vendas")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_SEGMENTOS, help="ids de venda por consulta")
+    args = parser.parse_args()
+
+    if args.reconstruir:
+        inicio, fim = reconstruir_segmentos(engine, args.tamanho_lote)
+    else:
+        inicio, fim = atualizar_segmentos(engine, args.tamanho_lote)
+    print(f"Segmentos atualizados com as vendas de id {inicio + 1} a {fim}")
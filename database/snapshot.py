@@ -0,0 +1,264 @@
+import argparse
+import glob
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pyarrow.parquet
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+
+from database.cache import cache, marcar_alteracao
+from database.exportacao import TAMANHO_LOTE, gravar_parquet
+from database.rollups import gravar_watermark, ler_watermark, limite_vendas_confirmadas
+from models.models import Categoria, Loja, Produto, ProdutosVenda, Regiao, Venda, Watermark
+
+# Painéis agregados lidos do snapshot colunar em vez das tabelas de resumo (requer duckdb)
+DB_SNAPSHOT = os.getenv("DB_SNAPSHOT", "false").lower() in ("1", "true", "sim")
+
+# Diretório do snapshot: um subdiretório de arquivos Parquet por tabela
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+
+# Nome usado para invalidar no cache os resultados lidos do snapshot
+TABELA_SNAPSHOT = "snapshot"
+
+# Vendas alteradas depois de copiadas (ex.: itens editados em database/totais.py): o
+# menor id alterado (0 sem pendência) e um contador de alterações, para a atualização
+# só limpar a pendência se nada mudou enquanto ela regravava as partes
+WATERMARK_VENDA_ALTERADA = "snapshot_menor_venda_alterada"
+WATERMARK_ALTERACOES = "snapshot_alteracoes"
+
+# Acima desse número de partes, as partes de uma tabela são juntadas em um arquivo
+MAX_PARTES = 32
+
+# Tabelas pequenas, copiadas inteiras a cada atualização
+DIMENSOES = {
+    Regiao.__tablename__: (Regiao.id, Regiao.nome),
+    Loja.__tablename__: (Loja.id, Loja.nome, Loja.regiao_id),
+    Categoria.__tablename__: (Categoria.id, Categoria.nome),
+    Produto.__tablename__: (Produto.id, Produto.nome, Produto.categoria_id, Produto.preco),
+}
+
+# Tabelas de fatos, copiadas de forma incremental: cada atualização grava uma parte
+# nova com as vendas (e seus itens) de id em (inicio, fim], no arquivo "inicio-fim.parquet".
+# Os itens levam a data e a loja da venda, para os painéis não precisarem do join
+FATOS = {
+    Venda.__tablename__: (
+        select(Venda.id, Venda.cliente_id, Venda.vendedor_id, Venda.loja_id, Venda.data_venda, Venda.total),
+        Venda.id,
+    ),
+    ProdutosVenda.__tablename__: (
+        select(
+            ProdutosVenda.id, ProdutosVenda.venda_id, ProdutosVenda.produto_id,
+            ProdutosVenda.quantidade, ProdutosVenda.preco_unitario, ProdutosVenda.subtotal,
+            Venda.data_venda, Venda.loja_id,
+        ).join(Venda, ProdutosVenda.venda_id == Venda.id),
+        ProdutosVenda.venda_id,
+    ),
+}
+
+
+def _diretorio(tabela: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, tabela)
+
+
+# Partes de uma tabela de fatos, ordenadas: [(inicio, fim, caminho)]
+def _partes(tabela: str) -> list[tuple[int, int, str]]:
+    partes = []
+    for caminho in glob.glob(os.path.join(_diretorio(tabela), "*-*.parquet")):
+        inicio, fim = os.path.basename(caminho).removesuffix(".parquet").split("-")
+        partes.append((int(inicio), int(fim), caminho))
+    return sorted(partes)
+
+
+def _nome_parte(tabela: str, inicio: int, fim: int) -> str:
+    return os.path.join(_diretorio(tabela), f"{inicio:012d}-{fim:012d}.parquet")
+
+
+# Último id de venda copiado para o snapshot (0 se ainda vazio). As partes de vendas
+# são gravadas por último, então elas definem até onde o snapshot está completo
+def watermark_snapshot() -> int:
+    partes = _partes(Venda.__tablename__)
+    return partes[-1][1] if partes else 0
+
+
+# Último id de venda copiado e quando, ou None se o snapshot ainda não existe
+def estado_snapshot():
+    partes = _partes(Venda.__tablename__)
+    if not partes:
+        return None
+    return partes[-1][1], datetime.fromtimestamp(os.path.getmtime(partes[-1][2]))
+
+
+# Apaga partes de itens sem a parte de vendas correspondente (atualização interrompida)
+def _remover_orfas():
+    watermark = watermark_snapshot()
+    for _, fim, caminho in _partes(ProdutosVenda.__tablename__):
+        if fim > watermark:
+            os.remove(caminho)
+
+
+# Registra, na transação da alteração, que uma venda mudou: a próxima atualização
+# regrava as partes a partir da que a contém
+def registrar_venda_alterada(conexao: Connection, venda_id: int):
+    menor = ler_watermark(conexao, WATERMARK_VENDA_ALTERADA)
+    if not menor or venda_id < menor:
+        gravar_watermark(conexao, WATERMARK_VENDA_ALTERADA, venda_id)
+    gravar_watermark(conexao, WATERMARK_ALTERACOES, ler_watermark(conexao, WATERMARK_ALTERACOES) + 1)
+
+
+def _ler_alteracoes(conexao: Connection) -> tuple[int, int]:
+    valores = dict(conexao.execute(select(Watermark.nome, Watermark.valor).where(
+        Watermark.nome.in_([WATERMARK_VENDA_ALTERADA, WATERMARK_ALTERACOES])
+    )).all())
+    return valores.get(WATERMARK_VENDA_ALTERADA) or 0, valores.get(WATERMARK_ALTERACOES) or 0
+
+
+# Apaga as partes de vendas com ids a partir de venda_id (as de itens saem como órfãs)
+def _descartar_partes(venda_id: int):
+    for _, fim, caminho in _partes(Venda.__tablename__):
+        if fim >= venda_id:
+            os.remove(caminho)
+
+
+# Se as partes de alguma tabela de fatos foram gravadas com outras colunas (snapshot de
+# uma versão anterior), para a atualização copiar tudo de novo
+def _colunas_mudaram() -> bool:
+    for tabela, (consulta, _) in FATOS.items():
+        partes = _partes(tabela)
+        colunas = [coluna.name for coluna in consulta.selected_columns]
+        if partes and pyarrow.parquet.read_schema(partes[0][2]).names != colunas:
+            return True
+    return False
+
+
+# Junta as partes de uma tabela de fatos em um único arquivo, row group a row group
+def _compactar(tabela: str):
+    partes = _partes(tabela)
+    if len(partes) <= MAX_PARTES:
+        return
+    caminho = _nome_parte(tabela, partes[0][0], partes[-1][1])
+    temporario = caminho + ".tmp"
+    schema = pyarrow.parquet.read_schema(partes[0][2])
+    with pyarrow.parquet.ParquetWriter(temporario, schema, compression="zstd") as escritor:
+        for _, _, parte in partes:
+            arquivo = pyarrow.parquet.ParquetFile(parte)
+            for indice in range(arquivo.num_row_groups):
+                escritor.write_table(arquivo.read_row_group(indice))
+    for _, _, parte in partes:
+        os.remove(parte)
+    os.replace(temporario, caminho)
+
+
+# Atualiza o snapshot: recopia as dimensões e acrescenta as vendas (e seus itens) mais
+# novas que o watermark, até o limite das vendas já confirmadas (uma venda de id menor
+# ainda em transação ficaria fora das partes para sempre). Vendas alteradas depois de
+# copiadas fazem as partes a partir delas serem copiadas de novo. Retorna a faixa de ids
+# de venda copiada
+def atualizar_snapshot(engine: Engine, tamanho_lote: int = TAMANHO_LOTE) -> tuple[int, int]:
+    for tabela in (*DIMENSOES, *FATOS):
+        os.makedirs(_diretorio(tabela), exist_ok=True)
+
+    with engine.connect() as conexao:
+        venda_alterada, alteracoes = _ler_alteracoes(conexao)
+    if _colunas_mudaram():
+        _descartar_partes(0)
+    elif venda_alterada:
+        _descartar_partes(venda_alterada)
+    _remover_orfas()
+
+    with engine.connect() as conexao:
+        for tabela, colunas in DIMENSOES.items():
+            gravar_parquet(conexao, select(*colunas), os.path.join(_diretorio(tabela), "dados.parquet"), tamanho_lote)
+
+        venda_id_inicial = watermark_snapshot()
+        venda_id_final = limite_vendas_confirmadas(conexao, venda_id_inicial)
+        if venda_id_final > venda_id_inicial:
+            # Itens primeiro: a parte de vendas é a última a aparecer
+            for tabela in (ProdutosVenda.__tablename__, Venda.__tablename__):
+                consulta, chave = FATOS[tabela]
+                consulta = consulta.where(chave > venda_id_inicial, chave <= venda_id_final)
+                gravar_parquet(conexao, consulta, _nome_parte(tabela, venda_id_inicial, venda_id_final), tamanho_lote)
+                _compactar(tabela)
+
+    with engine.begin() as conexao:
+        if venda_alterada and ler_watermark(conexao, WATERMARK_ALTERACOES) == alteracoes:
+            gravar_watermark(conexao, WATERMARK_VENDA_ALTERADA, 0)
+        marcar_alteracao(conexao, TABELA_SNAPSHOT)
+    return venda_id_inicial, venda_id_final
+
+
+# Apaga o snapshot e o copia do zero (ex.: depois de alterar ou apagar vendas antigas)
+def reconstruir_snapshot(engine: Engine, tamanho_lote: int = TAMANHO_LOTE) -> tuple[int, int]:
+    shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+    return atualizar_snapshot(engine, tamanho_lote)
+
+
+# Conexão DuckDB em memória com uma view por tabela sobre os arquivos Parquet
+def conectar_snapshot():
+    import duckdb
+
+    conexao = duckdb.connect()
+    for tabela in (*DIMENSOES, *FATOS):
+        arquivos = os.path.join(_diretorio(tabela), "*.parquet")
+        conexao.execute(f"CREATE VIEW {tabela} AS SELECT * FROM read_parquet('{arquivos}')")
+    return conexao
+
+
+# Primeiro e último dia com vendas no snapshot
+def periodo_snapshot():
+    def carregar():
+        if estado_snapshot() is None:
+            return None, None
+        with conectar_snapshot() as conexao:
+            return conexao.execute("SELECT min(data_venda)::DATE, max(data_venda)::DATE FROM vendas").fetchone()
+
+    return cache.obter(("periodo_snapshot",), (TABELA_SNAPSHOT,), carregar)
+
+
+# Painéis do resumo de vendas calculados sobre o snapshot, no mesmo formato de
+# buscar_paineis_resumo: linhas (por dia, por loja, por categoria)
+def buscar_paineis_snapshot(inicio, fim):
+    def carregar():
+        parametros = [inicio, fim + timedelta(days=1)]
+        with conectar_snapshot() as conexao:
+            dias = conexao.execute("""
+                SELECT data_venda::DATE, sum(total), count(*)
+                FROM vendas
+                WHERE data_venda >= ? AND data_venda < ?
+                GROUP BY 1
+                ORDER BY 1
+            """, parametros).fetchall()
+            lojas = conexao.execute("""
+                SELECT l.nome, sum(v.total), count(*), sum(v.total) / count(*)
+                FROM vendas v JOIN lojas l ON v.loja_id = l.id
+                WHERE v.data_venda >= ? AND v.data_venda < ?
+                GROUP BY l.id, l.nome
+                ORDER BY 2 DESC
+            """, parametros).fetchall()
+            categorias = conexao.execute("""
+                SELECT c.nome, sum(pv.subtotal), sum(pv.quantidade)
+                FROM produtos_venda pv
+                JOIN produtos p ON pv.produto_id = p.id
+                JOIN categorias c ON p.categoria_id = c.id
+                WHERE pv.data_venda >= ? AND pv.data_venda < ?
+                GROUP BY c.id, c.nome
+                ORDER BY 2 DESC
+            """, parametros).fetchall()
+        return dias, lojas, categorias
+
+    return cache.obter(("buscar_paineis_snapshot", inicio, fim), (TABELA_SNAPSHOT,), carregar)
+
+
+# Uso: python -m database.snapshot [--reconstruir] [--tamanho-lote N]
+if __name__ == "__main__":
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Atualiza o snapshot colunar das vendas")
+    parser.add_argument("--reconstruir", action="store_true", help="apaga o snapshot e copia tudo de novo")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="linhas por lote")
+    args = parser.parse_args()
+
+    atualizar = reconstruir_snapshot if args.reconstruir else atualizar_snapshot
+    inicio, fim = atualizar(engine, args.tamanho_lote)
+    print(f"Snapshot em {SNAPSHOT_DIR} atualizado com as vendas de id {inicio + 1} a {fim}")
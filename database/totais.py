@@ -0,0 +1,206 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from database.cache import marcar_alteracao
+from database.rollups import WATERMARK_ROLLUPS, ler_watermark, reagregar_dia
+from database.snapshot import registrar_venda_alterada
+from models.models import ProdutosVenda, Venda
+
+# Vendas por transação no recálculo em lotes
+TAMANHO_LOTE_RECALCULO = 50_000
+
+
+# Preenche o subtotal de cada item e o total e a quantidade de itens (unidades) da venda.
+# Todo código que grava vendas passa por aqui, para os valores irem prontos para o banco;
+# itens de vendas já gravadas mudam por adicionar_item, alterar_item e remover_item
+def calcular_totais(venda: dict, itens: list[dict]) -> dict:
+    total = 0
+    qtd_itens = 0
+    for item in itens:
+        item["subtotal"] = item["quantidade"] * item["preco_unitario"]
+        total += item["subtotal"]
+        qtd_itens += item["quantidade"]
+    venda["total"] = total
+    venda["qtd_itens"] = qtd_itens
+    return venda
+
+
+# Versão vetorizada de calcular_totais para os DataFrames de vendas e itens
+def calcular_totais_dataframe(df_vendas: pd.DataFrame, df_itens: pd.DataFrame):
+    quantidades = df_itens["quantidade"].to_numpy()
+    subtotais = quantidades * df_itens["preco_unitario"].to_numpy()
+    posicoes = pd.Index(df_vendas["id"]).get_indexer(df_itens["venda_id"])
+
+    df_itens["subtotal"] = subtotais
+    df_vendas["total"] = np.bincount(posicoes, weights=subtotais, minlength=len(df_vendas))
+    df_vendas["qtd_itens"] = np.bincount(posicoes, weights=quantidades, minlength=len(df_vendas)).astype(np.int64)
+
+
+# Trava o cabeçalho da venda (no PostgreSQL) para duas alterações de itens da mesma
+# venda não somarem o total cada uma sem ver a outra. data_venda (a do cabeçalho, que o
+# chamador já tem) entra no filtro para o planner ler só a partição do mês.
+#
+# Resumos diários, segmentos e snapshot só avançam por id de venda e não veem a
+# alteração sozinhos: ela é refletida neles na mesma transação (_atualizar_venda). Os
+# watermarks dos resumos e dos segmentos são travados aqui, antes de gravar em vendas,
+# para não esperar uma atualização que por sua vez espera esta transação terminar.
+# Retorna o cliente e o total anteriores da venda
+def _travar_venda(conexao: Connection, venda_id: int, data_venda):
+    from database.segmentos import WATERMARK_SEGMENTOS  # importa consultas, que cria o engine do módulo
+
+    consulta = select(Venda.cliente_id, Venda.total).where(Venda.id == venda_id, Venda.data_venda == data_venda)
+    if conexao.dialect.name == "postgresql":
+        consulta = consulta.with_for_update()
+    venda = conexao.execute(consulta).one_or_none()
+    if venda is None:
+        raise ValueError(f"Venda {venda_id} de {data_venda} inexistente")
+    ler_watermark(conexao, WATERMARK_ROLLUPS)
+    ler_watermark(conexao, WATERMARK_SEGMENTOS)
+    return venda
+
+
+# Item de uma venda já gravada, com a venda travada. Retorna o venda_id e a venda
+# anterior de _travar_venda
+def _travar_item(conexao: Connection, item_id: int, data_venda):
+    venda_id = conexao.execute(
+        select(ProdutosVenda.venda_id).where(ProdutosVenda.id == item_id, ProdutosVenda.data_venda == data_venda)
+    ).scalar()
+    if venda_id is None:
+        raise ValueError(f"Item {item_id} de {data_venda} inexistente")
+    return venda_id, _travar_venda(conexao, venda_id, data_venda)
+
+
+# Soma de novo o total e a quantidade de itens da venda pelos itens gravados (zero sem
+# itens), na transação da alteração, e refaz o dia da venda nos resumos diários, o valor
+# do cliente nos segmentos e marca a venda para o snapshot. Retorna {"total": ...,
+# "qtd_itens": ...}
+def _atualizar_venda(conexao: Connection, venda_id: int, data_venda, anterior) -> dict:
+    from database.segmentos import ajustar_valor_cliente
+
+    itens = (ProdutosVenda.venda_id == venda_id) & (ProdutosVenda.data_venda == data_venda)
+    total = select(func.coalesce(func.sum(ProdutosVenda.subtotal), 0)).where(itens).scalar_subquery()
+    qtd_itens = select(func.coalesce(func.sum(ProdutosVenda.quantidade), 0)).where(itens).scalar_subquery()
+    venda = conexao.execute(
+        update(Venda)
+        .where(Venda.id == venda_id, Venda.data_venda == data_venda)
+        .values(total=total, qtd_itens=qtd_itens)
+        .returning(Venda.total, Venda.qtd_itens)
+    ).one()
+    marcar_alteracao(conexao, Venda.__tablename__, ProdutosVenda.__tablename__)
+
+    reagregar_dia(conexao, data_venda.date())
+    ajustar_valor_cliente(conexao, venda_id, anterior.cliente_id, (venda.total or 0) - (anterior.total or 0))
+    registrar_venda_alterada(conexao, venda_id)
+    return venda._asdict()
+
+
+# Adiciona um item a uma venda já gravada (venda_id e data_venda do cabeçalho) e
+# atualiza o cabeçalho na mesma transação. Retorna o id do item
+def adicionar_item(conexao: Connection, venda_id: int, data_venda, produto_id: int, quantidade: int,
+                   preco_unitario: float) -> int:
+    anterior = _travar_venda(conexao, venda_id, data_venda)
+    item = {"quantidade": quantidade, "preco_unitario": preco_unitario}
+    calcular_totais({}, [item])
+    item_id = conexao.execute(
+        insert(ProdutosVenda)
+        .values(venda_id=venda_id, produto_id=produto_id, data_venda=data_venda, **item)
+        .returning(ProdutosVenda.id)
+    ).scalar()
+    _atualizar_venda(conexao, venda_id, data_venda, anterior)
+    return item_id
+
+
+# Altera quantidade e/ou preço de um item (data_venda da sua venda), recalcula o
+# subtotal e atualiza o cabeçalho
+def alterar_item(conexao: Connection, item_id: int, data_venda, quantidade: int = None,
+                 preco_unitario: float = None) -> dict:
+    venda_id, anterior = _travar_item(conexao, item_id, data_venda)
+    quantidade = ProdutosVenda.quantidade if quantidade is None else quantidade
+    preco_unitario = ProdutosVenda.preco_unitario if preco_unitario is None else preco_unitario
+    conexao.execute(
+        update(ProdutosVenda)
+        .where(ProdutosVenda.id == item_id, ProdutosVenda.data_venda == data_venda)
+        .values(quantidade=quantidade, preco_unitario=preco_unitario, subtotal=quantidade * preco_unitario)
+    )
+    return _atualizar_venda(conexao, venda_id, data_venda, anterior)
+
+
+# Remove um item e atualiza o cabeçalho (total e qtd_itens zerados se era o último)
+def remover_item(conexao: Connection, item_id: int, data_venda) -> dict:
+    venda_id, anterior = _travar_item(conexao, item_id, data_venda)
+    conexao.execute(
+        delete(ProdutosVenda).where(ProdutosVenda.id == item_id, ProdutosVenda.data_venda == data_venda)
+    )
+    return _atualizar_venda(conexao, venda_id, data_venda, anterior)
+
+
+# Recalcula no banco, sem trazer linhas para o Python, o subtotal dos itens e o total
+# e a quantidade de itens das vendas com id em (venda_id_inicial, venda_id_final]
+def recalcular_faixa(conexao: Connection, venda_id_inicial: int, venda_id_final: int):
+    faixa_itens = (ProdutosVenda.venda_id > venda_id_inicial) & (ProdutosVenda.venda_id <= venda_id_final)
+    conexao.execute(
+        update(ProdutosVenda)
+        .where(faixa_itens)
+        .values(subtotal=ProdutosVenda.quantidade * ProdutosVenda.preco_unitario)
+    )
+
+    por_venda = (
+        select(
+            ProdutosVenda.venda_id,
+            func.sum(ProdutosVenda.subtotal).label("total"),
+            func.sum(ProdutosVenda.quantidade).label("qtd_itens"),
+        )
+        .where(faixa_itens)
+        .group_by(ProdutosVenda.venda_id)
+        .subquery()
+    )
+    conexao.execute(
+        update(Venda)
+        .where(Venda.id == por_venda.c.venda_id)
+        .values(total=por_venda.c.total, qtd_itens=por_venda.c.qtd_itens)
+    )
+
+
+# Recalcula as vendas com id em (venda_id_inicial, maior id] em lotes de
+# tamanho_lote vendas, na conexão informada (mesma transação)
+def recalcular_lotes(conexao: Connection, venda_id_inicial: int = 0,
+                     tamanho_lote: int = TAMANHO_LOTE_RECALCULO) -> int:
+    venda_id_final = conexao.execute(select(func.max(Venda.id))).scalar() or 0
+    for inicio in range(venda_id_inicial, venda_id_final, tamanho_lote):
+        recalcular_faixa(conexao, inicio, min(inicio + tamanho_lote, venda_id_final))
+    return venda_id_final
+
+
+# Recalcula os valores das vendas já gravadas (ex.: depois de corrigir itens), um lote
+# por transação para não segurar locks na tabela inteira. Retorna o maior id recalculado
+def recalcular_totais(engine: Engine, venda_id_inicial: int = 0,
+                      tamanho_lote: int = TAMANHO_LOTE_RECALCULO) -> int:
+    with engine.connect() as conexao:
+        venda_id_final = conexao.execute(select(func.max(Venda.id))).scalar() or 0
+
+    for inicio in range(venda_id_inicial, venda_id_final, tamanho_lote):
+        fim = min(inicio + tamanho_lote, venda_id_final)
+        with engine.begin() as conexao:
+            recalcular_faixa(conexao, inicio, fim)
+        print(f"Vendas recalculadas até o id {fim}", end="\r", flush=True)
+
+    with engine.begin() as conexao:
+        marcar_alteracao(conexao, Venda.__tablename__, ProdutosVenda.__tablename__)
+    print(f"Vendas de id {venda_id_inicial + 1} a {venda_id_final} recalculadas")
+    return venda_id_final
+
+
+# Uso: python -m database.totais [--desde ID] [--tamanho-lote N]
+if __name__ == "__main__":
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Recalcula subtotal, total e qtd_itens das vendas")
+    parser.add_argument("--desde", type=int, default=0, help="recalcula só as vendas com id maior que este")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_RECALCULO, help="vendas por transação")
+    args = parser.parse_args()
+
+    recalcular_totais(engine, args.desde, args.tamanho_lote)
@@ -1,14 +1,30 @@
+from sqlalchemy import create_engine, insert, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+import argparse
+import contextlib
+import io
+import itertools
+import multiprocessing
+import time
 from faker import Faker
 import random
 import sys
 import os
+import numpy as np
 import pandas as pd
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from models.models import Base, Regiao, Loja, Produto, Categoria, Cliente, Vendedor, Venda, ProdutosVenda  # Supondo que as classes estão no arquivo models.py
+from models.models import Regiao, Loja, Produto, Categoria, Cliente, Vendedor, Venda, ProdutosVenda, Estoque, Promocao  # Supondo que as classes estão no arquivo models.py
 from database.database import SessionLocal, engine  # Importando a sessão do seu arquivo de banco
+from database.migracoes import aplicar_migracoes
+from database.cache import marcar_alteracao
+from database.rollups import atualizar_rollups
+from database.bulk import TAMANHO_LOTE, CargaEmLotes, proximo_id, sincronizar_sequencia
+from database.totais import calcular_totais, calcular_totais_dataframe
+from database.promocoes import IndicePromocoes
+from database.particoes import garantir_particoes
+from database.catalogo import importar_catalogo
 
 # Inicializa o Faker
 fake = Faker(['pt_BR'])
@@ -33,50 +49,17 @@ def criar_lojas(db: Session):
     db.add_all(lojas)
     db.commit()
 
-# Função para criar produtos no banco
+# Função para criar produtos no banco: importa o catálogo (upsert por categoria e nome,
+# pode rodar de novo) e sorteia o preço dos produtos que ainda não têm
 def criar_produtos(db: Session):
-    produtos = []
-    caminho = r"faker/produtos.csv"
-    df_produtos = pd.read_csv(caminho)
-    
-    # Cache de categorias
-    categorias_cache = {categoria.nome: categoria.id for categoria in db.query(Categoria).all()}
-
-    for _, row in df_produtos.iterrows():
-        nome_produto = row["nome"]
-        categoria = row["categoria"]
-        
-        # Encontrar a categoria_id correspondente no cache
-        categoria_id = categorias_cache.get(categoria)
-
-        if not categoria_id:
-            # Caso a categoria não exista no cache, verificamos no banco
-            categoria_db = db.query(Categoria).filter(Categoria.nome == categoria).first()
-            
-            if not categoria_db:
-                # Caso a categoria não exista no banco, criamos uma nova
-                categoria_db = Categoria(nome=categoria)
-                db.add(categoria_db)
-                db.commit()  # Persistir a nova categoria para obter o id
-                categorias_cache[categoria] = categoria_db.id  # Atualizar o cache
-            else:
-                # Caso a categoria exista no banco, adicionamos ao cache
-                categorias_cache[categoria] = categoria_db.id
-            
-            categoria_id = categorias_cache[categoria]  # Garantir que temos o id da categoria
-        
-        # Criar o produto
-        produto = Produto (
-            nome=nome_produto,
-            categoria_id=categoria_id,
-            preco=round(random.uniform(10.0, 500.0), 2),  # Gerar um preço aleatório
-            created_at=fake.date_this_decade()
-        )
-        produtos.append(produto)
+    importar_catalogo(engine, r"faker/produtos.csv")
 
-    # Adicionar os produtos ao banco
-    db.add_all(produtos)
-    db.commit()
+    sem_preco = db.execute(select(Produto.id).where(Produto.preco.is_(None))).scalars().all()
+    if sem_preco:
+        db.execute(update(Produto), [
+            {"id": produto_id, "preco": round(random.uniform(10.0, 500.0), 2)} for produto_id in sem_preco
+        ])
+        db.commit()
 
 # Função para criar as regiões no banco
 def criar_regioes(db: Session):
@@ -84,98 +67,592 @@ def criar_regioes(db: Session):
     regiao_data = [Regiao(nome=regiao) for regiao in regioes]
     db.add_all(regiao_data)
     db.commit()
-# Função para criar clientes, vendedores e vendas no banco
-def criar_vendas_clientes_vendedores(db: Session):
-    clientes = []
-    vendedores = []
-    vendas = []
-    produtos_venda = []
-    for loja_id in range(1, 11):  # Para cada loja
-        
-        
-        for day in range(365):  # Durante 365 dias
-            data_venda = datetime.today() - timedelta(days=day)
-            
+# Função para criar o estoque inicial de cada produto em cada loja
+def criar_estoque(db: Session):
+    lojas_ids = db.scalars(select(Loja.id)).all()
+    produtos_ids = db.scalars(select(Produto.id)).all()
+    existentes = set(db.execute(select(Estoque.loja_id, Estoque.produto_id)).tuples())
+    db.add_all(
+        Estoque(loja_id=loja_id, produto_id=produto_id, quantidade=random.randint(50, 500))
+        for loja_id in lojas_ids
+        for produto_id in produtos_ids
+        if (loja_id, produto_id) not in existentes
+    )
+    db.commit()
+
+# Função para criar promoções de produtos ao longo do período das vendas
+def criar_promocoes(db: Session, quantidade: int = 300):
+    hoje = datetime.today()
+    produtos_ids = db.scalars(select(Produto.id)).all()
+    promocoes = []
+    for _ in range(quantidade):
+        data_inicio = hoje - timedelta(days=random.randint(0, NUM_DIAS))
+        promocoes.append(Promocao(
+            produto_id=random.choice(produtos_ids),
+            desconto=random.choice([0.05, 0.10, 0.15, 0.20, 0.30, 0.50]),  # Fração do preço
+            data_inicio=data_inicio,
+            data_fim=data_inicio + timedelta(days=random.randint(3, 30)),
+        ))
+    db.add_all(promocoes)
+    db.commit()
+
+# Parâmetros da geração de vendas
+NUM_LOJAS = 10
+NUM_DIAS = 365
+NUM_CLIENTES = 1000
+NUM_VENDEDORES = 100
+NUM_PRODUTOS = 1000  # Catálogo sintético dos bancos descartáveis (benchmark e comparação dos motores)
+ITENS_POR_VENDA = 3
+
+# Função para carregar os ids dos produtos cadastrados, sorteados nos itens das vendas.
+# O catálogo é importado com upsert por (categoria, nome), então os ids não são 1..N
+def carregar_produtos(conexao) -> list[int]:
+    produtos_ids = conexao.execute(select(Produto.__table__.c.id).order_by(Produto.__table__.c.id)).scalars().all()
+    if len(produtos_ids) < ITENS_POR_VENDA:
+        raise ValueError(f"São necessários pelo menos {ITENS_POR_VENDA} produtos cadastrados para gerar vendas")
+    return produtos_ids
+
+# Função para gerar clientes, indexados por id
+def gerar_clientes(ids) -> dict[int, dict]:
+    return {
+        cliente_id: {
+            "id": cliente_id,
+            "nome": fake.name(),
+            "email": fake.email(),
+            "telefone": fake.phone_number(),
+            "created_at": fake.date_this_decade(),
+        }
+        for cliente_id in ids
+    }
+
+# Função para gerar vendedores, indexados por id e distribuídos entre as lojas
+def gerar_vendedores(ids, num_lojas: int = NUM_LOJAS) -> dict[int, dict]:
+    return {
+        vendedor_id: {
+            "id": vendedor_id,
+            "nome": fake.name(),
+            "loja_id": (vendedor_id - 1) % num_lojas + 1,
+            "created_at": fake.date_this_decade(),
+        }
+        for vendedor_id in ids
+    }
+
+# Função para cadastrar as lojas 1..num_lojas que ainda não existem (as vendas são
+# geradas para todas elas), distribuídas entre as regiões cadastradas
+def garantir_lojas(conexao, num_lojas: int = NUM_LOJAS) -> int:
+    tabela_lojas = Loja.__table__
+    existentes = set(conexao.execute(select(tabela_lojas.c.id)).scalars())
+    regioes_ids = conexao.execute(select(Regiao.__table__.c.id).order_by(Regiao.__table__.c.id)).scalars().all()
+    novas = [
+        {
+            "id": loja_id,
+            "nome": fake.company(),
+            "regiao_id": regioes_ids[(loja_id - 1) % len(regioes_ids)] if regioes_ids else None,
+            "created_at": fake.date_this_decade(),
+        }
+        for loja_id in range(1, num_lojas + 1)
+        if loja_id not in existentes
+    ]
+    if novas:
+        conexao.execute(insert(tabela_lojas), novas)
+        sincronizar_sequencia(conexao, tabela_lojas)
+    return len(novas)
+
+# Função para montar os pools de clientes e vendedores das vendas.
+# Cadastra as lojas que faltam, gera apenas os ids que ainda não existem no banco (e um
+# vendedor próprio para cada loja que ficaria sem nenhum) e devolve:
+# (novos clientes, novos vendedores, ids dos clientes, ids dos vendedores por loja)
+def montar_pools(conexao, num_lojas: int = NUM_LOJAS):
+    tabela_clientes = Cliente.__table__
+    tabela_vendedores = Vendedor.__table__
+    garantir_lojas(conexao, num_lojas)
+
+    clientes_existentes = set(conexao.execute(select(tabela_clientes.c.id)).scalars())
+    vendedores_existentes = dict(conexao.execute(select(tabela_vendedores.c.id, tabela_vendedores.c.loja_id)).all())
+
+    novos_clientes = gerar_clientes(i for i in range(1, NUM_CLIENTES + 1) if i not in clientes_existentes)
+    novos_vendedores = gerar_vendedores(
+        (i for i in range(1, NUM_VENDEDORES + 1) if i not in vendedores_existentes), num_lojas
+    )
+
+    clientes_ids = sorted(clientes_existentes | novos_clientes.keys())
+
+    vendedores_loja = {loja_id: [] for loja_id in range(1, num_lojas + 1)}
+    for vendedor_id, loja_id in vendedores_existentes.items():
+        vendedores_loja.setdefault(loja_id, []).append(vendedor_id)
+    for vendedor in novos_vendedores.values():
+        vendedores_loja[vendedor["loja_id"]].append(vendedor["id"])
+
+    # Lojas além de NUM_VENDEDORES (ou criadas depois dos vendedores) ainda sem ninguém
+    sem_vendedor = [loja_id for loja_id, ids in vendedores_loja.items() if not ids]
+    proximo_vendedor = max([NUM_VENDEDORES, *vendedores_existentes]) + 1
+    extras = gerar_vendedores(range(proximo_vendedor, proximo_vendedor + len(sem_vendedor)), num_lojas)
+    for vendedor, loja_id in zip(extras.values(), sem_vendedor):
+        vendedor["loja_id"] = loja_id
+        vendedores_loja[loja_id].append(vendedor["id"])
+    novos_vendedores.update(extras)
+
+    return list(novos_clientes.values()), list(novos_vendedores.values()), clientes_ids, vendedores_loja
+
+# Função para gerar as vendas e seus itens, loja a loja e dia a dia.
+# Produz tuplas (venda, itens) com ids de venda já alocados a partir de venda_id_inicial
+def gerar_vendas(venda_id_inicial: int, clientes_ids: list[int], vendedores_loja: dict[int, list[int]],
+                 produtos_ids: list[int], lojas=range(1, NUM_LOJAS + 1), dias=range(NUM_DIAS),
+                 data_base: datetime = None, promocoes: IndicePromocoes = None):
+    data_base = data_base or datetime.today()
+    todos_vendedores = [vendedor_id for ids in vendedores_loja.values() for vendedor_id in ids]
+    venda_id = venda_id_inicial
+
+    for loja_id in lojas:  # Para cada loja
+        # Lojas sem vendedor próprio usam o pool geral
+        vendedores = vendedores_loja.get(loja_id) or todos_vendedores
+        for day in dias:  # Durante os dias pedidos
+            data_venda = data_base - timedelta(days=day)
             num_vendas = random.randint(50, 100)  # Número de vendas por dia
-            print(f"Gerando dados para a loja {loja_id} no dia {data_venda} com {num_vendas} vendas")
+
             for _ in range(num_vendas):
-                cliente_id = random.randint(1, 1000)
-                vendedor_id = random.randint(1, 100)
-                produto_ids = random.sample(range(1, 1001), 3)  # Seleciona 3 produtos aleatórios
-                total = 0
-            
-                # Gerar cliente se necessário
-                if cliente_id not in [c.id for c in clientes]:
-                    cliente = Cliente(
-                        id=cliente_id,
-                        nome=fake.name(),
-                        email=fake.email(),
-                        telefone=fake.phone_number(),
-                        created_at=fake.date_this_decade()
-                    )
-                    #db.add(cliente) # Adiciona o cliente ao banco
-                    clientes.append(cliente)
-
-                # Gerar vendedor se necessário
-                if vendedor_id not in [v.id for v in vendedores]:
-                    vendedor = Vendedor(
-                        id=vendedor_id,
-                        nome=fake.name(),
-                        loja_id=loja_id,
-                        created_at=fake.date_this_decade()
-                    )
-                    #db.add(vendedor) # Adiciona o vendedor ao banco
-                    vendedores.append(vendedor)
-                # Vendas
-                venda = Venda(
-                    cliente_id=cliente_id,
-                    vendedor_id=vendedor_id,
-                    loja_id=loja_id,
-                    total=total,
-                    data_venda=data_venda
-                )
-
-                vendas.append(venda)
-                # Inserir os produtos vendidos
-                for produto_id in produto_ids:
+                itens = []
+                for produto_id in random.sample(produtos_ids, ITENS_POR_VENDA):
                     preco_unitario = round(random.uniform(10.0, 500.0), 2)
                     quantidade = random.randint(1, 5)  # Quantidade do produto na venda
+                    itens.append({
+                        "venda_id": venda_id,
+                        "produto_id": produto_id,
+                        "quantidade": quantidade,
+                        "preco_unitario": preco_unitario,
+                        "data_venda": data_venda,
+                    })
+
+                # Preço com o desconto da promoção em vigor na data da venda
+                if promocoes is not None:
+                    precos = promocoes.precos([item["produto_id"] for item in itens],
+                                              [item["preco_unitario"] for item in itens], data_venda)
+                    for item, preco in zip(itens, precos.tolist()):
+                        item["preco_unitario"] = preco
+
+                venda = {
+                    "id": venda_id,
+                    "cliente_id": random.choice(clientes_ids),
+                    "vendedor_id": random.choice(vendedores),
+                    "loja_id": loja_id,
+                    "data_venda": data_venda,
+                }
+                yield calcular_totais(venda, itens), itens
+                venda_id += 1
+
+# Função para sortear ITENS_POR_VENDA produtos distintos por venda, de forma vetorizada.
+# Sorteia com reposição e refaz apenas as linhas com produto repetido (raras)
+def _sortear_produtos(rng: np.random.Generator, num_vendas: int, produtos_ids: list[int]) -> np.ndarray:
+    produtos_ids = np.asarray(produtos_ids)
+    posicoes = rng.integers(0, len(produtos_ids), size=(num_vendas, ITENS_POR_VENDA))
+    while True:
+        ordenados = np.sort(posicoes, axis=1)
+        repetidos = (ordenados[:, 1:] == ordenados[:, :-1]).any(axis=1)
+        if not repetidos.any():
+            return produtos_ids[posicoes]
+        posicoes[repetidos] = rng.integers(0, len(produtos_ids), size=(repetidos.sum(), ITENS_POR_VENDA))
+
+# Motor vetorizado: gera todas as vendas de uma loja em uma faixa de dias como arrays
+# NumPy e devolve dois DataFrames colunares (vendas, produtos_venda) prontos para carga.
+# Segue as mesmas distribuições de gerar_vendas
+def gerar_vendas_numpy(rng: np.random.Generator, venda_id_inicial: int, clientes_ids: list[int],
+                       vendedores: list[int], loja_id: int, produtos_ids: list[int], dias=range(NUM_DIAS),
+                       data_base: datetime = None, promocoes: IndicePromocoes = None):
+    data_base = data_base or datetime.today()
+    dias = np.asarray(dias)
+
+    vendas_por_dia = rng.integers(50, 101, size=len(dias))  # Número de vendas por dia
+    num_vendas = int(vendas_por_dia.sum())
+    venda_ids = np.arange(venda_id_inicial, venda_id_inicial + num_vendas)
+
+    datas = np.datetime64(data_base, "us") - np.repeat(dias, vendas_por_dia).astype("timedelta64[D]")
+
+    num_itens = num_vendas * ITENS_POR_VENDA
+    df_itens = pd.DataFrame({
+        "venda_id": np.repeat(venda_ids, ITENS_POR_VENDA),
+        "produto_id": _sortear_produtos(rng, num_vendas, produtos_ids).ravel(),
+        "quantidade": rng.integers(1, 6, size=num_itens),
+        "preco_unitario": np.round(rng.uniform(10.0, 500.0, size=num_itens), 2),
+        "data_venda": np.repeat(datas, ITENS_POR_VENDA),
+    })
 
-                    produto_venda = ProdutosVenda(
-                        venda=venda,
-                        produto_id=produto_id,
-                        quantidade=quantidade,
-                        preco_unitario=preco_unitario
-                    )
-                    total += quantidade * preco_unitario  # Atualiza o total da venda
-                    produtos_venda.append(produto_venda)
-
-                venda.total = total  # Atualiza o valor total da venda
-
-    # Inserir dados de clientes, vendedores, vendas e produtos_venda no banco
-    db.add_all(clientes)
-    db.add_all(vendedores)
-    db.commit()  # Commit para persistir os clientes e vendedores antes das vendas
+    # Preço com o desconto da promoção em vigor na data de cada item, em um único passe
+    if promocoes is not None:
+        df_itens["preco_unitario"] = promocoes.precos(
+            df_itens["produto_id"], df_itens["preco_unitario"], df_itens["data_venda"]
+        )
+
+    df_vendas = pd.DataFrame({
+        "id": venda_ids,
+        "cliente_id": rng.choice(np.asarray(clientes_ids), size=num_vendas),
+        "vendedor_id": rng.choice(np.asarray(vendedores), size=num_vendas),
+        "loja_id": loja_id,
+        "data_venda": datas,
+    })
+
+    # Subtotal dos itens e total/qtd_itens da venda pela soma agrupada dos itens
+    calcular_totais_dataframe(df_vendas, df_itens)
+    return df_vendas, df_itens
+
+# Função para criar as partições mensais (PostgreSQL particionado) que vão receber as
+# vendas de num_dias dias até data_base
+def garantir_periodo(conexao, data_base: datetime, num_dias: int = NUM_DIAS):
+    garantir_particoes(conexao, (data_base - timedelta(days=num_dias - 1)).date(), data_base.date())
+
+# Função para criar clientes, vendedores e vendas no banco
+def criar_vendas_clientes_vendedores(db: Session):
+    novos_clientes, novos_vendedores, clientes_ids, vendedores_loja = montar_pools(db.connection())
+
+    # Inserir clientes e vendedores antes das vendas
+    db.add_all(Cliente(**cliente) for cliente in novos_clientes)
+    db.add_all(Vendedor(**vendedor) for vendedor in novos_vendedores)
+    db.commit()
     print("Clientes e vendedores inseridos com sucesso!")
+
+    vendas = []
+    data_base = datetime.today()
+    garantir_periodo(db.connection(), data_base)
+    venda_id_inicial = proximo_id(db.connection(), Venda.__table__)
+    produtos_ids = carregar_produtos(db.connection())
+    promocoes = IndicePromocoes.carregar(db)
+    for venda, itens in gerar_vendas(venda_id_inicial, clientes_ids, vendedores_loja, produtos_ids,
+                                     data_base=data_base, promocoes=promocoes):
+        venda_orm = Venda(**venda)
+        venda_orm.produtos = [ProdutosVenda(**item) for item in itens]
+        vendas.append(venda_orm)
     db.add_all(vendas)
-    db.add_all(produtos_venda)
 
     # Commit para salvar as alterações
     db.commit()
+    for tabela in (Cliente.__table__, Vendedor.__table__, Venda.__table__):
+        sincronizar_sequencia(db.connection(), tabela)
+    db.commit()
+
+# Função para gravar vendas e itens em lotes, à medida que são gerados
+def carregar_vendas(carga: CargaEmLotes, vendas):
+    tabela_vendas = Venda.__table__
+    tabela_produtos_venda = ProdutosVenda.__table__
+
+    for venda, itens in vendas:
+        carga.adicionar(tabela_vendas, venda)
+        for item in itens:
+            carga.adicionar(tabela_produtos_venda, item)
+        if carga.cheio(tabela_vendas):
+            carga.descarregar(tabela_vendas, tabela_produtos_venda)
+    carga.descarregar(tabela_vendas, tabela_produtos_venda)
+
+# Função para criar clientes, vendedores e vendas em modo bulk: as linhas são
+# gravadas em lotes (COPY no PostgreSQL, executemany nos demais) sem passar pelo ORM
+def criar_vendas_clientes_vendedores_bulk(tamanho_lote: int = TAMANHO_LOTE):
+    with engine.begin() as conexao:
+        carga = CargaEmLotes(conexao, tamanho_lote)
+        novos_clientes, novos_vendedores, clientes_ids, vendedores_loja = montar_pools(conexao)
+        for cliente in novos_clientes:
+            carga.adicionar(Cliente.__table__, cliente)
+        for vendedor in novos_vendedores:
+            carga.adicionar(Vendedor.__table__, vendedor)
+        carga.descarregar(Cliente.__table__, Vendedor.__table__)
+
+        # Ids das vendas pré-alocados para gravar produtos_venda.venda_id sem flush do ORM
+        data_base = datetime.today()
+        garantir_periodo(conexao, data_base)
+        venda_id_inicial = proximo_id(conexao, Venda.__table__)
+        produtos_ids = carregar_produtos(conexao)
+        promocoes = IndicePromocoes.carregar(conexao)
+        carregar_vendas(carga, gerar_vendas(venda_id_inicial, clientes_ids, vendedores_loja, produtos_ids,
+                                            data_base=data_base, promocoes=promocoes))
+
+        for tabela in (Cliente.__table__, Vendedor.__table__, Venda.__table__):
+            sincronizar_sequencia(conexao, tabela)
+
+    carga.relatorio()
+
+# Função para criar clientes, vendedores e vendas com o motor vetorizado, loja a loja
+def criar_vendas_numpy(seed: int = 0, num_lojas: int = NUM_LOJAS, tamanho_lote: int = TAMANHO_LOTE):
+    rng = np.random.default_rng(seed)
+    fake.seed_instance(seed)
+    data_base = datetime.today()
+
+    with engine.begin() as conexao:
+        carga = CargaEmLotes(conexao, tamanho_lote)
+        novos_clientes, novos_vendedores, clientes_ids, vendedores_loja = montar_pools(conexao, num_lojas)
+        carga.gravar_dataframe(Cliente.__table__, pd.DataFrame(novos_clientes))
+        carga.gravar_dataframe(Vendedor.__table__, pd.DataFrame(novos_vendedores))
+
+        garantir_periodo(conexao, data_base)
+        venda_id = proximo_id(conexao, Venda.__table__)
+        produtos_ids = carregar_produtos(conexao)
+        promocoes = IndicePromocoes.carregar(conexao)
+        todos_vendedores = [vendedor_id for ids in vendedores_loja.values() for vendedor_id in ids]
+        for loja_id in range(1, num_lojas + 1):
+            vendedores = vendedores_loja.get(loja_id) or todos_vendedores
+            df_vendas, df_itens = gerar_vendas_numpy(rng, venda_id, clientes_ids, vendedores, loja_id, produtos_ids,
+                                                     data_base=data_base, promocoes=promocoes)
+            carga.gravar_dataframe(Venda.__table__, df_vendas)
+            carga.gravar_dataframe(ProdutosVenda.__table__, df_itens)
+            venda_id += len(df_vendas)
+
+        for tabela in (Cliente.__table__, Vendedor.__table__, Venda.__table__):
+            sincronizar_sequencia(conexao, tabela)
+
+    carga.relatorio()
+
+# Função para comparar as distribuições dos dois motores de geração por estatísticas
+# resumo (média e desvio de vendas/dia, quantidade, preço e total). Não grava no banco
+def comparar_motores(num_dias: int = 2000, seed: int = 0, tolerancia: float = 0.05) -> pd.DataFrame:
+    random.seed(seed)
+    clientes_ids = list(range(1, NUM_CLIENTES + 1))
+    vendedores_loja = {1: list(range(1, NUM_VENDEDORES + 1))}
+    produtos_ids = list(range(1, NUM_PRODUTOS + 1))
+    dias = range(num_dias)
+
+    vendas_python = []
+    itens_python = []
+    for venda, itens in gerar_vendas(1, clientes_ids, vendedores_loja, produtos_ids, lojas=(1,), dias=dias):
+        vendas_python.append(venda)
+        itens_python.extend(itens)
+    df_vendas_python = pd.DataFrame(vendas_python)
+    df_itens_python = pd.DataFrame(itens_python)
+
+    df_vendas_numpy, df_itens_numpy = gerar_vendas_numpy(
+        np.random.default_rng(seed), 1, clientes_ids, vendedores_loja[1], 1, produtos_ids, dias=dias
+    )
+
+    def resumo(df_vendas, df_itens):
+        vendas_dia = df_vendas.groupby(df_vendas["data_venda"].dt.date).size()
+        return {
+            "vendas/dia média": vendas_dia.mean(),
+            "vendas/dia desvio": vendas_dia.std(),
+            "itens/venda": len(df_itens) / len(df_vendas),
+            "quantidade média": df_itens["quantidade"].mean(),
+            "preço médio": df_itens["preco_unitario"].mean(),
+            "preço desvio": df_itens["preco_unitario"].std(),
+            "total médio": df_vendas["total"].mean(),
+            "total desvio": df_vendas["total"].std(),
+            "cliente médio": df_vendas["cliente_id"].mean(),
+            "produto médio": df_itens["produto_id"].mean(),
+        }
+
+    estatisticas = pd.DataFrame({
+        "python": resumo(df_vendas_python, df_itens_python),
+        "numpy": resumo(df_vendas_numpy, df_itens_numpy),
+    })
+    estatisticas["diferença"] = (estatisticas["numpy"] / estatisticas["python"] - 1).abs()
+    estatisticas["ok"] = estatisticas["diferença"] <= tolerancia
+    return estatisticas
+
+# Estado dos processos de geração paralela, preenchido pelo initializer do pool
+_estado_worker = {}
+
+def _inicializar_worker(seed: int, clientes_ids: list[int], vendedores_loja: dict[int, list[int]],
+                        produtos_ids: list[int], data_base: datetime, promocoes: IndicePromocoes = None):
+    _estado_worker.update(seed=seed, clientes_ids=clientes_ids, vendedores_loja=vendedores_loja,
+                          produtos_ids=produtos_ids, data_base=data_base, promocoes=promocoes)
+
+# Função executada em cada processo: gera as vendas de um shard (loja, faixa de dias).
+# A semente depende só do shard, então o resultado não muda com o número de processos
+def gerar_shard(shard: tuple[int, int, int]) -> list:
+    loja_id, dia_inicial, dia_final = shard
+    random.seed(f"{_estado_worker['seed']}:{loja_id}:{dia_inicial}")
+    return list(gerar_vendas(
+        0,
+        _estado_worker["clientes_ids"],
+        _estado_worker["vendedores_loja"],
+        _estado_worker["produtos_ids"],
+        lojas=(loja_id,),
+        dias=range(dia_inicial, dia_final),
+        data_base=_estado_worker["data_base"],
+        promocoes=_estado_worker["promocoes"],
+    ))
+
+# Função para dividir o período em shards (loja, dia inicial, dia final)
+def dividir_shards(num_lojas: int, num_dias: int, dias_por_shard: int) -> list[tuple[int, int, int]]:
+    return [
+        (loja_id, dia, min(dia + dias_por_shard, num_dias))
+        for loja_id in range(1, num_lojas + 1)
+        for dia in range(0, num_dias, dias_por_shard)
+    ]
+
+# Função para atribuir ids definitivos às vendas na ordem dos shards
+def _numerar_vendas(resultados, venda_id_inicial: int):
+    venda_id = venda_id_inicial
+    for vendas in resultados:
+        for venda, itens in vendas:
+            venda["id"] = venda_id
+            for item in itens:
+                item["venda_id"] = venda_id
+            yield venda, itens
+            venda_id += 1
+
+# Função para criar clientes, vendedores e vendas com vários processos.
+# Os processos só geram linhas; o processo principal é o único escritor e recebe os
+# shards na ordem em que foram definidos (imap), numerando as vendas em sequência.
+# Com a mesma semente o conjunto de dados é o mesmo para qualquer número de processos
+def criar_vendas_paralelo(workers: int, seed: int = 0, num_lojas: int = NUM_LOJAS, num_dias: int = NUM_DIAS,
+                          dias_por_shard: int = 30, tamanho_lote: int = TAMANHO_LOTE):
+    random.seed(seed)
+    fake.seed_instance(seed)
+    data_base = datetime.today()
+    shards = dividir_shards(num_lojas, num_dias, dias_por_shard)
+
+    with engine.begin() as conexao:
+        carga = CargaEmLotes(conexao, tamanho_lote)
+        novos_clientes, novos_vendedores, clientes_ids, vendedores_loja = montar_pools(conexao, num_lojas)
+        for cliente in novos_clientes:
+            carga.adicionar(Cliente.__table__, cliente)
+        for vendedor in novos_vendedores:
+            carga.adicionar(Vendedor.__table__, vendedor)
+        carga.descarregar(Cliente.__table__, Vendedor.__table__)
+
+        garantir_periodo(conexao, data_base, num_dias)
+        venda_id_inicial = proximo_id(conexao, Venda.__table__)
+        argumentos_worker = (seed, clientes_ids, vendedores_loja, carregar_produtos(conexao), data_base,
+                             IndicePromocoes.carregar(conexao))
+        print(f"Gerando {len(shards)} shards com {workers} processo(s)")
+
+        if workers <= 1:
+            _inicializar_worker(*argumentos_worker)
+            carregar_vendas(carga, _numerar_vendas(map(gerar_shard, shards), venda_id_inicial))
+        else:
+            with multiprocessing.Pool(workers, initializer=_inicializar_worker, initargs=argumentos_worker) as pool:
+                carregar_vendas(carga, _numerar_vendas(pool.imap(gerar_shard, shards), venda_id_inicial))
+
+        for tabela in (Cliente.__table__, Vendedor.__table__, Venda.__table__):
+            sincronizar_sequencia(conexao, tabela)
+
+    carga.relatorio()
+
+# Função para cadastrar os produtos 1..num_produtos que ainda não existem, com preço
+# sorteado, para os bancos descartáveis sem catálogo importado
+def garantir_produtos_sinteticos(conexao, num_produtos: int = NUM_PRODUTOS) -> list[int]:
+    tabela_produtos = Produto.__table__
+    existentes = set(conexao.execute(select(tabela_produtos.c.id)).scalars())
+    novos = [
+        {"id": produto_id, "nome": f"Produto {produto_id}", "preco": round(random.uniform(10.0, 500.0), 2)}
+        for produto_id in range(1, num_produtos + 1)
+        if produto_id not in existentes
+    ]
+    if novos:
+        conexao.execute(insert(tabela_produtos), novos)
+        sincronizar_sequencia(conexao, tabela_produtos)
+    return list(range(1, num_produtos + 1))
+
+# Função para medir a geração separada da inserção com volumes crescentes de vendas.
+# Usa um banco descartável (SQLite em memória por padrão; em outro banco os tamanhos se
+# acumulam nas mesmas tabelas). Esquema, partições, lojas, clientes, vendedores e
+# produtos são preparados antes e ficam fora dos tempos; o tempo por venda deve se
+# manter estável entre os tamanhos se a geração escala linearmente
+def benchmark(tamanhos=(10_000, 100_000, 1_000_000), url: str = "sqlite://", tamanho_lote: int = TAMANHO_LOTE):
+    print(f"{'vendas':>10} {'geração (s)':>12} {'inserção (s)':>13} {'µs/venda geração':>17} {'µs/venda inserção':>18}")
+    for num_vendas in tamanhos:
+        engine_benchmark = create_engine(url)
+        with contextlib.redirect_stdout(io.StringIO()):
+            aplicar_migracoes(engine_benchmark)
+
+        # Pelo menos 50 vendas por loja/dia: dias suficientes para atingir num_vendas
+        dias = range(num_vendas // (NUM_LOJAS * 50) + 1)
+        data_base = datetime.today()
+        with engine_benchmark.begin() as conexao:
+            carga = CargaEmLotes(conexao, tamanho_lote)
+            novos_clientes, novos_vendedores, clientes_ids, vendedores_loja = montar_pools(conexao)
+            for cliente in novos_clientes:
+                carga.adicionar(Cliente.__table__, cliente)
+            for vendedor in novos_vendedores:
+                carga.adicionar(Vendedor.__table__, vendedor)
+            carga.descarregar(Cliente.__table__, Vendedor.__table__)
+            for tabela in (Cliente.__table__, Vendedor.__table__):
+                sincronizar_sequencia(conexao, tabela)
+            produtos_ids = garantir_produtos_sinteticos(conexao)
+            garantir_periodo(conexao, data_base, len(dias))
+            venda_id_inicial = proximo_id(conexao, Venda.__table__)
+
+        with engine_benchmark.begin() as conexao:
+            carga = CargaEmLotes(conexao, tamanho_lote)
+            inicio = time.perf_counter()
+            vendas = itertools.islice(
+                gerar_vendas(venda_id_inicial, clientes_ids, vendedores_loja, produtos_ids, dias=dias,
+                             data_base=data_base),
+                num_vendas,
+            )
+            carregar_vendas(carga, vendas)
+            total = time.perf_counter() - inicio
+            sincronizar_sequencia(conexao, Venda.__table__)
+
+        engine_benchmark.dispose()
+        insercao = sum(carga.segundos.values())
+        geracao = total - insercao
+        print(
+            f"{num_vendas:>10} {geracao:>12.2f} {insercao:>13.2f} "
+            f"{geracao / num_vendas * 1e6:>17.1f} {insercao / num_vendas * 1e6:>18.1f}"
+        )
 
 # Função principal para rodar as inserções
 def main():
+    parser = argparse.ArgumentParser(description="Gera dados fictícios para o banco da loja")
+    parser.add_argument("--bulk", action="store_true", help="grava as vendas em lotes, sem o ORM")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="vendas por lote no modo bulk")
+    parser.add_argument("--workers", type=int, help="gera as vendas em paralelo com N processos (implica bulk)")
+    parser.add_argument("--seed", type=int, default=0, help="semente da geração paralela")
+    parser.add_argument("--lojas", type=int, default=NUM_LOJAS, help="número de lojas na geração paralela")
+    parser.add_argument("--motor", choices=("python", "numpy"), default="python", help="motor de geração das vendas")
+    parser.add_argument("--comparar-motores", action="store_true", help="compara as distribuições dos dois motores")
+    parser.add_argument("--benchmark", action="store_true", help="mede geração e inserção com 10k, 100k e 1M vendas")
+    parser.add_argument("--benchmark-url", default="sqlite://", help="banco descartável usado no benchmark (recebe esquema e cadastros)")
+    parser.add_argument("--estoque", action="store_true", help="cria o estoque inicial de cada loja/produto e sai")
+    parser.add_argument("--promocoes", type=int, metavar="N", help="cria N promoções de produtos e sai")
+    args = parser.parse_args()
+    # O motor numpy gera e grava as vendas por conta própria, em um processo
+    if args.motor == "numpy" and (args.workers or args.bulk):
+        parser.error("--motor numpy não aceita --workers nem --bulk")
+
+    if args.comparar_motores:
+        estatisticas = comparar_motores(seed=args.seed)
+        print(estatisticas.to_string())
+        if not estatisticas["ok"].all():
+            sys.exit("As distribuições dos motores divergem além da tolerância")
+        return
+
+    if args.benchmark:
+        benchmark(url=args.benchmark_url, tamanho_lote=args.tamanho_lote)
+        return
+
     db = SessionLocal()
     try:
-        # Criar as tabelas no banco de dados (caso não existam)
-        Base.metadata.create_all(bind=engine)
+        # Criar/atualizar as tabelas e índices do banco de dados
+        aplicar_migracoes(engine)
         # Criar categorias, lojas, produtos, clientes, vendedores e vendas no banco
         #criar_categorias(db)
         #criar_regioes(db)
         #criar_lojas(db)
         #criar_produtos(db)
-        criar_vendas_clientes_vendedores(db)
+        if args.estoque:
+            criar_estoque(db)
+            with engine.begin() as conexao:
+                marcar_alteracao(conexao, "estoque")
+            print("Estoque criado com sucesso!")
+            return
+        if args.promocoes:
+            criar_promocoes(db, args.promocoes)
+            with engine.begin() as conexao:
+                marcar_alteracao(conexao, "promocoes")
+            print("Promoções criadas com sucesso!")
+            return
+        if args.motor == "numpy":
+            criar_vendas_numpy(args.seed, args.lojas, args.tamanho_lote)
+        elif args.workers:
+            criar_vendas_paralelo(args.workers, args.seed, args.lojas, tamanho_lote=args.tamanho_lote)
+        elif args.bulk:
+            criar_vendas_clientes_vendedores_bulk(args.tamanho_lote)
+        else:
+            criar_vendas_clientes_vendedores(db)
         print("Dados inseridos com sucesso!")
+
+        # Avisar os dashboards em execução que estas tabelas mudaram
+        with engine.begin() as conexao:
+            marcar_alteracao(conexao, "clientes", "vendedores", "vendas", "produtos_venda")
+
+        # Somar as vendas novas aos resumos diários
+        atualizar_rollups(engine)
     except Exception as e:
         print(f"Ocorreu um erro: {e}")
         db.rollback()
@@ -1,89 +1,129 @@
 import streamlit as st
 import pandas as pd
+import time
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from models.models import Cliente, Produto, Venda, Loja, Vendedor, ProdutosVenda, Categoria
-from database.database import get_db
+from models.models import Venda, ProdutosVenda, Categoria
+from database.database import DB_STATEMENT_TIMEOUT_MS, engine, metricas_pool, sessao
+from database.busca import LIMITE_BUSCA, MIN_CARACTERES_BUSCA, buscar_clientes_por_termo, buscar_produtos_por_termo
+from database.cache import cache
+from database.dimensoes import dimensoes
+from database.perfil import ExecucaoPerfil, perfil
+from database.consultas import (
+    buscar_clientes, buscar_clientes_segmento, buscar_coortes, buscar_kpi, buscar_lojas, buscar_pagina_vendas,
+    buscar_produtos, buscar_resumo_segmentos, buscar_watermark, buscar_paineis_resumo, contar_vendas,
+    data_referencia_segmentos, estatisticas_kpi, periodo_resumos, periodo_vendas,
+)
+from database.promocoes import indice_promocoes
+from database.rollups import WATERMARK_ROLLUPS, atualizar_rollups
+from database.segmentos import WATERMARK_SEGMENTOS, atualizar_segmentos
+from database.snapshot import (
+    DB_SNAPSHOT, atualizar_snapshot, buscar_paineis_snapshot, estado_snapshot, periodo_snapshot,
+)
+
+# Linhas exibidas nas listagens de clientes e produtos sem termo de busca
+LIMITE_LISTAGEM = 100
+
+# Campo de busca das listagens: devolve o termo digitado ou None (vazio ou curto demais)
+def campo_busca(rotulo: str, exemplo: str) -> str | None:
+    termo = st.text_input(rotulo, placeholder=exemplo).strip()
+    if len(termo) < MIN_CARACTERES_BUSCA:
+        if termo:
+            st.caption(f"Digite ao menos {MIN_CARACTERES_BUSCA} caracteres para buscar.")
+        return None
+    return termo
 
-# Função para exibir clientes
+# Função para exibir clientes: os encontrados pela busca ou, sem busca, a primeira página
+@perfil.cronometrar
 def exibir_clientes(db: Session):
-    clientes = db.query(Cliente).all()
-    clientes_data = [{"ID": cliente.id, "Nome": cliente.nome, "Email": cliente.email, "Telefone": cliente.telefone} for cliente in clientes]
-    df_clientes = pd.DataFrame(clientes_data)
-    st.dataframe(df_clientes)
+    termo = campo_busca("Buscar cliente", "nome ou e-mail")
+    if termo:
+        clientes = buscar_clientes_por_termo(db, termo)
+        st.caption(f"{len(clientes)} clientes encontrados (no máximo {LIMITE_BUSCA})")
+    else:
+        clientes = buscar_clientes(db, LIMITE_LISTAGEM)
+        st.caption(f"Primeiros {LIMITE_LISTAGEM} clientes. Use a busca para encontrar os demais.")
+    st.dataframe(clientes)
 
-# Função para exibir produtos
+# Função para exibir produtos (os encontrados pela busca ou, sem busca, a primeira
+# página), com o preço atual pela promoção em vigor
+@perfil.cronometrar
 def exibir_produtos(db: Session):
-    produtos = db.query(Produto).all()
-    produtos_data = [{"ID": produto.id, "Nome": produto.nome, "Preço": produto.preco, "Categoria ID": produto.categoria_id} for produto in produtos]
-    df_produtos = pd.DataFrame(produtos_data)
-    st.dataframe(df_produtos)
+    termo = campo_busca("Buscar produto", "nome do produto")
+    if termo:
+        produtos = buscar_produtos_por_termo(db, termo)
+        st.caption(f"{len(produtos)} produtos encontrados (no máximo {LIMITE_BUSCA})")
+    else:
+        produtos = buscar_produtos(db, LIMITE_LISTAGEM)
+        st.caption(f"Primeiros {LIMITE_LISTAGEM} produtos. Use a busca para encontrar os demais.")
+    promocoes = indice_promocoes(db)
+    agora = datetime.now()
+    st.dataframe(produtos.assign(**{
+        "Desconto": promocoes.descontos_em(produtos["ID"], agora) * 100,
+        "Preço Atual": promocoes.precos(produtos["ID"], produtos["Preço"], agora),
+    }), column_config={"Desconto": st.column_config.NumberColumn(format="%.0f%%")})
 
 # Função para exibir as vendas e seus detalhes
+@perfil.cronometrar
 def exibir_vendas(db: Session):
-    vendas_query = (
-        db.query(
-            Venda.id.label("Venda_ID"),
-            Cliente.nome.label("Cliente"),
-            Vendedor.nome.label("Vendedor"),
-            Loja.nome.label("Loja"),
-            Venda.total.label("Total"),
-            Venda.data_venda.label("Data_da_Venda"),
-        )
-        .join(Cliente, Venda.cliente_id == Cliente.id)
-        .join(Vendedor, Venda.vendedor_id == Vendedor.id)
-        .join(Loja, Venda.loja_id == Loja.id)
-    )
-
-    # Paginação
+    # Paginação por keyset: o cursor guarda a chave (data_venda, id) da primeira ou
+    # da última venda da página exibida; o total é estimado uma vez por sessão
     itens_por_pagina = 100
-    total_vendas = vendas_query.count()
+    if "total_vendas" not in st.session_state:
+        st.session_state.total_vendas = contar_vendas(db)
+    total_vendas = st.session_state.total_vendas
     total_paginas = max((total_vendas // itens_por_pagina) + (1 if total_vendas % itens_por_pagina > 0 else 0), 1)
 
     if "pagina_vendas" not in st.session_state:
         st.session_state.pagina_vendas = 1
+        st.session_state.cursor_vendas = {}
+
+    # Duas consultas por página: as vendas (uma a mais, para saber se existe página
+    # seguinte) e, de uma vez, os itens de todas elas; os nomes vêm do cache de dimensões
+    pagina = buscar_pagina_vendas(db, dimensoes, itens_por_pagina, **st.session_state.cursor_vendas)
+    vendas_data = pagina["vendas"]
+
+    def mudar_pagina(passo: int, cursor: dict):
+        st.session_state.pagina_vendas += passo
+        st.session_state.cursor_vendas = cursor
 
     col1, col2, col3 = st.columns([1, 4, 1])
     with col1:
-        if st.session_state.pagina_vendas > 1:
-            if st.button("⬅️ Página Anterior"):
-                st.session_state.pagina_vendas -= 1
-                st.rerun()
+        if st.session_state.pagina_vendas > 1 and vendas_data:
+            primeira = vendas_data[0]
+            st.button("⬅️ Página Anterior", on_click=mudar_pagina,
+                      args=(-1, {"antes": (primeira.Data_da_Venda, primeira.Venda_ID)}))
 
     with col3:
-        if st.session_state.pagina_vendas < total_paginas:
-            if st.button("➡️ Próxima Página"):
-                st.session_state.pagina_vendas += 1
-                st.rerun()
-
-    offset = (st.session_state.pagina_vendas - 1) * itens_por_pagina
-
-    vendas_data = vendas_query.limit(itens_por_pagina).offset(offset).all()
+        if pagina["tem_proxima"]:
+            ultima = vendas_data[-1]
+            st.button("➡️ Próxima Página", on_click=mudar_pagina,
+                      args=(1, {"apos": (ultima.Data_da_Venda, ultima.Venda_ID)}))
 
     # Criar DataFrame com detalhes adicionais
     df_vendas = []
-    for venda in vendas_data:
+    for venda, cliente, vendedor, loja in zip(vendas_data, pagina["clientes"], pagina["vendedores"], pagina["lojas"]):
         # Adiciona a linha principal da venda
         df_vendas.append({
             "Venda ID": venda.Venda_ID,
-            "Cliente": venda.Cliente,
-            "Vendedor": venda.Vendedor,
-            "Loja": venda.Loja,
+            "Cliente": cliente,
+            "Vendedor": vendedor,
+            "Loja": loja,
             "Total": f"R$ {venda.Total:.2f}",
             "Data da Venda": venda.Data_da_Venda.strftime("%d/%m/%Y"),
         })
-        
+
         # Detalhes dos produtos vendidos
-        produtos = db.query(ProdutosVenda).filter(ProdutosVenda.venda_id == venda.Venda_ID).all()
-        for produto in produtos:
+        for produto, produto_nome in pagina["itens"].get(venda.Venda_ID, []):
             df_vendas.append({
                 "Venda ID": f"Produto {produto.produto_id}",
-                "Produto": f"ID: {produto.produto_id}",
+                "Produto": produto_nome,
                 "Quantidade": produto.quantidade,
                 "Preço Unitário": f"R$ {produto.preco_unitario:.2f}",
-                "Total": f"R$ {produto.quantidade * produto.preco_unitario:.2f}",
+                "Total": f"R$ {produto.subtotal:.2f}",
                 "Data da Venda": "Detalhes"
             })
-        
+
         # Inserir uma linha em branco para separar os detalhes
         df_vendas.append({
             "Venda ID": "",
@@ -98,34 +138,31 @@ def exibir_vendas(db: Session):
     df = pd.DataFrame(df_vendas)
 
     # Exibir a tabela com os detalhes diretamente
-    st.write(f"Página {st.session_state.pagina_vendas} de {total_paginas}")
+    st.write(f"Página {st.session_state.pagina_vendas} de ~{total_paginas}")
     st.dataframe(df, use_container_width=True)
 
 
+@perfil.cronometrar
 def exibir_detalhes_venda(db: Session, venda_id: int):
     st.subheader(f"Detalhes da Venda #{venda_id}")
 
-    detalhes_venda_query = (
+    # Só as colunas de vendas e itens; os nomes vêm do cache de dimensões
+    detalhes_venda = (
         db.query(
             Venda.id.label("Venda_ID"),
-            Cliente.nome.label("Cliente"),
-            Vendedor.nome.label("Vendedor"),
-            Loja.nome.label("Loja"),
+            Venda.cliente_id,
+            Venda.vendedor_id,
+            Venda.loja_id,
             Venda.total.label("Total"),
             Venda.data_venda.label("Data_da_Venda"),
-            Produto.nome.label("Produto"),
+            ProdutosVenda.produto_id,
             ProdutosVenda.quantidade.label("Quantidade"),
             ProdutosVenda.preco_unitario.label("Preço_Unitário"),
+            ProdutosVenda.subtotal.label("Subtotal"),
         )
-        .join(Cliente, Venda.cliente_id == Cliente.id)
-        .join(Vendedor, Venda.vendedor_id == Vendedor.id)
-        .join(Loja, Venda.loja_id == Loja.id)
         .join(ProdutosVenda, ProdutosVenda.venda_id == Venda.id)
-        .join(Produto, ProdutosVenda.produto_id == Produto.id)
         .filter(Venda.id == venda_id)
-    )
-
-    detalhes_venda = detalhes_venda_query.all()
+    ).all()
 
     if not detalhes_venda:
         st.error("Venda não encontrada.")
@@ -133,33 +170,271 @@ def exibir_detalhes_venda(db: Session, venda_id: int):
 
     # Exibir os detalhes da venda
     info_venda = detalhes_venda[0]
-    st.write(f"**Cliente:** {info_venda.Cliente}")
-    st.write(f"**Vendedor:** {info_venda.Vendedor}")
-    st.write(f"**Loja:** {info_venda.Loja}")
+    st.write(f"**Cliente:** {dimensoes.nomes(db, 'clientes', [info_venda.cliente_id])[0]}")
+    st.write(f"**Vendedor:** {dimensoes.nomes(db, 'vendedores', [info_venda.vendedor_id])[0]}")
+    st.write(f"**Loja:** {dimensoes.nomes(db, 'lojas', [info_venda.loja_id])[0]}")
     st.write(f"**Total:** R$ {info_venda.Total:.2f}")
     st.write(f"**Data da Venda:** {info_venda.Data_da_Venda.strftime('%d/%m/%Y')}")
 
     # Criar tabela de produtos da venda
-    produtos_venda_df = pd.DataFrame([
-        {
-            "Produto": item.Produto,
-            "Quantidade": item.Quantidade,
-            "Preço Unitário": f"R$ {item.Preço_Unitário:.2f}",
-            "Subtotal": f"R$ {item.Quantidade * item.Preço_Unitário:.2f}",
-        }
-        for item in detalhes_venda
-    ])
+    itens = pd.DataFrame(detalhes_venda)
+    produtos_venda_df = pd.DataFrame({
+        "Produto": dimensoes.nomes(db, "produtos", itens["produto_id"]),
+        "Quantidade": itens["Quantidade"],
+        "Preço Unitário": itens["Preço_Unitário"].map("R$ {:.2f}".format),
+        "Subtotal": itens["Subtotal"].map("R$ {:.2f}".format),
+    })
 
     st.write("### Produtos Vendidos")
     st.dataframe(produtos_venda_df, use_container_width=True)
 
 
 # Função para exibir lojas
+@perfil.cronometrar
 def exibir_lojas(db: Session):
-    lojas = db.query(Loja).all()
-    lojas_data = [{"ID": loja.id, "Nome": loja.nome, "Região ID": loja.regiao_id} for loja in lojas]
-    df_lojas = pd.DataFrame(lojas_data)
-    st.dataframe(df_lojas)
+    st.dataframe(buscar_lojas(db))
+
+# Função para exibir o resumo de vendas (lido das tabelas de resumo diário ou, com
+# DB_SNAPSHOT, do snapshot colunar)
+@perfil.cronometrar
+def exibir_resumo_vendas(db: Session):
+    if DB_SNAPSHOT:
+        fonte = "Snapshot"
+        watermark = estado_snapshot()
+        atualizar = atualizar_snapshot
+        primeiro_dia, ultimo_dia = periodo_snapshot()
+        buscar_paineis = buscar_paineis_snapshot
+    else:
+        fonte = "Resumo"
+        watermark = buscar_watermark(db, WATERMARK_ROLLUPS)
+        atualizar = atualizar_rollups
+        primeiro_dia, ultimo_dia = periodo_resumos(db)
+        buscar_paineis = lambda inicio, fim: buscar_paineis_resumo(db, inicio, fim)
+
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if watermark:
+            venda_id, atualizado_em = watermark
+            st.caption(f"{fonte} até a venda #{venda_id} (atualizado em {atualizado_em:%d/%m/%Y %H:%M})")
+        else:
+            st.caption(f"{fonte} ainda não calculado")
+    with col2:
+        if st.button("🔄 Atualizar"):
+            atualizar(engine)
+            st.rerun()
+
+    if primeiro_dia is None:
+        st.info("Nenhuma venda resumida.")
+        return
+
+    periodo = st.date_input(
+        "Período",
+        value=(max(primeiro_dia, ultimo_dia - timedelta(days=30)), ultimo_dia),
+        min_value=primeiro_dia,
+        max_value=ultimo_dia,
+    )
+    if len(periodo) != 2:
+        return
+    inicio, fim = periodo
+
+    # Os três painéis são buscados juntos (em paralelo com DB_ASYNC)
+    dias, lojas, categorias = buscar_paineis(inicio, fim)
+
+    df_dias = pd.DataFrame(dias, columns=["Dia", "Receita", "Tickets"])
+    receita = df_dias["Receita"].sum()
+    tickets = df_dias["Tickets"].sum()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Receita", f"R$ {receita:,.2f}")
+    col2.metric("Vendas", f"{tickets:,}")
+    col3.metric("Ticket Médio", f"R$ {receita / tickets:,.2f}" if tickets else "-")
+
+    st.write("### Receita por Dia")
+    st.line_chart(df_dias, x="Dia", y="Receita")
+
+    st.write("### Por Loja")
+    df_lojas = pd.DataFrame(lojas, columns=["Loja", "Receita", "Tickets", "Ticket Médio"])
+    st.bar_chart(df_lojas, x="Loja", y="Receita")
+    st.dataframe(df_lojas, use_container_width=True)
+
+    st.write("### Por Categoria")
+    df_categorias = pd.DataFrame(categorias, columns=["Categoria", "Receita", "Quantidade"])
+    st.bar_chart(df_categorias, x="Categoria", y="Receita")
+    st.dataframe(df_categorias, use_container_width=True)
+
+# Formato monetário das colunas de valores nas tabelas dos indicadores
+FORMATO_VALORES = {
+    coluna: st.column_config.NumberColumn(format="R$ %.2f") for coluna in ("Receita", "Ticket Médio")
+}
+
+# Função para exibir um indicador agrupado: gráfico e tabela com o resultado da consulta
+@perfil.cronometrar
+def exibir_kpi_agrupado(df: pd.DataFrame, eixo: str, linha: bool = False):
+    if linha:
+        st.line_chart(df, x=eixo, y="Receita")
+    else:
+        st.bar_chart(df, x=eixo, y="Receita")
+    st.dataframe(df, column_config=FORMATO_VALORES, hide_index=True, use_container_width=True)
+
+# Função para exibir o ticket médio do período (totais) e por dia
+@perfil.cronometrar
+def exibir_ticket_medio(db: Session, inicio, fim):
+    totais = buscar_kpi(db, "ticket_medio", inicio, fim).iloc[0]
+    if not totais["Vendas"]:
+        st.info("Nenhuma venda no período.")
+        return
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Receita", f"R$ {totais['Receita']:,.2f}")
+    col2.metric("Vendas", f"{int(totais['Vendas']):,}")
+    col3.metric("Ticket Médio", f"R$ {totais['Ticket Médio']:,.2f}")
+    col4.metric("Itens por Venda", f"{totais['Itens por Venda']:.2f}")
+    st.line_chart(buscar_kpi(db, "dia", inicio, fim), x="Dia", y="Ticket Médio")
+
+# Páginas dos indicadores: cada uma busca apenas o resultado agregado no banco
+PAGINAS_KPI = {
+    "Receita por Loja": lambda db, inicio, fim: exibir_kpi_agrupado(buscar_kpi(db, "loja", inicio, fim), "Loja"),
+    "Receita por Região": lambda db, inicio, fim: exibir_kpi_agrupado(buscar_kpi(db, "regiao", inicio, fim), "Região"),
+    "Receita por Categoria": lambda db, inicio, fim: exibir_kpi_agrupado(
+        buscar_kpi(db, "categoria", inicio, fim), "Categoria"),
+    "Receita por Dia": lambda db, inicio, fim: exibir_kpi_agrupado(
+        buscar_kpi(db, "dia", inicio, fim), "Dia", linha=True),
+    "Top Produtos": lambda db, inicio, fim: exibir_kpi_agrupado(
+        buscar_kpi(db, "top_produtos", inicio, fim), "Produto"),
+    "Ticket Médio": exibir_ticket_medio,
+}
+
+# Função para exibir os indicadores (KPIs) agregados no banco, com o tempo das consultas
+@perfil.cronometrar
+def exibir_indicadores(db: Session):
+    primeira_venda, ultima_venda = periodo_vendas(db)
+    if primeira_venda is None:
+        st.info("Nenhuma venda registrada.")
+        return
+
+    primeiro_dia, ultimo_dia = primeira_venda.date(), ultima_venda.date()
+    periodo = st.date_input(
+        "Período",
+        value=(max(primeiro_dia, ultimo_dia - timedelta(days=30)), ultimo_dia),
+        min_value=primeiro_dia,
+        max_value=ultimo_dia,
+        key="periodo_indicadores",
+    )
+    if len(periodo) != 2:
+        return
+    inicio, fim = periodo
+
+    pagina = st.radio("Indicador", list(PAGINAS_KPI), horizontal=True)
+    inicio_pagina = time.perf_counter()
+    PAGINAS_KPI[pagina](db, inicio, fim)
+    st.caption(f"Consultas da página em {(time.perf_counter() - inicio_pagina) * 1000:.0f} ms")
+
+# Função para exibir os segmentos RFM e as coortes mensais de clientes, calculados em
+# lote por database/segmentos.py (o botão processa só as vendas novas)
+@perfil.cronometrar
+def exibir_segmentos(db: Session):
+    watermark = buscar_watermark(db, WATERMARK_SEGMENTOS)
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if watermark:
+            venda_id, atualizado_em = watermark
+            st.caption(f"Segmentos até a venda #{venda_id} (atualizados em {atualizado_em:%d/%m/%Y %H:%M})")
+        else:
+            st.caption("Segmentos ainda não calculados")
+    with col2:
+        if st.button("🔄 Atualizar"):
+            atualizar_segmentos(engine)
+            st.rerun()
+
+    resumo = buscar_resumo_segmentos(db)
+    if resumo.empty:
+        st.info("Nenhum cliente segmentado.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Clientes", f"{resumo['Clientes'].sum():,}")
+    col2.metric("Receita", f"R$ {resumo['Receita'].sum():,.2f}")
+    col3.metric("Recência contada até", f"{data_referencia_segmentos(db):%d/%m/%Y}")
+
+    st.write("### Segmentos RFM")
+    st.bar_chart(resumo, x="Segmento", y="Clientes")
+    st.dataframe(resumo, column_config={
+        **FORMATO_VALORES,
+        "Recência Média (dias)": st.column_config.NumberColumn(format="%.1f"),
+        "Compras por Cliente": st.column_config.NumberColumn(format="%.1f"),
+    }, hide_index=True, use_container_width=True)
+
+    segmento = st.selectbox("Clientes do segmento", resumo["Segmento"])
+    # Cópia: o DataFrame devolvido pelo cache de consultas não é alterado
+    clientes = buscar_clientes_segmento(db, segmento, LIMITE_LISTAGEM).copy()
+    clientes.insert(1, "Nome", dimensoes.nomes(db, "clientes", clientes["ID"]).tolist())
+    st.dataframe(clientes, column_config=FORMATO_VALORES, hide_index=True, use_container_width=True)
+    st.caption(f"Os {LIMITE_LISTAGEM} clientes do segmento com maior receita")
+
+    st.write("### Coortes Mensais")
+    coortes = buscar_coortes(db)
+    coortes = coortes.assign(Coorte=pd.to_datetime(coortes["Coorte"]).dt.strftime("%Y-%m"))
+    matriz = coortes.pivot(index="Coorte", columns="Mês", values="Clientes")
+    if st.radio("Exibir", ("% da coorte", "Clientes"), horizontal=True) == "% da coorte":
+        matriz = matriz.div(matriz[0], axis=0) * 100
+        formato = "%.1f%%"
+    else:
+        formato = "%d"
+    matriz.columns = [str(mes) for mes in matriz.columns]
+    st.dataframe(matriz, column_config={
+        mes: st.column_config.NumberColumn(format=formato) for mes in matriz.columns
+    }, use_container_width=True)
+    st.caption("Linhas: mês da primeira compra. Colunas: meses depois dela com nova compra do cliente")
+
+# Função para exibir o painel de depuração (cache e pool de conexões) na barra lateral
+def exibir_debug():
+    def escrever(estatisticas: dict):
+        for nome, valor in estatisticas.items():
+            st.write(f"**{nome}:** {valor:.2f}" if isinstance(valor, float) else f"**{nome}:** {valor}")
+
+    with st.sidebar.expander("🐞 Cache de consultas"):
+        escrever(cache.estatisticas())
+        if st.button("Limpar cache"):
+            cache.limpar()
+            st.rerun()
+
+    with st.sidebar.expander("🗂️ Cache de dimensões"):
+        escrever(dimensoes.estatisticas())
+        if st.button("Recarregar dimensões"):
+            dimensoes.limpar()
+            st.rerun()
+
+    with st.sidebar.expander("🔌 Pool de conexões"):
+        escrever(metricas_pool())
+
+    with st.sidebar.expander("⏱️ Consultas dos indicadores"):
+        for nome, estatisticas in estatisticas_kpi().items():
+            st.write(f"**{nome}**")
+            escrever(estatisticas)
+
+# Função para exibir o perfil da execução: tempo das funções exibir_*, consultas com
+# latência, linhas e local de chamada, e formas de consulta repetidas (N+1)
+def exibir_perfil(execucao: ExecucaoPerfil):
+    with st.expander("🔬 Perfil desta execução", expanded=True):
+        colunas = st.columns(4)
+        for coluna, (nome, valor) in zip(colunas, execucao.resumo().items()):
+            coluna.metric(nome, f"{valor:,.1f}" if isinstance(valor, float) else valor)
+
+        for suspeita in execucao.n_mais_1():
+            st.warning(
+                f"Possível N+1: {suspeita['execuções']} execuções ({suspeita['ms']:.1f} ms) de "
+                f"`{suspeita['forma'][:200]}` em {', '.join(suspeita['locais'])}"
+            )
+
+        if execucao.funcoes:
+            st.write("**Funções**")
+            st.dataframe(pd.DataFrame(execucao.funcoes), use_container_width=True,
+                         column_config={"ms": st.column_config.NumberColumn(format="%.1f")})
+        if execucao.consultas:
+            st.write("**Consultas**")
+            consultas = pd.DataFrame(execucao.consultas).drop(columns="sql")
+            st.dataframe(consultas.sort_values("ms", ascending=False), use_container_width=True,
+                         column_config={"ms": st.column_config.NumberColumn(format="%.2f")})
+        if perfil.caminho_log:
+            st.caption(f"Execuções perfiladas gravadas em {perfil.caminho_log}")
 
 # Título do aplicativo
 st.title('Dashboard de Lojas de Varejo')
@@ -167,25 +442,48 @@ st.title('Dashboard de Lojas de Varejo')
 # Menu de navegação na barra lateral
 opcao = st.sidebar.selectbox(
     "Selecione uma opção",
-    ("Clientes", "Produtos", "Vendas", "Lojas")
+    ("Clientes", "Produtos", "Vendas", "Lojas", "Resumo de Vendas", "Indicadores", "Segmentos de Clientes")
 )
+modo_debug = st.sidebar.checkbox("Modo debug")
+modo_perfil = st.sidebar.checkbox("Perfil de consultas")
+
+# Sessão do banco de dados desta execução, devolvida ao pool ao final. Com o perfil
+# ligado, as consultas e as funções exibir_* desta execução são registradas
+with perfil.execucao(opcao, ativa=modo_perfil) as execucao_perfil, sessao(DB_STATEMENT_TIMEOUT_MS) as db:
+    # Descartar do cache as tabelas alteradas por outros processos (ex.: gerador de dados)
+    cache.sincronizar(db)
+
+    # Exibir os dados com base na opção selecionada
+    if opcao == "Clientes":
+        st.header("Clientes")
+        exibir_clientes(db)
+
+    elif opcao == "Produtos":
+        st.header("Produtos")
+        exibir_produtos(db)
+
+    elif opcao == "Vendas":
+        st.header("Vendas")
+        exibir_vendas(db)
 
-# Obter sessão do banco de dados
-db = next(get_db())
+    elif opcao == "Lojas":
+        st.header("Lojas")
+        exibir_lojas(db)
 
-# Exibir os dados com base na opção selecionada
-if opcao == "Clientes":
-    st.header("Clientes")
-    exibir_clientes(db)
+    elif opcao == "Resumo de Vendas":
+        st.header("Resumo de Vendas")
+        exibir_resumo_vendas(db)
 
-elif opcao == "Produtos":
-    st.header("Produtos")
-    exibir_produtos(db)
+    elif opcao == "Indicadores":
+        st.header("Indicadores")
+        exibir_indicadores(db)
 
-elif opcao == "Vendas":
-    st.header("Vendas")
-    exibir_vendas(db)
+    elif opcao == "Segmentos de Clientes":
+        st.header("Segmentos de Clientes")
+        exibir_segmentos(db)
 
-elif opcao == "Lojas":
-    st.header("Lojas")
-    exibir_lojas(db)
+# Painéis de depuração e de perfil por último, com as estatísticas já incluindo esta execução
+if modo_debug:
+    exibir_debug()
+if execucao_perfil:
+    exibir_perfil(execucao_perfil)
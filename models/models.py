@@ -1,10 +1,44 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, func
+from datetime import datetime
+
+from sqlalchemy import (
+    DDL, BigInteger, Column, Integer, String, Float, Date, DateTime, ForeignKey, ForeignKeyConstraint, Index,
+    PrimaryKeyConstraint, Sequence, event, func,
+)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql.functions import next_value
 
 Base = declarative_base()
 
+# Tabelas particionadas por mês de data_venda no PostgreSQL (database/particoes.py). O
+# PostgreSQL exige data_venda na chave primária, então as chaves estrangeiras para vendas
+# são (venda_id, data_venda)
+PARTICIONADA_POR_MES = {"postgresql_partition_by": "RANGE (data_venda)"}
+
+# No SQLite a chave primária das tabelas particionadas fica só em id, que continua sendo o
+# rowid gerado pelo banco (o SQLite não gera valores em chaves compostas)
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _chave_primaria_sqlite(chave, compiler, **kw):
+    if chave.table.dialect_options["postgresql"]["partition_by"]:
+        return "PRIMARY KEY (id)"
+    return compiler.visit_primary_key_constraint(chave, **kw)
+
+# No SQLite o id sem valor (DEFAULT NULL) vira o próximo rowid
+@compiles(next_value, "sqlite")
+def _proximo_id_sqlite(elemento, compiler, **kw):
+    return "NULL"
+
+# id das tabelas particionadas: o SERIAL (sequence <tabela>_id_seq da coluna, como nas
+# tabelas convertidas pela migração 6), que o SQLAlchemy não gera em chave composta
+def _id_serial(tabela: str, **opcoes) -> Column:
+    sequencia = Sequence(f"{tabela}_id_seq", metadata=Base.metadata)
+    event.listen(Base.metadata, "after_create", DDL(
+        f"ALTER SEQUENCE {sequencia.name} OWNED BY {tabela}.id"
+    ).execute_if(dialect="postgresql"))
+    return Column(Integer, sequencia, server_default=sequencia.next_value(), primary_key=True, **opcoes)
+
 class Loja(Base):
     __tablename__ = "lojas"
 
@@ -25,12 +59,21 @@ class Produto(Base):
     # Relacionamento com produtos_venda
     vendas = relationship("ProdutosVenda", back_populates="produto")
 
+    __table_args__ = (
+        # Chave natural do catálogo (upsert da importação em database/catalogo.py)
+        Index("ux_produtos_categoria_id_nome", "categoria_id", "nome", unique=True),
+    )
+
 class Categoria(Base):
     __tablename__ = "categorias"
 
     id = Column(Integer, primary_key=True)
     nome = Column(String)
 
+    __table_args__ = (
+        Index("ux_categorias_nome", "nome", unique=True),
+    )
+
 class Cliente(Base):
     __tablename__ = "clientes"
 
@@ -51,16 +94,27 @@ class Vendedor(Base):
 class Venda(Base):
     __tablename__ = "vendas"
 
-    id = Column(Integer, primary_key=True)
+    id = _id_serial("vendas")
     cliente_id = Column(Integer, ForeignKey("clientes.id"))
     vendedor_id = Column(Integer, ForeignKey("vendedores.id"))
     loja_id = Column(Integer, ForeignKey("lojas.id"))
-    data_venda = Column(DateTime, default=func.now())
+    data_venda = Column(DateTime, primary_key=True, default=datetime.now)
     total = Column(Float)
+    qtd_itens = Column(Integer)  # Soma das quantidades dos itens (mantida por database.totais)
 
     # Relacionamento com produtos_venda
     produtos = relationship("ProdutosVenda", back_populates="venda")
 
+    __table_args__ = (
+        # Paginação por keyset da listagem de vendas e filtros por data
+        Index("ix_vendas_data_venda_id", "data_venda", "id"),
+        # Vendas de uma loja em um período
+        Index("ix_vendas_loja_id_data_venda", "loja_id", "data_venda"),
+        Index("ix_vendas_cliente_id", "cliente_id"),
+        Index("ix_vendas_vendedor_id", "vendedor_id"),
+        PARTICIONADA_POR_MES,
+    )
+
 class Estoque(Base):
     __tablename__ = "estoque"
 
@@ -69,15 +123,27 @@ class Estoque(Base):
     produto_id = Column(Integer, ForeignKey("produtos.id"))
     quantidade = Column(Integer)
 
+    __table_args__ = (
+        # Uma linha por produto em cada loja (baixas e reposições do serviço de estoque)
+        Index("ux_estoque_loja_id_produto_id", "loja_id", "produto_id", unique=True),
+    )
+
 class Pagamento(Base):
     __tablename__ = "pagamentos"
 
     id = Column(Integer, primary_key=True)
-    venda_id = Column(Integer, ForeignKey("vendas.id"))
+    venda_id = Column(Integer)
+    data_venda = Column(DateTime)  # Mesma data da venda: completa a chave estrangeira para vendas
     metodo = Column(String)
     status = Column(String)
     created_at = Column(DateTime(timezone=True), default=func.now())
 
+    __table_args__ = (
+        ForeignKeyConstraint(["venda_id", "data_venda"], ["vendas.id", "vendas.data_venda"]),
+        # Pagamentos de um mês (arquivamento) e conferência da chave estrangeira
+        Index("ix_pagamentos_data_venda_venda_id", "data_venda", "venda_id"),
+    )
+
 class Regiao(Base):
     __tablename__ = "regioes"
 
@@ -96,12 +162,88 @@ class Promocao(Base):
 class ProdutosVenda(Base):
     __tablename__ = "produtos_venda"
 
-    id = Column(Integer, primary_key=True, index=True)
-    venda_id = Column(Integer, ForeignKey("vendas.id"))
+    id = _id_serial("produtos_venda", index=True)
+    venda_id = Column(Integer)
     produto_id = Column(Integer, ForeignKey("produtos.id"))
     quantidade = Column(Integer)
     preco_unitario = Column(Float)
+    subtotal = Column(Float)  # quantidade * preco_unitario (mantido por database.totais)
+    data_venda = Column(DateTime, primary_key=True)  # Mesma data da venda: chave da partição mensal
 
     venda = relationship("Venda", back_populates="produtos")
     produto = relationship("Produto", back_populates="vendas")
 
+    __table_args__ = (
+        # Itens na partição do mesmo mês da venda
+        ForeignKeyConstraint(["venda_id", "data_venda"], ["vendas.id", "vendas.data_venda"]),
+        # Itens de uma venda (e o produto de cada item sem ir à tabela)
+        Index("ix_produtos_venda_venda_id_produto_id", "venda_id", "produto_id"),
+        Index("ix_produtos_venda_produto_id", "produto_id"),
+        # Filtros por período direto nos itens (sem passar por vendas)
+        Index("ix_produtos_venda_data_venda", "data_venda"),
+        PARTICIONADA_POR_MES,
+    )
+
+# Resumo diário de vendas por loja/produto (mantido por database/rollups.py).
+# tickets = número de vendas que contêm o produto
+class VendaDiariaProduto(Base):
+    __tablename__ = "vendas_diarias_produto"
+
+    dia = Column(Date, primary_key=True)
+    loja_id = Column(Integer, ForeignKey("lojas.id"), primary_key=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id"), primary_key=True)
+    categoria_id = Column(Integer, ForeignKey("categorias.id"))
+    quantidade = Column(Integer)
+    receita = Column(Float)
+    tickets = Column(Integer)
+
+# Resumo diário de vendas por loja (mantido por database/rollups.py)
+class VendaDiariaLoja(Base):
+    __tablename__ = "vendas_diarias_loja"
+
+    dia = Column(Date, primary_key=True)
+    loja_id = Column(Integer, ForeignKey("lojas.id"), primary_key=True)
+    receita = Column(Float)
+    tickets = Column(Integer)
+
+# Marca até onde um processo incremental já processou (ex.: último id de venda)
+class Watermark(Base):
+    __tablename__ = "watermarks"
+
+    nome = Column(String, primary_key=True)
+    valor = Column(Integer)
+    atualizado_em = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+# Segmento RFM (recência, frequência e valor) de cada cliente com compras, mantido por
+# database/segmentos.py. meses_ativos marca bit a bit os meses com compra, contados a
+# partir do mês da primeira compra (bit 0 = mês da primeira compra). Sem FK para
+# clientes: a tabela é regravada inteira a cada atualização a partir de vendas, que já
+# tem a FK (a checagem por linha dobrava o tempo do COPY)
+class ClienteSegmento(Base):
+    __tablename__ = "clientes_segmentos"
+
+    cliente_id = Column(Integer, primary_key=True)
+    primeira_compra = Column(Date)
+    ultima_compra = Column(Date)
+    compras = Column(Integer)
+    valor = Column(Float)
+    meses_ativos = Column(BigInteger)
+    recencia = Column(Integer)  # Dias entre a última compra e a última venda registrada
+    nota_recencia = Column(Integer)  # Notas de 1 a 5 (quintis entre os clientes)
+    nota_frequencia = Column(Integer)
+    nota_valor = Column(Integer)
+    segmento = Column(String)
+
+    __table_args__ = (
+        # Clientes de um segmento, dos que mais gastaram para os que menos gastaram
+        Index("ix_clientes_segmentos_segmento_valor", "segmento", "valor"),
+    )
+
+# Coortes mensais de clientes (mantidas por database/segmentos.py): clientes da coorte
+# (mês da primeira compra) que compraram de novo "mes" meses depois (mes 0 = a coorte toda)
+class CoorteClientes(Base):
+    __tablename__ = "coortes_clientes"
+
+    coorte = Column(Date, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    clientes = Column(Integer)
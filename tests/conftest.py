@@ -0,0 +1,69 @@
+import importlib
+import os
+import sys
+
+# database.database cria o engine do módulo na importação
+os.environ.setdefault("DB_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+from database.cache import cache
+from database.migracoes import aplicar_migracoes
+from models.models import Categoria, Cliente, Loja, Produto, Regiao, Vendedor
+
+LOJAS = 2
+PRODUTOS = 10
+
+
+# Banco com as migrações aplicadas e um cadastro mínimo: LOJAS lojas com um vendedor
+# cada, 3 clientes e PRODUTOS produtos (preço 10 * id). O cache de consultas do
+# processo é limpo (as chaves não incluem o banco)
+def _criar_banco(url: str):
+    cache.limpar()
+    engine = create_engine(url)
+    aplicar_migracoes(engine)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Regiao), [{"id": 1, "nome": "Sul"}])
+        conexao.execute(insert(Categoria), [{"id": 1, "nome": "Livros"}])
+        conexao.execute(insert(Loja), [{"id": i, "nome": f"Loja {i}", "regiao_id": 1} for i in range(1, LOJAS + 1)])
+        conexao.execute(insert(Vendedor), [{"id": i, "nome": f"Vendedor {i}", "loja_id": i} for i in range(1, LOJAS + 1)])
+        conexao.execute(insert(Cliente), [{"id": i, "nome": f"Cliente {i}", "email": f"c{i}@x.com"} for i in range(1, 4)])
+        conexao.execute(insert(Produto), [
+            {"id": i, "nome": f"Produto {i}", "categoria_id": 1, "preco": 10.0 * i} for i in range(1, PRODUTOS + 1)
+        ])
+    return engine
+
+
+# SQLite em memória
+@pytest.fixture
+def engine():
+    engine = _criar_banco("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+# SQLite em arquivo, para testes com várias threads (em memória, cada thread teria o
+# seu próprio banco)
+@pytest.fixture
+def engine_arquivo(tmp_path):
+    engine = _criar_banco(f"sqlite:///{tmp_path / 'loja.db'}")
+    yield engine
+    engine.dispose()
+
+
+# faker/gerar_dados.py importado como quando roda como script (python faker/gerar_dados.py):
+# com a pasta faker/ no lugar da raiz do projeto no sys.path, "from faker import Faker"
+# encontra a biblioteca, e não o pacote faker/ do projeto
+@pytest.fixture(scope="session")
+def gerar_dados():
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    caminhos = sys.path
+    sys.path = [os.path.join(raiz, "faker")] + [
+        caminho for caminho in caminhos if os.path.abspath(caminho or os.curdir) != raiz
+    ]
+    sys.modules.pop("faker", None)
+    try:
+        return importlib.import_module("gerar_dados")
+    finally:
+        sys.path = caminhos
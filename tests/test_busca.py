@@ -0,0 +1,60 @@
+from sqlalchemy import create_engine, insert, inspect, text
+from sqlalchemy.orm import Session
+
+from database.busca import buscar_por_termo
+from database.migracoes import aplicar_migracoes
+from models.models import Cliente, Produto
+
+
+def _cadastro(engine):
+    with engine.begin() as conexao:
+        conexao.execute(insert(Cliente), [
+            {"id": 10, "nome": "João Silva", "email": "jsilva@gmail.com"},
+            {"id": 11, "nome": "Maria Conceição Alves", "email": "malves@empresa.com.br"},
+        ])
+        conexao.execute(insert(Produto), [
+            {"id": 20, "nome": "Pão de Queijo Congelado", "categoria_id": 1, "preco": 12.0},
+            {"id": 21, "nome": "Feijão Preto 100%", "categoria_id": 1, "preco": 8.0},
+        ])
+
+
+def _buscar(engine, tabela, termo):
+    with Session(engine) as db:
+        return buscar_por_termo(db, tabela, termo)["ID"].tolist()
+
+
+def _tokenizador(engine) -> str:
+    with engine.connect() as conexao:
+        return conexao.execute(text("SELECT sql FROM sqlite_master WHERE name = 'produtos_busca'")).scalar()
+
+
+def test_busca_fts5_sem_acentos(engine):
+    assert {"produtos_busca", "clientes_busca"} <= set(inspect(engine).get_table_names())
+    _cadastro(engine)
+
+    # Só no nome (o e-mail não contém o termo), sem acentos e em qualquer ordem
+    assert _buscar(engine, "clientes", "conceicao") == [11]
+    assert _buscar(engine, "clientes", "alves conceição") == [11]
+    assert _buscar(engine, "produtos", "pao") == [20]
+    assert _buscar(engine, "produtos", "queijo pão") == [20]
+    assert _buscar(engine, "produtos", "feijao") == [21]
+    assert _buscar(engine, "clientes", "empresa") == [11]
+
+
+# SQLite anterior à 3.45 (ex.: o do Python 3.11): FTS5 com unicode61, por prefixo das
+# palavras; curingas do LIKE no termo não casam com tudo
+def test_busca_por_prefixo_em_sqlite_antigo():
+    engine = create_engine("sqlite://")
+    with engine.connect():
+        engine.dialect.server_version_info = (3, 40, 1)
+    aplicar_migracoes(engine)
+    assert "unicode61" in _tokenizador(engine)
+    _cadastro(engine)
+
+    assert _buscar(engine, "clientes", "conc") == [11]
+    assert _buscar(engine, "clientes", "silva joao") == [10]
+    assert _buscar(engine, "produtos", "congel pao") == [20]
+    assert _buscar(engine, "produtos", "100%") == [21]
+    assert _buscar(engine, "produtos", "%%%") == []
+    assert _buscar(engine, "produtos", "q_e") == []
+    engine.dispose()
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from database.consultas import buscar_kpi, buscar_pagina_vendas, estatisticas_kpi
+from database.dimensoes import CacheDimensoes
+from models.models import ProdutosVenda, Venda
+
+VENDAS = 250
+POR_PAGINA = 100
+
+
+@contextmanager
+def contar_consultas(engine):
+    consultas = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        yield consultas
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+
+def _gravar_vendas(engine):
+    inicio = datetime(2025, 1, 1)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Venda), [{
+            "id": i, "cliente_id": i % 3 + 1, "vendedor_id": 1, "loja_id": 1,
+            "data_venda": inicio + timedelta(hours=i), "total": 60.0, "qtd_itens": 3,
+        } for i in range(1, VENDAS + 1)])
+        conexao.execute(insert(ProdutosVenda), [{
+            "venda_id": i, "produto_id": produto_id, "quantidade": 1, "preco_unitario": 20.0, "subtotal": 20.0,
+            "data_venda": inicio + timedelta(hours=i),
+        } for i in range(1, VENDAS + 1) for produto_id in (1, 2, 3)])
+
+
+def test_pagina_de_vendas_em_no_maximo_duas_consultas(engine):
+    _gravar_vendas(engine)
+    dimensoes = CacheDimensoes()
+    with Session(engine) as db:
+        for tabela in ("clientes", "vendedores", "lojas", "produtos"):
+            dimensoes.mapa(db, tabela)
+
+        cursor = {}
+        paginas = []
+        for _ in range(3):
+            with contar_consultas(engine) as consultas:
+                pagina = buscar_pagina_vendas(db, dimensoes, POR_PAGINA, **cursor)
+            assert len(consultas) <= 2, consultas
+            vendas = pagina["vendas"]
+            assert all(len(pagina["itens"][venda.Venda_ID]) == 3 for venda in vendas)
+            assert len(pagina["clientes"]) == len(vendas) and None not in pagina["clientes"]
+            paginas.append(vendas)
+            cursor = {"apos": (vendas[-1].Data_da_Venda, vendas[-1].Venda_ID)}
+
+        # Volta da segunda página para a primeira
+        segunda = paginas[1][0]
+        with contar_consultas(engine) as consultas:
+            anterior = buscar_pagina_vendas(db, dimensoes, POR_PAGINA, antes=(segunda.Data_da_Venda, segunda.Venda_ID))
+        assert len(consultas) <= 2, consultas
+        assert anterior["tem_proxima"]
+
+    ids = [[venda.Venda_ID for venda in vendas] for vendas in paginas]
+    assert ids[0] == list(range(VENDAS, VENDAS - POR_PAGINA, -1))
+    assert sum(map(len, ids)) == VENDAS
+    assert [venda.Venda_ID for venda in anterior["vendas"]] == ids[0]
+
+
+# Chamadas respondidas pelo cache contam como acertos, sem tempo de consulta ao banco
+def test_estatisticas_kpi_contam_acertos_do_cache(engine):
+    _gravar_vendas(engine)
+    antes = estatisticas_kpi().get("ticket_medio", {"chamadas": 0, "consultas ao banco": 0})
+    inicio, fim = datetime(2025, 1, 1).date(), datetime(2025, 1, 31).date()
+    with Session(engine) as db:
+        for _ in range(3):
+            assert buscar_kpi(db, "ticket_medio", inicio, fim).iloc[0]["Vendas"] == VENDAS
+
+    estatisticas = estatisticas_kpi()["ticket_medio"]
+    assert estatisticas["chamadas"] - antes["chamadas"] == 3
+    assert estatisticas["consultas ao banco"] - antes["consultas ao banco"] == 1
+    assert estatisticas["acertos do cache"] == estatisticas["chamadas"] - estatisticas["consultas ao banco"]
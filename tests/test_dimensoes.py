@@ -0,0 +1,18 @@
+from database.dimensoes import TIPO_NOMES, MapaNomes
+
+
+def test_mapa_nomes_mantem_arrow_e_nulos():
+    mapa = MapaNomes([1, 2, 3], ["Ana", None, "Caio"]).acrescentar([5], ["Eva"])
+    nomes = mapa.resolver([3, 2, 4, 5, 1])
+
+    assert mapa.nomes.dtype == TIPO_NOMES
+    assert nomes.dtype == TIPO_NOMES
+    assert nomes.isna().tolist() == [False, True, True, False, False]
+    assert nomes.dropna().tolist() == ["Caio", "Eva", "Ana"]
+    assert mapa.max_id == 5
+
+
+def test_mapa_vazio_resolve_nulos():
+    nomes = MapaNomes().resolver([1, 2])
+    assert nomes.dtype == TIPO_NOMES
+    assert nomes.isna().all()
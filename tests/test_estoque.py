@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+from sqlalchemy import event, insert, select
+
+from database.estoque import EstoqueInsuficiente, ServicoEstoque, _ao_confirmar
+from models.models import Estoque
+
+
+def _estoque(engine, quantidades: dict[int, int], loja_id: int = 1):
+    with engine.begin() as conexao:
+        conexao.execute(insert(Estoque), [
+            {"loja_id": loja_id, "produto_id": produto_id, "quantidade": quantidade}
+            for produto_id, quantidade in quantidades.items()
+        ])
+
+
+def _no_banco(engine, loja_id: int = 1) -> dict[int, int]:
+    with engine.connect() as conexao:
+        return dict(conexao.execute(
+            select(Estoque.produto_id, Estoque.quantidade).where(Estoque.loja_id == loja_id)
+        ).all())
+
+
+def test_reserva_baixa_banco_e_indice(engine):
+    _estoque(engine, {1: 10, 2: 5})
+    servico = ServicoEstoque(engine)
+    assert servico.disponivel(1, 1) == 10
+
+    # Itens repetidos do mesmo produto são somados
+    assert servico.reservar(1, [(1, 3), (2, 5), (1, 1)]) == {1: 6, 2: 0}
+    assert _no_banco(engine) == {1: 6, 2: 0}
+    assert (servico.disponivel(1, 1), servico.disponivel(1, 2)) == (6, 0)
+    assert servico.verificar(1, [(1, 6), (2, 1)]) == {2: 0}
+
+
+def test_reserva_recusada_nao_baixa_nada(engine):
+    _estoque(engine, {1: 10, 2: 1})
+    servico = ServicoEstoque(engine)
+
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        servico.reservar(1, [(1, 4), (2, 2), (3, 1)])
+    assert erro.value.faltantes == {2: 1, 3: 0}
+    assert _no_banco(engine) == {1: 10, 2: 1}
+    assert servico.disponivel(1, 1) == 10
+
+
+def test_indice_so_muda_no_commit(engine):
+    _estoque(engine, {1: 10})
+    servico = ServicoEstoque(engine)
+    servico.carregar()
+
+    with pytest.raises(RuntimeError):
+        with engine.begin() as conexao:
+            servico.baixar(conexao, 1, [(1, 4)])
+            raise RuntimeError
+    assert servico.disponivel(1, 1) == 10
+
+    with engine.begin() as conexao:
+        servico.repor(conexao, 1, [(1, 5), (2, 7)])
+        assert servico.disponivel(1, 2) == 0
+    assert (servico.disponivel(1, 1), servico.disponivel(1, 2)) == (15, 7)
+    assert _no_banco(engine) == {1: 15, 2: 7}
+
+
+# Os eventos de transação são do engine, não de cada serviço; e uma quantidade mais
+# antiga confirmada depois (outra ordem de commits) não substitui a mais nova
+def test_eventos_unicos_e_quantidades_pela_versao(engine):
+    _estoque(engine, {1: 10})
+    servicos = [ServicoEstoque(engine) for _ in range(3)]
+    assert len(engine.dispatch.commit) == 1
+    assert event.contains(engine, "commit", _ao_confirmar)
+
+    servico = servicos[0]
+    servico.carregar()
+    with engine.connect() as primeira, engine.connect() as segunda:
+        servico._registrar(primeira, 1, {1: 7})
+        servico._registrar(segunda, 1, {1: 4})
+        _ao_confirmar(segunda)
+        _ao_confirmar(primeira)
+    assert servico.disponivel(1, 1) == 4
+
+
+# Várias threads reservam os mesmos produtos até o estoque acabar: nenhuma venda passa
+# do estoque e o banco fica com a quantidade inicial menos o total reservado
+def test_reservas_concorrentes_nao_vendem_acima_do_estoque(engine_arquivo):
+    inicial = 60
+    _estoque(engine_arquivo, {1: inicial, 2: inicial, 3: inicial})
+    servico = ServicoEstoque(engine_arquivo)
+    reservadas = []
+
+    def reservar():
+        while True:
+            try:
+                servico.reservar(1, [(1, 1), (2, 2), (3, 3)])
+            except EstoqueInsuficiente:
+                return
+            reservadas.append(1)
+
+    threads = [threading.Thread(target=reservar) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    vendas = len(reservadas)
+    assert vendas == inicial // 3
+    assert _no_banco(engine_arquivo) == {1: inicial - vendas, 2: inicial - 2 * vendas, 3: 0}
+    assert servico.disponivel(1, 3) == 0
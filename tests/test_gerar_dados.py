@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from models.models import Loja
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_motores_com_mesmas_distribuicoes(gerar_dados, seed):
+    estatisticas = gerar_dados.comparar_motores(seed=seed)
+    assert estatisticas["ok"].all(), estatisticas.to_string()
+
+
+def test_motor_numpy_soma_os_itens_de_cada_venda(gerar_dados):
+    produtos_ids = [2, 3, 5, 7, 11, 13]
+    df_vendas, df_itens = gerar_dados.gerar_vendas_numpy(
+        np.random.default_rng(0), 10, [1, 2, 3], [4, 5], 1, produtos_ids, dias=range(30)
+    )
+
+    assert df_vendas["id"].tolist() == list(range(10, 10 + len(df_vendas)))
+    assert (df_itens.groupby("venda_id")["produto_id"].nunique() == gerar_dados.ITENS_POR_VENDA).all()
+    assert df_itens["produto_id"].isin(produtos_ids).all()
+    assert np.allclose(df_itens["subtotal"], df_itens["quantidade"] * df_itens["preco_unitario"])
+
+    somas = df_itens.groupby("venda_id").agg(total=("subtotal", "sum"), qtd_itens=("quantidade", "sum"))
+    vendas = df_vendas.set_index("id")
+    assert np.allclose(vendas["total"], somas["total"].round(2))
+    assert (vendas["qtd_itens"] == somas["qtd_itens"]).all()
+    assert (df_itens["data_venda"].values == vendas.loc[df_itens["venda_id"], "data_venda"].values).all()
+
+
+# Mais lojas que NUM_VENDEDORES: as que faltam são cadastradas e cada uma tem vendedor
+def test_pools_cadastram_lojas_e_vendedores_de_cada_loja(gerar_dados, engine):
+    num_lojas = gerar_dados.NUM_VENDEDORES + 20
+    with engine.begin() as conexao:
+        _, novos_vendedores, _, vendedores_loja = gerar_dados.montar_pools(conexao, num_lojas)
+        lojas = conexao.execute(select(Loja.id, Loja.regiao_id)).all()
+
+    assert sorted(loja_id for loja_id, _ in lojas) == list(range(1, num_lojas + 1))
+    assert {regiao_id for _, regiao_id in lojas} == {1}
+    assert sorted(vendedores_loja) == list(range(1, num_lojas + 1))
+    assert all(vendedores_loja.values())
+    assert len(novos_vendedores) == len({vendedor["id"] for vendedor in novos_vendedores})
+    assert {vendedor["loja_id"] for vendedor in novos_vendedores} <= set(vendedores_loja)
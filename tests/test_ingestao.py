@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from database.ingestao import IngestorVendas
+from models.models import Pagamento, Produto, ProdutosVenda, Venda
+
+
+def _venda(data_venda=None, **campos):
+    venda = {"cliente_id": 1, "vendedor_id": 1, "loja_id": 1, "itens": [{"produto_id": 1, "quantidade": 2}]}
+    if data_venda is not None:
+        venda["data_venda"] = data_venda
+    return {**venda, **campos}
+
+
+def test_lote_com_datas_com_e_sem_fuso(engine):
+    com_fuso = datetime(2025, 3, 10, 15, 30, tzinfo=timezone(timedelta(hours=-3)))
+    sem_fuso = datetime(2025, 3, 11, 9, 0)
+    pagamento = {"metodo": "pix", "status": "aprovado"}
+    resultado = IngestorVendas(engine).ingerir([
+        _venda(com_fuso, pagamento=pagamento), _venda(sem_fuso, pagamento=pagamento), _venda(pagamento=pagamento),
+    ])
+
+    assert resultado["rejeitadas"] == {}
+    with engine.connect() as conexao:
+        datas = dict(conexao.execute(select(Venda.id, Venda.data_venda)).all())
+        datas_itens = dict(conexao.execute(select(ProdutosVenda.venda_id, ProdutosVenda.data_venda)).all())
+        datas_pagamentos = dict(conexao.execute(select(Pagamento.venda_id, Pagamento.data_venda)).all())
+
+    ids = resultado["ids"]
+    assert datas[ids[0]] == com_fuso.astimezone().replace(tzinfo=None)
+    assert datas[ids[1]] == sem_fuso
+    assert datas[ids[2]].tzinfo is None
+    assert datas_itens == datas
+    assert datas_pagamentos == datas
+
+
+def test_rejeita_vendas_invalidas_e_grava_o_resto(engine):
+    resultado = IngestorVendas(engine).ingerir([
+        _venda(),
+        _venda(cliente_id=99),
+        _venda(itens=[]),
+        _venda(total=1.0),
+    ])
+
+    assert list(resultado["ids"]) == [0]
+    assert set(resultado["rejeitadas"]) == {1, 2, 3}
+    assert "cliente_id 99 inexistente" in resultado["rejeitadas"][1]
+    with engine.connect() as conexao:
+        assert conexao.execute(select(Venda.total)).scalars().all() == [20.0]
+
+
+def test_rejeita_item_sem_preco_de_produto_sem_preco_de_tabela(engine):
+    with engine.begin() as conexao:
+        conexao.execute(update(Produto).where(Produto.id == 2).values(preco=None))
+
+    resultado = IngestorVendas(engine).ingerir([
+        _venda(itens=[{"produto_id": 2, "quantidade": 1}]),
+        _venda(itens=[{"produto_id": 2, "quantidade": 1, "preco_unitario": 15.0}]),
+    ])
+
+    assert list(resultado["ids"]) == [1]
+    assert resultado["rejeitadas"] == {0: "produto_id 2 sem preço de tabela"}
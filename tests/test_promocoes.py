@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from database.promocoes import IndicePromocoes
+
+
+def test_promocao_sem_fim_ou_sem_inicio_vale_do_lado_aberto():
+    indice = IndicePromocoes([(1, 0.5, datetime(2025, 1, 1), None), (2, 0.2, None, datetime(2025, 1, 31))])
+
+    assert indice.preco(1, 100.0, datetime(2025, 6, 1)) == 50.0
+    assert indice.preco(1, 100.0, datetime(2024, 12, 31)) == 100.0
+    assert indice.preco(2, 100.0, datetime(2020, 1, 1)) == 80.0
+    assert indice.preco(2, 100.0, datetime(2025, 2, 1)) == 100.0
+
+
+def test_maior_desconto_entre_promocoes_sobrepostas():
+    indice = IndicePromocoes([
+        (1, 0.1, datetime(2025, 1, 1), datetime(2025, 12, 31)),
+        (1, 0.3, datetime(2025, 3, 1), datetime(2025, 3, 31)),
+        (1, 0.2, datetime(2025, 3, 15), None),
+    ])
+    instantes = [datetime(2025, 2, 1), datetime(2025, 3, 20), datetime(2025, 4, 1), datetime(2026, 6, 1)]
+
+    assert indice.descontos_em([1] * 4, instantes).tolist() == [0.1, 0.3, 0.2, 0.2]
+    assert indice.descontos_em([2], [datetime(2025, 3, 20)]).tolist() == [0.0]
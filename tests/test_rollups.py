@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from database.rollups import WATERMARK_ROLLUPS, atualizar_rollups, reconstruir_rollups
+from database.totais import alterar_item, remover_item
+from models.models import ProdutosVenda, Venda, VendaDiariaLoja, VendaDiariaProduto, Watermark
+
+
+def _vendas(engine, ids):
+    inicio = datetime(2025, 1, 1)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Venda), [{
+            "id": i, "cliente_id": 1, "vendedor_id": 1, "loja_id": i % 2 + 1,
+            "data_venda": inicio + timedelta(hours=5 * i), "total": 30.0, "qtd_itens": 2,
+        } for i in ids])
+        conexao.execute(insert(ProdutosVenda), [{
+            "venda_id": i, "produto_id": produto_id, "quantidade": 1, "preco_unitario": 10.0 * produto_id,
+            "subtotal": 10.0 * produto_id, "data_venda": inicio + timedelta(hours=5 * i),
+        } for i in ids for produto_id in (1, 2)])
+
+
+def _resumos(engine):
+    with engine.connect() as conexao:
+        return (
+            sorted(conexao.execute(select(VendaDiariaLoja.__table__)).all()),
+            sorted(conexao.execute(select(VendaDiariaProduto.__table__)).all()),
+        )
+
+
+def test_atualizacao_incremental_igual_a_reconstrucao(engine):
+    # A primeira execução cria o watermark mesmo sem vendas
+    assert atualizar_rollups(engine) == (0, 0)
+    with engine.connect() as conexao:
+        assert conexao.execute(select(Watermark.valor).where(Watermark.nome == WATERMARK_ROLLUPS)).scalar() == 0
+
+    _vendas(engine, range(1, 21))
+    assert atualizar_rollups(engine) == (0, 20)
+    _vendas(engine, range(21, 31))
+    assert atualizar_rollups(engine) == (20, 30)
+    assert atualizar_rollups(engine) == (30, 30)
+    incremental = _resumos(engine)
+
+    assert reconstruir_rollups(engine) == (0, 30)
+    assert _resumos(engine) == incremental
+    assert sum(receita for _, _, receita, _ in incremental[0]) == 30 * 30.0
+
+
+def test_itens_editados_refazem_o_dia(engine):
+    _vendas(engine, range(1, 11))
+    atualizar_rollups(engine)
+    with engine.begin() as conexao:
+        itens = conexao.execute(
+            select(ProdutosVenda.id, ProdutosVenda.data_venda)
+            .where(ProdutosVenda.venda_id.in_([3, 4]))
+            .order_by(ProdutosVenda.id)
+        ).all()
+        alterar_item(conexao, itens[0].id, itens[0].data_venda, quantidade=5)
+        remover_item(conexao, itens[-1].id, itens[-1].data_venda)
+    editado = _resumos(engine)
+
+    reconstruir_rollups(engine)
+    assert _resumos(engine) == editado
+    assert sum(receita for _, _, receita, _ in editado[0]) == 10 * 30.0 + 40.0 - 20.0
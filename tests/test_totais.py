@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+from database.totais import adicionar_item, alterar_item, calcular_totais, remover_item
+from models.models import ProdutosVenda, Venda
+
+
+def _cabecalho(conexao, venda_id):
+    return conexao.execute(select(Venda.total, Venda.qtd_itens).where(Venda.id == venda_id)).one()._asdict()
+
+
+def test_alteracoes_de_itens_mantem_o_cabecalho(engine):
+    data_venda = datetime(2025, 5, 2, 10)
+    itens = [{"produto_id": 1, "quantidade": 2, "preco_unitario": 10.0}]
+    venda = calcular_totais({"id": 1, "cliente_id": 1, "vendedor_id": 1, "loja_id": 1, "data_venda": data_venda}, itens)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Venda), [venda])
+        conexao.execute(insert(ProdutosVenda), [{**item, "venda_id": 1, "data_venda": data_venda} for item in itens])
+
+    with engine.begin() as conexao:
+        item_id = adicionar_item(conexao, 1, data_venda, 3, 1, 30.0)
+        assert _cabecalho(conexao, 1) == {"total": 50.0, "qtd_itens": 3}
+        assert conexao.execute(select(ProdutosVenda.data_venda).where(ProdutosVenda.id == item_id)).scalar() == data_venda
+
+        assert alterar_item(conexao, item_id, data_venda, quantidade=4) == {"total": 140.0, "qtd_itens": 6}
+        assert alterar_item(conexao, item_id, data_venda, preco_unitario=25.0) == {"total": 120.0, "qtd_itens": 6}
+        assert conexao.execute(select(ProdutosVenda.subtotal).where(ProdutosVenda.id == item_id)).scalar() == 100.0
+
+        assert remover_item(conexao, item_id, data_venda) == {"total": 20.0, "qtd_itens": 2}
+        primeiro = conexao.execute(select(ProdutosVenda.id).where(ProdutosVenda.venda_id == 1)).scalar()
+        assert remover_item(conexao, primeiro, data_venda) == {"total": 0, "qtd_itens": 0}
+
+    with engine.begin() as conexao, pytest.raises(ValueError, match="Venda 99 de .* inexistente"):
+        adicionar_item(conexao, 99, data_venda, 1, 1, 10.0)